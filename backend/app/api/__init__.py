@@ -1,7 +1,11 @@
 """REST API routers for the application."""
 
 from .faces import faces_router
+from .health import health_router
+from .metrics import metrics_router
 
 __all__ = [
     "faces_router",
+    "health_router",
+    "metrics_router",
 ]
@@ -1,5 +1,15 @@
 """API endpoints for face image management and recognition."""
 
+import asyncio
+import json
+import os
+import tarfile
+import zipfile
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, BinaryIO, Iterator, Literal, cast
+from uuid import UUID
+
 from fastapi import (
     APIRouter,
     Depends,
@@ -7,15 +17,59 @@ from fastapi import (
     Form,
     HTTPException,
     Query,
+    Request,
     Response,
     UploadFile,
 )
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.config import settings
+from app.db import FaceImage
+from app.services import (
+    THUMBNAIL_SIZES,
+    EnrollmentItem,
+    FaceGalleryService,
+    FaceMatch,
+    FaceRecognitionService,
+    FacesCursor,
+    InferenceQueueFullError,
+    SearchMode,
+    StoredImage,
+    ThumbnailFormat,
+    get_face_gallery_service,
+    get_face_recognition_service,
+)
 
-from app.services import FaceRecognitionService, get_face_recognition_service
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+IMAGE_CACHE_CONTROL = "public, max-age=86400"
 
 faces_router = APIRouter()
 
 
+def _face_record(face: FaceImage) -> dict:
+    """Serialize face image metadata, without image data and feature vector."""
+    return {
+        "id": str(face.id),
+        "filename": face.filename,
+        "label": face.label,
+        "created_at": face.created_at.isoformat(),
+    }
+
+
+def _face_match(match: FaceMatch) -> dict:
+    """Serialize a single recognition match."""
+    return {
+        "cosine_similarity": match.cosine_similarity,
+        "cosine_distance": match.cosine_distance,
+        "record": _face_record(match.face_image),
+    }
+
+
+def _service_unavailable(e: InferenceQueueFullError) -> HTTPException:
+    """Map a rejected inference job to 503 response asking the client to retry."""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
 @faces_router.post("/")
 async def upload_face(
     file: UploadFile = File(...),
@@ -37,55 +91,290 @@ async def upload_face(
             "message": "Face image uploaded successfully",
         }
 
+    except InferenceQueueFullError as e:
+        raise _service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+def _read_archive(file: BinaryIO) -> Iterator[tuple[str, str, bytes]]:
+    """Yield (filename, label, image data) for every image in a zip or tar archive.
+
+    Images are expected in one directory per person, the directory name is the label.
+    Members are read one at a time from the (spooled) file, the archive
+    is never loaded into memory as a whole. Blocking, iterate it in a thread.
+    """
+    if zipfile.is_zipfile(file):
+        file.seek(0)
+        with zipfile.ZipFile(file) as archive:
+            for name in archive.namelist():
+                label = os.path.basename(os.path.dirname(name))
+                if label and name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.basename(name), label, archive.read(name)
+        return
+
+    file.seek(0)
+    with tarfile.open(fileobj=file, mode="r:*") as archive:
+        for member in archive:
+            label = os.path.basename(os.path.dirname(member.name))
+            if (
+                member.isfile()
+                and label
+                and member.name.lower().endswith(IMAGE_EXTENSIONS)
+            ):
+                image_file = archive.extractfile(member)
+                if image_file is not None:
+                    yield os.path.basename(member.name), label, image_file.read()
+
+
+async def _archive_items(archive: UploadFile) -> AsyncIterator[EnrollmentItem]:
+    """Enrollment items from an uploaded zip or tar archive.
+
+    Decompression runs in a worker thread, one member at a time,
+    so that the event loop keeps serving other requests.
+    """
+    entries = _read_archive(archive.file)
+    while (entry := await asyncio.to_thread(next, entries, None)) is not None:
+        filename, label, image_data = entry
+        yield EnrollmentItem(image_data=image_data, label=label, filename=filename)
+
+
+async def _uploaded_items(
+    files: list[UploadFile], labels: list[str]
+) -> AsyncIterator[EnrollmentItem]:
+    """Enrollment items from uploaded files paired with labels by position."""
+    for file, label in zip(files, labels):
+        yield EnrollmentItem(
+            image_data=await file.read(), label=label, filename=file.filename
+        )
+
+
+@faces_router.post("/batch")
+async def upload_faces_batch(
+    files: list[UploadFile] | None = File(None),
+    labels: list[str] | None = Form(None),
+    archive: UploadFile | None = File(None),
+    face_rec_service: FaceRecognitionService = Depends(get_face_recognition_service),
+):
+    """Upload many face images in one request.
+
+    Accepts either `files` with `labels` matched by position,
+    or a zip/tar `archive` with one directory of images per person (like the LFW dataset),
+    where directory names are used as labels.
+
+    Streams back one JSON object per image (NDJSON), in upload order.
+    """
+
+    if archive is not None:
+        items = _archive_items(archive)
+    elif files and labels and len(files) == len(labels):
+        items = _uploaded_items(files, labels)
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide an archive or the same number of files and labels",
+        )
+
+    async def ndjson_results() -> AsyncIterator[str]:
+        async for result in face_rec_service.add_face_images(items):
+            yield json.dumps(
+                {
+                    "index": result.index,
+                    "filename": result.filename,
+                    "label": result.label,
+                    "id": str(result.face_image_id) if result.face_image_id else None,
+                    "error": result.error,
+                }
+            ) + "\n"
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
+
+
 @faces_router.get("/")
 async def get_faces(
     page: int = Query(1, ge=1),
     page_size: int = Query(25, ge=1, le=100),
-    face_rec_service: FaceRecognitionService = Depends(get_face_recognition_service),
+    cursor: str | None = Query(None),
+    count: Literal["exact", "approximate", "none"] = Query("exact"),
+    gallery_service: FaceGalleryService = Depends(get_face_gallery_service),
 ):
     """Retrieve paginated list of face images with metadata.
 
-    Lightweight, no image data included.
+    Lightweight, no image data or feature vectors are loaded from the database.
+
+    Pages are selected by `page` number, or by `cursor` returned as `next_cursor`
+    of the previous page (keyset pagination, constant cost for deep pages).
+    `count` selects exact total count, a cheap estimate from table statistics,
+    or no count at all.
     """
 
     try:
-        faces = await face_rec_service.get_faces(page, page_size)
-        total_count = await face_rec_service.get_all_faces_count()
+        if cursor is not None:
+            faces = await gallery_service.get_faces_after(
+                FacesCursor.decode(cursor), page_size
+            )
+        else:
+            faces = await gallery_service.get_faces(page, page_size)
+
+        if count == "exact":
+            total_count = await gallery_service.get_all_faces_count()
+        elif count == "approximate":
+            total_count = await gallery_service.get_approximate_faces_count()
+        else:
+            total_count = None
+
+        next_cursor = None
+        if len(faces) == page_size:
+            last = faces[-1]
+            next_cursor = FacesCursor(
+                created_at=cast(datetime, last.created_at), id=UUID(str(last.id))
+            ).encode()
 
         return {
             "count": total_count,
-            "faces": [
-                {
-                    "id": str(face.id),
-                    "filename": face.filename,
-                    "label": face.label,
-                    "created_at": face.created_at.isoformat(),
-                }
-                for face in faces
-            ],
+            "next_cursor": next_cursor,
+            "faces": [_face_record(face) for face in faces],
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch faces: {str(e)}")
 
 
+def _is_not_modified(request: Request, image: StoredImage) -> bool:
+    """Check conditional request headers against the stored image.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = [etag.strip().removeprefix("W/") for etag in if_none_match.split(",")]
+        return "*" in etags or image.etag in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        last_modified = image.last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+
+def _parse_byte_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single byte range request into (start, end) offsets, end exclusive.
+
+    Returns None for headers not supported here (other units, multiple ranges,
+    malformed syntax), which are answered with the whole content.
+    Raises ValueError if the range is not satisfiable.
+    """
+    units, _, byte_range = range_header.partition("=")
+    if units.strip().lower() != "bytes" or "," in byte_range:
+        return None
+    first, _, last = byte_range.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range, the last `last` bytes
+            start, end = max(size - int(last), 0), size
+        else:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+            if last and int(last) < start:
+                return None
+    except ValueError:
+        return None
+    if start >= size or start >= end:
+        raise ValueError(f"Range {range_header} not satisfiable for {size} bytes")
+    return start, end
+
+
+def _image_response(
+    request: Request, image: StoredImage, headers: dict[str, str]
+) -> Response:
+    """Response with the image file, or the requested byte range of it.
+
+    Files in the blob store are streamed by FileResponse, images stored in
+    the database are sliced in memory. Both answer single range requests with
+    206 Partial Content and unsatisfiable ranges with 416, and serve the whole
+    file if If-Range does not match the current validators.
+    """
+    if image.path is not None:
+        return FileResponse(image.path, media_type=image.content_type, headers=headers)
+
+    data = image.data or b""
+    headers = headers | {"Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header is not None and if_range in (
+        None,
+        image.etag,
+        headers["Last-Modified"],
+    ):
+        try:
+            byte_range = _parse_byte_range(range_header, len(data))
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers=headers | {"Content-Range": f"bytes */{len(data)}"},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return Response(
+                content=data[start:end],
+                status_code=206,
+                media_type=image.content_type,
+                headers=headers
+                | {"Content-Range": f"bytes {start}-{end - 1}/{len(data)}"},
+            )
+    return Response(content=data, media_type=image.content_type, headers=headers)
+
+
 @faces_router.get("/{face_id}/image")
 async def get_face_image(
     face_id: str,
-    face_rec_service: FaceRecognitionService = Depends(get_face_recognition_service),
+    request: Request,
+    size: int | None = Query(None),
+    format: ThumbnailFormat = Query("webp"),
+    gallery_service: FaceGalleryService = Depends(get_face_gallery_service),
 ):
-    """Retrieve the raw image data for a specific face image by ID."""
+    """Retrieve the image file of a face image by ID.
+
+    With `size` (one of THUMBNAIL_SIZES), returns a thumbnail with the longer side
+    of at most `size` pixels in the requested `format`, instead of the original file.
+
+    Stored images never change, responses carry ETag and Last-Modified headers
+    for HTTP caches and conditional requests get 304 Not Modified.
+    Files are streamed with Range request support.
+    """
+    if size is not None and size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400, detail=f"Thumbnail size must be one of {THUMBNAIL_SIZES}"
+        )
+
     try:
-        face = await face_rec_service.get_face_by_id(face_id)
+        if size is None:
+            image = await gallery_service.get_face_image_file(face_id)
+        else:
+            image = await gallery_service.get_face_thumbnail(face_id, size, format)
 
-        if not face:
+        if image is None:
             raise HTTPException(status_code=404, detail="Face image not found")
 
-        return Response(content=face.image_data, media_type="image/jpeg")
+        last_modified = image.last_modified.replace(tzinfo=timezone.utc)
+        headers = {
+            "ETag": image.etag,
+            "Last-Modified": formatdate(last_modified.timestamp(), usegmt=True),
+            "Cache-Control": IMAGE_CACHE_CONTROL,
+        }
+
+        if _is_not_modified(request, image):
+            return Response(status_code=304, headers=headers)
+        return _image_response(request, image, headers)
 
+    except HTTPException as e:
+        raise e
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid face ID format")
     except Exception as e:
@@ -95,29 +384,122 @@ async def get_face_image(
 @faces_router.post("/recognize")
 async def recognize(
     file: UploadFile = File(...),
+    k: int = Query(1, ge=1, le=100),
+    threshold: float | None = Query(None, ge=0, le=2),
+    mode: SearchMode | None = Query(None),
+    ef_search: int | None = Query(None, ge=1, le=1000),
+    multi_face: bool = Query(False),
     face_rec_service: FaceRecognitionService = Depends(get_face_recognition_service),
 ):
-    """Find the closest matching face in the database for the uploaded image."""
+    """Find the closest matching faces in the database for the uploaded image.
+
+    Returns up to `k` matches within cosine distance `threshold`, closest first.
+    Top-level fields describe the best match.
+    `mode` selects exact or approximate (HNSW index) search in the database,
+    or search in the in-process index (default when enabled in settings).
+    `identity` mode searches one template per label and returns the closest
+    image of each matched person.
+    The response includes latency of the search query to compare the modes.
+
+    With `multi_face`, every face detected in the image is recognized
+    (e.g. in a group photo) and the response lists matches per face instead.
+    Face boxes are in pixels of the uploaded image, before EXIF rotation.
+    """
 
     try:
-        result = await face_rec_service.find_closest_face(file)
+        if multi_face:
+            multi_result = await face_rec_service.find_closest_faces_multi(
+                file, k=k, threshold=threshold, mode=mode, ef_search=ef_search
+            )
+            return {
+                "faces": [
+                    {
+                        "box": face.box,
+                        "probability": face.probability,
+                        "matches": [_face_match(match) for match in face.matches],
+                    }
+                    for face in multi_result.faces
+                ],
+                "search_mode": multi_result.search_mode,
+                "search_latency_ms": multi_result.search_latency_ms,
+            }
+
+        result = await face_rec_service.find_closest_faces(
+            file, k=k, threshold=threshold, mode=mode, ef_search=ef_search
+        )
 
-        if not result:
-            raise HTTPException(status_code=404, detail="No faces found in database")
+        if not result.matches:
+            raise HTTPException(status_code=404, detail="No matching faces found")
+
+        best_match = result.matches[0]
 
         return {
-            "cosine_similarity": result.cosine_similarity,
-            "cosine_distance": result.cosine_distance,
+            "cosine_similarity": best_match.cosine_similarity,
+            "cosine_distance": best_match.cosine_distance,
             "matched_record": {
-                "id": str(result.face_image.id),
-                "filename": result.face_image.filename,
-                "label": result.face_image.label,
-                "created_at": result.face_image.created_at.isoformat(),
-                "feature_vector": result.face_image.feature_vector.tolist(),
+                **_face_record(best_match.face_image),
+                "feature_vector": best_match.face_image.feature_vector.tolist(),
             },
+            "matches": [_face_match(match) for match in result.matches],
             "search_vector": result.search_vector,
+            "search_mode": result.search_mode,
+            "search_latency_ms": result.search_latency_ms,
         }
     except HTTPException as e:
         raise e
+    except InferenceQueueFullError as e:
+        raise _service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Recognition failed: {str(e)}")
+
+
+@faces_router.post("/recognize/batch")
+async def recognize_batch(
+    files: list[UploadFile] = File(...),
+    k: int = Query(1, ge=1, le=100),
+    threshold: float | None = Query(None, ge=0, le=2),
+    mode: SearchMode | None = Query(None),
+    ef_search: int | None = Query(None, ge=1, le=1000),
+    face_rec_service: FaceRecognitionService = Depends(get_face_recognition_service),
+):
+    """Find the closest matching faces for each of many uploaded probe images.
+
+    Parameters work the same way as for single image recognition.
+    Nearest neighbours of all probes are found in a single search,
+    results are returned in the order of uploaded files.
+    Probes that fail (e.g. no face detected) have `error` set
+    and probes with no matches have an empty `matches` list.
+    """
+
+    if len(files) > settings.recognition_batch_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.recognition_batch_max_size} images per batch",
+        )
+
+    try:
+        result = await face_rec_service.find_closest_faces_batch(
+            files, k=k, threshold=threshold, mode=mode, ef_search=ef_search
+        )
+
+        return {
+            "results": [
+                {
+                    "index": probe.index,
+                    "filename": probe.filename,
+                    "error": probe.error,
+                    "matches": [_face_match(match) for match in probe.matches],
+                }
+                for probe in result.probes
+            ],
+            "search_mode": result.search_mode,
+            "search_latency_ms": result.search_latency_ms,
+        }
+    except InferenceQueueFullError as e:
+        raise _service_unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recognition failed: {str(e)}")
@@ -0,0 +1,26 @@
+"""API endpoints for liveness and readiness probes."""
+
+from fastapi import APIRouter, Response, status
+
+from app.services import is_face_embedding_service_ready
+
+health_router = APIRouter()
+
+
+@health_router.get("/health", include_in_schema=False)
+async def health():
+    """Liveness probe, the worker process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@health_router.get("/ready", include_in_schema=False)
+async def ready(response: Response):
+    """Readiness probe, models are loaded and warmed up.
+
+    Returns 503 while warm-up is still running (or failed),
+    so that no traffic is routed to the worker before it can serve it quickly.
+    """
+    if not is_face_embedding_service_ready():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "loading"}
+    return {"status": "ready"}
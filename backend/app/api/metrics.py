@@ -0,0 +1,34 @@
+"""API endpoint exposing Prometheus metrics."""
+
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.config import settings
+from app.metrics import gallery_size, generate_metrics
+from app.services import (
+    FaceGalleryService,
+    get_face_gallery_service,
+    get_vector_index,
+)
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics(
+    gallery_service: FaceGalleryService = Depends(get_face_gallery_service),
+):
+    """Metrics in Prometheus text format.
+
+    Only metrics of the worker serving the request, unless prometheus_client
+    multiprocess mode is enabled (see app.metrics).
+
+    Gallery size is taken from the in-memory index when it is enabled,
+    otherwise estimated from table statistics to keep scrapes cheap.
+    """
+    if settings.search_backend == "memory":
+        gallery_size.set(len(get_vector_index()))
+    else:
+        gallery_size.set(await gallery_service.get_approximate_faces_count())
+
+    return Response(generate_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -3,6 +3,8 @@
 Settings object can be imported and used throughout the application.
 """
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,8 +18,57 @@ class Settings(BaseSettings):
     database_url: str
     cors_allowed_origin: str
     enable_sqlalchemy_logging: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_s: float = 30.0
+    db_pool_pre_ping: bool = False
+    db_statement_cache_size: int = 100
     facenet_weights_path: str | None = None
     facenet_weights_key: str = "model_state_dict"
+    model_cache_path: str | None = "./model_cache"
+    model_warmup: Literal["background", "blocking"] = "background"
+    feature_extractor_mode: Literal[
+        "fp32", "channels_last", "compile", "int8_dynamic", "int8_static"
+    ] = "fp32"
+    feature_extractor_calibration_path: str | None = None
+    embedding_backend: Literal["torch", "onnx"] = "torch"
+    onnx_model_path: str = "./models/onnx"
+    onnx_intra_op_threads: int = 0
+    onnx_inter_op_threads: int = 0
+    inference_server_socket: str | None = None
+    inference_server_timeout_s: float = 30.0
+    inference_server_request_timeout_s: float = 60.0
+    # Embedding batches only fill with requests of concurrently running workers,
+    # so there are as many workers as the largest batch (embedding_batch_max_size)
+    inference_workers: int = 8
+    inference_queue_size: int = 16
+    embedding_batch_max_size: int = 8
+    embedding_batch_max_wait_ms: float = 5.0
+    face_detection_min_probability: float = 0.9
+    face_detection_max_side: int | None = 1024
+    image_decode_max_side: int | None = 2048
+    max_image_pixels: int = 50_000_000
+    max_upload_bytes: int = 64 * 1024 * 1024
+    # Limit of the batch enrollment route, archives of whole datasets (LFW is 173 MB)
+    max_archive_upload_bytes: int = 1024 * 1024 * 1024
+    embedding_cache_max_bytes: int = 64 * 1024 * 1024
+    embedding_cache_dir: str | None = None
+    image_storage: Literal["database", "blob_store"] = "blob_store"
+    blob_store_path: str = "./blobs"
+    thumbnail_cache_path: str = "./thumbnails"
+    thumbnail_cache_max_bytes: int = 256 * 1024 * 1024
+    thumbnail_quality: int = 80
+    enrollment_chunk_size: int = 32
+    recognition_batch_max_size: int = 500
+    hnsw_ef_search: int = 100
+    vector_search_precision: Literal["full", "half", "binary"] = "full"
+    vector_search_rerank_factor: int = 4
+    identity_search_candidates: int = 10
+    search_backend: Literal["pgvector", "memory"] = "pgvector"
+    vector_index_sync_interval_s: float = 5.0
+    vector_index_sync_overlap_s: float = 60.0
+    vector_index_max_staleness_s: float = 30.0
+    vector_index_snapshot_path: str | None = None
 
 
 settings = Settings()  # type: ignore
@@ -1,9 +1,11 @@
 """Database initialization, session management and data model."""
 
-from .model import FaceImage
+from .model import FaceEmbedding, FaceImage, Identity
 from .session import get_db
 
 __all__ = [
     "get_db",
     "FaceImage",
+    "FaceEmbedding",
+    "Identity",
 ]
@@ -3,22 +3,83 @@
 import uuid
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column, DateTime, LargeBinary, String
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import mapped_column
+from sqlalchemy.orm import deferred, mapped_column
 from sqlalchemy.sql import func
 
 from .base import Base
 
 
 class FaceImage(Base):
-    """Face image files with metadata and feature vectors for face recognition."""
+    """Face image files with metadata and feature vectors for face recognition.
+
+    Image data and feature vector are large and loaded only when explicitly requested,
+    with `undefer()` or by selecting the column directly.
+    Content hash (SHA-256 of image data) identifies byte-identical uploads.
+
+    Image file is kept in the blob store under `image_key`,
+    or in the `image_data` column for rows created with database storage.
+
+    Face crop is the aligned 160x160 face cut out by the detector, stored as PNG,
+    so that feature vectors can be recomputed without running detection again.
+
+    Embedding version identifies the model weights that computed the feature vector,
+    only vectors of the version used by the application are searched.
+    """
 
     __tablename__ = "face_images"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    image_data = Column(LargeBinary, nullable=False)
-    feature_vector = mapped_column(Vector(512))
+    image_data = deferred(Column(LargeBinary))
+    image_key = Column(String(255))
+    content_type = Column(String(100))
+    image_size = Column(Integer)
+    feature_vector = mapped_column(Vector(512), deferred=True)
+    embedding_version = Column(String(64))
+    face_crop = deferred(Column(LargeBinary))
     filename = Column(String(255))
     label = Column(String(255))
+    content_hash = Column(String(64))
     created_at = Column(DateTime, default=func.now())
+
+
+class FaceEmbedding(Base):
+    """Feature vectors of a new embedding model version, staged during migration.
+
+    Filled in the background while the application searches `FaceImage.feature_vector`
+    of the current version, then moved there at once on cutover.
+    Rows without a vector record images where no face was detected,
+    so that the migration does not run face detection on them again.
+    """
+
+    __tablename__ = "face_embeddings"
+
+    face_image_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("face_images.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    model_version = Column(String(64), primary_key=True)
+    feature_vector = mapped_column(Vector(512), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+
+class Identity(Base):
+    """Template feature vector of every enrolled person (label), per model version.
+
+    The template is the normalized mean of the feature vectors of all face images
+    with the label. It is kept up to date on enrollment from the running sum
+    of the vectors, without reading the images of the person again.
+    Searching templates finds persons with one index entry each,
+    instead of one entry per image.
+    """
+
+    __tablename__ = "identities"
+
+    label = Column(String(255), primary_key=True)
+    model_version = Column(String(64), primary_key=True)
+    embedding_sum = mapped_column(Vector(512), nullable=False)
+    template = mapped_column(Vector(512), nullable=False)
+    image_count = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=func.now())
@@ -1,23 +1,76 @@
-"""Database session handling."""
+"""Database session handling.
 
+- Engine with connection pool configured from settings.
+- Connection pool instrumentation with Prometheus metrics.
+- Session dependency for FastAPI.
+"""
+
+import time
 from typing import Any, AsyncGenerator
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.metrics import (
+    db_connection_hold_seconds,
+    db_pool_checked_out,
+    db_pool_wait_seconds,
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Connection pool recording how long checkouts wait for a connection.
+
+    Wait time includes opening a new connection when the pool has room for it.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait_seconds.observe(time.perf_counter() - start)
+
 
 engine = create_async_engine(
-    settings.database_url, echo=settings.enable_sqlalchemy_logging
+    settings.database_url,
+    echo=settings.enable_sqlalchemy_logging,
+    poolclass=InstrumentedPool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_s,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    connect_args={"prepared_statement_cache_size": settings.db_statement_cache_size},
 )
 async_session = sessionmaker(engine, class_=AsyncSession)  # type: ignore
 
 
+# Checked out connections are counted by the pool events rather than read
+# from the pool, so that the gauge also works in multiprocess metrics mode
+@event.listens_for(engine.sync_engine, "checkout")
+def _record_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+    db_pool_checked_out.inc()
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _record_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        db_pool_checked_out.dec()
+        db_connection_hold_seconds.observe(time.perf_counter() - checked_out_at)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, Any]:
     """Generator yielding an asynchronous database session.
 
     Database operations must be awaited.
     This generator handles db session cleanup after use.
+    The session checks out a pooled connection on its first query
+    and returns it on commit, rollback or close, not only at the end of the request.
     """
 
     async with async_session() as session:  # type: ignore
@@ -0,0 +1,67 @@
+"""Inference server process owning the face embedding models.
+
+Run one server per host and point the web workers to its socket with
+INFERENCE_SERVER_SOCKET. The models and their thread pool are then loaded
+once instead of in every uvicorn worker, and the workers' embedding
+requests are batched together. Models are configured by the same settings
+as in the application.
+
+Run from the backend directory as a module:
+    python -m app.inference_server --socket_path /run/setosa/inference.sock --cpus 0-3
+
+Use --help for usage information.
+"""
+
+import argparse
+import os
+
+import torch
+
+from app.config import settings
+from app.logging import logger
+from app.services.face_embedding import load_local_face_embedding_service, warm_up
+from app.services.remote_embedding import InferenceServer
+
+
+def parse_cpus(value: str) -> set[int]:
+    """Parse a CPU list like `0-3,6`."""
+    cpus = set()
+    for part in value.split(","):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve face embedding models to web workers over a Unix socket"
+    )
+    parser.add_argument(
+        "--socket_path",
+        type=str,
+        default=settings.inference_server_socket,
+        required=settings.inference_server_socket is None,
+        help="Socket to listen on, defaults to INFERENCE_SERVER_SOCKET",
+    )
+    parser.add_argument(
+        "--cpus",
+        type=parse_cpus,
+        default=None,
+        help="Pin the server to these CPUs (e.g. 0-3,6) and size the thread pool to them",
+    )
+
+    args = parser.parse_args()
+    if args.cpus is not None:
+        os.sched_setaffinity(0, args.cpus)
+        torch.set_num_threads(len(args.cpus))
+    logger.info(f"Inference server using {torch.get_num_threads()} threads")
+
+    service = load_local_face_embedding_service()
+    warm_up(service)
+    with InferenceServer(args.socket_path, service) as server:
+        logger.info(f"Inference server listening on: {args.socket_path}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,111 @@
 """Main application entry point for the FastAPI server.
 
 - FastAPI app object
+- Startup hooks, model warm-up
 - API router includes
-- CORS middleware setup
+- CORS, upload size limit and metrics middleware setup
 """
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import faces_router
+from app.api import faces_router, health_router, metrics_router
 from app.config import settings
+from app.db.session import async_session
 from app.logging import logger
+from app.metrics import mark_process_dead
+from app.middleware import MetricsMiddleware, UploadSizeLimitMiddleware
+from app.services import (
+    get_model_version,
+    get_vector_index,
+    open_snapshot,
+    warm_up_face_embedding_service,
+)
+
+# Delays between warm-up attempts, doubled after every failure
+WARMUP_RETRY_MIN_DELAY_S = 1.0
+WARMUP_RETRY_MAX_DELAY_S = 60.0
+
+
+async def warm_up_models():
+    """Warm up the models, retrying with exponential backoff until it succeeds.
+
+    The worker reports not ready until then, requests meanwhile load
+    the models on first use.
+    """
+    delay_s = WARMUP_RETRY_MIN_DELAY_S
+    while True:
+        try:
+            await asyncio.to_thread(warm_up_face_embedding_service)
+            return
+        except Exception:
+            logger.exception(
+                f"Face embedding models warm-up failed, retrying in {delay_s:.0f}s"
+            )
+        await asyncio.sleep(delay_s)
+        delay_s = min(delay_s * 2, WARMUP_RETRY_MAX_DELAY_S)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown.
+
+    Loads and warms up the face embedding models, in the background by default,
+    so that the worker starts accepting requests (and reports not ready
+    on the readiness probe) while the models are loading.
 
-app = FastAPI()
+    Loads the in-memory vector index before serving requests, if it is enabled.
+    Starts from the on-disk snapshot if one is configured, then loads only
+    newer rows from the database. Rows enrolled by other workers are loaded
+    by a periodic background sync.
 
+    On shutdown, removes live gauges of the worker from multiprocess metrics.
+    """
+    warmup = asyncio.create_task(warm_up_models())
+    if settings.model_warmup == "blocking":
+        await warmup
+
+    vector_index_sync = None
+    if settings.search_backend == "memory":
+        vector_index = get_vector_index()
+        if settings.vector_index_snapshot_path:
+            try:
+                snapshot = open_snapshot(
+                    settings.vector_index_snapshot_path,
+                    model_version=get_model_version(),
+                )
+                vector_index.load_snapshot(snapshot)
+                logger.info(f"Loaded {len(snapshot)} vectors from snapshot")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not open vector index snapshot: {e}")
+        async with async_session() as db:  # type: ignore
+            await vector_index.sync(db)
+        logger.info(f"Loaded {len(vector_index)} vectors into in-memory index")
+        vector_index_sync = asyncio.create_task(
+            vector_index.sync_periodically(async_session)  # type: ignore
+        )
+
+    yield
+
+    if vector_index_sync is not None:
+        vector_index_sync.cancel()
+    # Stops retrying a failing warm-up, a running attempt is left to finish
+    warmup.cancel()
+    await asyncio.gather(warmup, return_exceptions=True)
+    mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Added first, so that it runs inside CORS and rejected requests get CORS headers
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.max_upload_bytes,
+    path_max_bytes={"/api/faces/batch": settings.max_archive_upload_bytes},
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[settings.cors_allowed_origin],
@@ -21,7 +113,10 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(faces_router, prefix="/api/faces")
+app.include_router(metrics_router)
+app.include_router(health_router)
 
 logger.info(f"Application settings: {settings}")
@@ -0,0 +1,101 @@
+"""Prometheus metrics collected by the application.
+
+Metric objects are module-level singletons shared by the whole application.
+With multiple uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+(cleared on every start), every worker then writes its metrics there and /metrics
+reports the sum over all workers, whichever of them serves the scrape.
+"""
+
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+inference_queue_wait_seconds = Histogram(
+    "inference_queue_wait_seconds",
+    "Time inference jobs spend waiting for a free executor worker.",
+)
+inference_compute_seconds = Histogram(
+    "inference_compute_seconds",
+    "Time inference jobs spend running on an executor worker.",
+)
+inference_queue_depth = Gauge(
+    "inference_queue_depth",
+    "Number of inference jobs waiting for a free executor worker.",
+    multiprocess_mode="livesum",
+)
+embedding_batch_size = Histogram(
+    "embedding_batch_size",
+    "Number of face crops embedded in a single InceptionResnetV1 forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+inference_rejected_total = Counter(
+    "inference_rejected_total",
+    "Number of inference jobs rejected because the queue was full.",
+)
+embedding_cache_hits_total = Counter(
+    "embedding_cache_hits_total",
+    "Number of feature vectors found in the embedding cache.",
+)
+embedding_cache_misses_total = Counter(
+    "embedding_cache_misses_total",
+    "Number of feature vectors not found in the embedding cache.",
+)
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a database connection from the pool.",
+)
+db_connection_hold_seconds = Histogram(
+    "db_connection_hold_seconds",
+    "Time a database connection stays checked out of the pool.",
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out",
+    "Number of database connections currently checked out of the pool.",
+    multiprocess_mode="livesum",
+)
+http_requests_total = Counter(
+    "http_requests_total",
+    "Number of HTTP requests by method, route handler and status code.",
+    ["method", "handler", "status"],
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving an HTTP request to sending the end of its response.",
+    ["method", "handler"],
+)
+pipeline_stage_seconds = Histogram(
+    "pipeline_stage_seconds",
+    "Time spent in each stage of face enrollment and recognition.",
+    ["stage"],
+)
+gallery_size = Gauge(
+    "gallery_size",
+    "Number of enrolled face images, updated when metrics are collected.",
+    multiprocess_mode="mostrecent",
+)
+
+
+def _is_multiprocess() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def generate_metrics() -> bytes:
+    """Metrics in Prometheus text format, of all workers in multiprocess mode."""
+    if not _is_multiprocess():
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    """Drop live gauges of this worker process on shutdown, in multiprocess mode."""
+    if _is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
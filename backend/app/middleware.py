@@ -0,0 +1,101 @@
+"""ASGI middleware of the application.
+
+- Request count and latency metrics labelled by route handler.
+- Limit of request body size, enforced while the body is received.
+"""
+
+import time
+from typing import Mapping
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import http_request_duration_seconds, http_requests_total
+
+
+class MetricsMiddleware:
+    """Records count and duration of HTTP requests.
+
+    Requests are labelled with the name of the matched route handler
+    (e.g. `get_face_image`) rather than the raw path, so that the number
+    of label values stays bounded. Requests matching no route are labelled
+    `unmatched`. Duration covers the whole response, including streamed bodies.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            handler = getattr(scope.get("route"), "name", "unmatched")
+            http_requests_total.labels(scope["method"], handler, status).inc()
+            http_request_duration_seconds.labels(scope["method"], handler).observe(
+                time.perf_counter() - start
+            )
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects requests with body larger than `max_bytes` with 413 Content Too Large.
+
+    Requests declaring a larger Content-Length are rejected before reading
+    the body. Bodies without a declared length (chunked) are counted while
+    they are received and the request fails as soon as the limit is exceeded,
+    so an oversized upload is never buffered or spooled to disk whole.
+    Requests to paths in `path_max_bytes` are limited to their own size instead
+    (e.g. a larger limit for uploads of archives).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_bytes: int,
+        path_max_bytes: Mapping[str, int] | None = None,
+    ):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_max_bytes = dict(path_max_bytes or {})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_max_bytes.get(scope["path"], self.max_bytes)
+        error_detail = f"Request body larger than {max_bytes} bytes"
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            response = JSONResponse({"detail": error_detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_with_limit() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Raised while FastAPI reads the body, it becomes the response
+                    raise HTTPException(status_code=413, detail=error_detail)
+            return message
+
+        await self.app(scope, receive_with_limit, send)
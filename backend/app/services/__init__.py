@@ -1,11 +1,116 @@
 """Services implementing business logic."""
 
-from .face_embedding import FaceEmbeddingService, get_face_embedding_service
-from .face_recognition import FaceRecognitionService, get_face_recognition_service
+from .blob_store import (
+    BlobStore,
+    LocalBlobStore,
+    detect_content_type,
+    get_blob_store,
+)
+from .embedding_cache import (
+    CachedEmbedding,
+    EmbeddingCache,
+    content_hash,
+    get_embedding_cache,
+)
+from .embedding_snapshot import EmbeddingSnapshot, open_snapshot, write_snapshot
+from .face_embedding import (
+    DetectedFace,
+    FaceEmbeddingService,
+    ImageTransform,
+    decode_face_crop,
+    decode_image,
+    encode_face_crop,
+    get_face_embedding_service,
+    get_model_version,
+    is_face_embedding_service_ready,
+    warm_up_face_embedding_service,
+)
+from .face_recognition import (
+    BatchRecognitionResult,
+    EnrollmentItem,
+    EnrollmentResult,
+    FaceGalleryService,
+    FaceMatch,
+    FaceRecognitionService,
+    FacesCursor,
+    MultiFaceRecognitionResult,
+    ProbeResult,
+    RecognitionResult,
+    RecognizedFace,
+    SearchMode,
+    StoredImage,
+    get_face_gallery_service,
+    get_face_recognition_service,
+)
+from .identities import rebuild_identities, update_identities
+from .inference_executor import (
+    InferenceExecutor,
+    InferenceQueueFullError,
+    get_inference_executor,
+)
+from .thumbnails import (
+    THUMBNAIL_SIZES,
+    ThumbnailCache,
+    ThumbnailFormat,
+    get_thumbnail_cache,
+    render_thumbnail,
+)
+from .vector_index import (
+    FaceRecord,
+    IndexedFace,
+    InMemoryVectorIndex,
+    get_vector_index,
+)
 
 __all__ = [
+    "BlobStore",
+    "LocalBlobStore",
+    "detect_content_type",
+    "get_blob_store",
+    "CachedEmbedding",
+    "EmbeddingCache",
+    "content_hash",
+    "get_embedding_cache",
+    "EmbeddingSnapshot",
+    "open_snapshot",
+    "write_snapshot",
+    "DetectedFace",
     "FaceEmbeddingService",
+    "ImageTransform",
+    "decode_face_crop",
+    "decode_image",
+    "encode_face_crop",
     "get_face_embedding_service",
+    "get_model_version",
+    "is_face_embedding_service_ready",
+    "warm_up_face_embedding_service",
+    "BatchRecognitionResult",
+    "EnrollmentItem",
+    "EnrollmentResult",
+    "FaceGalleryService",
+    "FaceMatch",
     "FaceRecognitionService",
+    "FacesCursor",
+    "MultiFaceRecognitionResult",
+    "ProbeResult",
+    "RecognitionResult",
+    "RecognizedFace",
+    "StoredImage",
+    "SearchMode",
+    "get_face_gallery_service",
     "get_face_recognition_service",
+    "rebuild_identities",
+    "update_identities",
+    "InferenceExecutor",
+    "InferenceQueueFullError",
+    "get_inference_executor",
+    "ThumbnailCache",
+    "ThumbnailFormat",
+    "THUMBNAIL_SIZES",
+    "get_thumbnail_cache",
+    "render_thumbnail",
+    "FaceRecord",
+    "IndexedFace",
+    "InMemoryVectorIndex",
+    "get_vector_index",
 ]
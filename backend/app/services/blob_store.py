@@ -0,0 +1,103 @@
+"""Storage for image files outside of the database.
+
+- Interface and content-addressed local filesystem implementation of BlobStore.
+- Detection of image content type.
+- Dependency injection setup for FastAPI.
+"""
+
+import hashlib
+import os
+import threading
+from io import BytesIO
+from typing import Protocol
+
+from PIL import Image
+
+from app.config import settings
+
+
+def detect_content_type(image_data: bytes) -> str:
+    """Detect MIME type of the image from its header, without decoding it."""
+    try:
+        with Image.open(BytesIO(image_data)) as image:
+            return Image.MIME.get(image.format or "", "application/octet-stream")
+    except Exception:
+        return "application/octet-stream"
+
+
+class BlobStore(Protocol):
+    """Interface for blob stores keeping image files by key."""
+
+    def put(self, data: bytes) -> str:
+        """Store data and return its key."""
+        ...
+
+    def get(self, key: str) -> bytes:
+        """Read data stored under the key.
+
+        Raises KeyError if there is no such blob.
+        """
+        ...
+
+    def local_path(self, key: str) -> str | None:
+        """Path of the blob in the local filesystem, if it can be served directly."""
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    """Content-addressed blob store in a local directory.
+
+    Key of a blob is the SHA-256 hex digest of its data, so storing the same file
+    again is a no-op and stored files never change.
+    Files are spread over `<root>/<2 chars>/<2 chars>/<key>` subdirectories.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data: bytes) -> str:
+        """Write data to a file named by its hash, unless it already exists.
+
+        Blocking, run it off the event loop.
+        """
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+
+        # Write to a temporary file first, readers never see partial files
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return key
+
+    def get(self, key: str) -> bytes:
+        """Read the file with the given key.
+
+        Blocking, run it off the event loop.
+        """
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError as e:
+            raise KeyError(key) from e
+
+    def local_path(self, key: str) -> str | None:
+        """Path of the file with the given key."""
+        return self._path(key)
+
+
+_blob_store: BlobStore = LocalBlobStore(settings.blob_store_path)
+
+
+def get_blob_store() -> BlobStore:
+    """Dependency injector for FastAPI to provide BlobStore instance.
+
+    BlobStore is a singleton shared by all requests.
+    """
+    return _blob_store
@@ -0,0 +1,190 @@
+"""Cache of computed feature vectors and face crops keyed by image content.
+
+- In-memory LRU cache with a memory budget.
+- Optional on-disk backend shared by worker processes.
+- Dependency injection setup for FastAPI.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import BinaryIO, Callable
+
+import numpy as np
+
+from app.config import settings
+from app.logging import logger
+from app.metrics import embedding_cache_hits_total, embedding_cache_misses_total
+from app.services.face_embedding import get_model_version
+
+
+def content_hash(image_data: bytes) -> str:
+    """SHA-256 hex digest of raw image data."""
+    return hashlib.sha256(image_data).hexdigest()
+
+
+@dataclass
+class CachedEmbedding:
+    """Feature vector of an image and the PNG face crop it was computed from.
+
+    The crop is cached only for images that were enrolled, probes do not need it.
+    """
+
+    feature_vector: np.ndarray
+    face_crop: bytes | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.feature_vector.nbytes + len(self.face_crop or b"")
+
+
+class EmbeddingCache:
+    """LRU cache of feature vectors keyed by content hash of the raw image.
+
+    Least recently used entries are evicted when vectors and face crops take
+    more than `max_bytes` of memory. With `disk_path` set, entries are also stored as files
+    shared by all workers on the host and kept across restarts,
+    memory misses fall back to the disk.
+
+    Entries are namespaced by the fingerprint of the model weights,
+    so vectors computed by different models are never mixed.
+    Thread-safe.
+    """
+
+    def __init__(self, max_bytes: int, fingerprint: str, disk_path: str | None = None):
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        self.disk_path = disk_path
+        self._entries: OrderedDict[str, CachedEmbedding] = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        """Memory taken by cached vectors and face crops."""
+        return self._size_bytes
+
+    def get(self, image_hash: str) -> CachedEmbedding | None:
+        """Get cached feature vector (and face crop) of the image, None on a miss."""
+        with self._lock:
+            entry = self._entries.get(image_hash)
+            if entry is not None:
+                self._entries.move_to_end(image_hash)
+
+        if entry is None:
+            entry = self._read_from_disk(image_hash)
+            if entry is not None:
+                self._put_in_memory(image_hash, entry)
+
+        if entry is None:
+            embedding_cache_misses_total.inc()
+        else:
+            embedding_cache_hits_total.inc()
+        return entry
+
+    def put(self, image_hash: str, vector: np.ndarray, face_crop: bytes | None = None):
+        """Store feature vector of the image, with its PNG face crop if given.
+
+        A face crop cached before is kept when the vector is stored without one.
+        """
+        entry = CachedEmbedding(np.asarray(vector, dtype=np.float32), face_crop)
+        if face_crop is None:
+            with self._lock:
+                previous = self._entries.get(image_hash)
+            if previous is not None:
+                entry.face_crop = previous.face_crop
+        self._put_in_memory(image_hash, entry)
+        self._write_to_disk(image_hash, entry)
+
+    def _put_in_memory(self, image_hash: str, entry: CachedEmbedding):
+        if entry.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(image_hash, None)
+            if previous is not None:
+                self._size_bytes -= previous.nbytes
+            self._entries[image_hash] = entry
+            self._size_bytes += entry.nbytes
+
+            while self._size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size_bytes -= evicted.nbytes
+
+    def _disk_file(self, image_hash: str, extension: str) -> str:
+        assert self.disk_path is not None
+        return os.path.join(
+            self.disk_path,
+            self.fingerprint,
+            image_hash[:2],
+            f"{image_hash}.{extension}",
+        )
+
+    def _read_from_disk(self, image_hash: str) -> CachedEmbedding | None:
+        if self.disk_path is None:
+            return None
+        try:
+            vector = np.load(self._disk_file(image_hash, "npy"))
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(self._disk_file(image_hash, "png"), "rb") as f:
+                face_crop = f.read()
+        except OSError:
+            face_crop = None
+        return CachedEmbedding(vector, face_crop)
+
+    def _write_to_disk(self, image_hash: str, entry: CachedEmbedding):
+        if self.disk_path is None:
+            return
+
+        self._write_file(
+            self._disk_file(image_hash, "npy"),
+            lambda f: np.save(f, entry.feature_vector),
+        )
+        if entry.face_crop is not None:
+            face_crop = entry.face_crop
+            self._write_file(
+                self._disk_file(image_hash, "png"), lambda f: f.write(face_crop)
+            )
+
+    def _write_file(self, path: str, write: Callable[[BinaryIO], object]):
+        if os.path.exists(path):
+            return
+
+        # Write to a temporary file first, readers never see partial files
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write embedding cache file {path}: {e}")
+
+
+_embedding_cache: EmbeddingCache | None = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Dependency injector for FastAPI to provide EmbeddingCache instance.
+
+    The cache is a singleton shared by all requests of the worker process,
+    created on first use.
+    """
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    settings.embedding_cache_max_bytes,
+                    get_model_version(),
+                    settings.embedding_cache_dir,
+                )
+    return _embedding_cache
@@ -0,0 +1,200 @@
+"""On-disk snapshot of gallery feature vectors.
+
+- Snapshot directory layout: raw float32 matrix with id, label and filename sidecars.
+- Writing snapshots streamed from the database.
+- Opening snapshots memory-mapped, so worker processes on one host share
+  a single page-cached copy of the vectors.
+"""
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import FaceImage
+
+EMBEDDINGS_FILE = "embeddings.npy"
+ROWS_FILE = "rows.npy"
+LABELS_FILE = "labels.json"
+FILENAMES_FILE = "filenames.json"
+METADATA_FILE = "metadata.json"
+
+ROW_DTYPE = np.dtype([("id", "V16"), ("created_at", "datetime64[us]")])
+
+
+@dataclass
+class EmbeddingSnapshot:
+    """Memory-mapped snapshot opened from disk.
+
+    Row i of `vectors` is the L2-normalized feature vector of the face image
+    with id `rows["id"][i]` (UUID bytes), label `labels[i]` and filename
+    `filenames[i]`, rows are ordered by `created_at`.
+    All rows created up to `watermark` and visible when the snapshot was taken
+    are included.
+    """
+
+    vectors: np.ndarray
+    rows: np.ndarray
+    labels: list[str | None]
+    filenames: list[str | None]
+    watermark: datetime | None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+
+def open_snapshot(
+    path: str, dim: int = 512, model_version: str | None = None
+) -> EmbeddingSnapshot:
+    """Open snapshot from the directory without reading vectors into memory.
+
+    Raises FileNotFoundError if there is no snapshot in the directory
+    and ValueError if the snapshot files are inconsistent
+    or were written for a different embedding model version.
+    """
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        metadata = json.load(f)
+
+    if model_version is not None and metadata.get("model_version") != model_version:
+        raise ValueError(
+            f"Snapshot has vectors of model version {metadata.get('model_version')}, "
+            f"expected {model_version}"
+        )
+
+    vectors = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+    rows = np.load(os.path.join(path, ROWS_FILE), mmap_mode="r")
+
+    if vectors.dtype != np.float32 or vectors.shape != (metadata["count"], dim):
+        raise ValueError(
+            f"Snapshot vectors have shape {vectors.shape} and type {vectors.dtype}, "
+            f"expected ({metadata['count']}, {dim}) float32"
+        )
+    if rows.dtype != ROW_DTYPE or len(rows) != metadata["count"]:
+        raise ValueError(f"Snapshot rows do not match {metadata['count']} vectors")
+
+    with open(os.path.join(path, LABELS_FILE)) as f:
+        labels = json.load(f)
+    with open(os.path.join(path, FILENAMES_FILE)) as f:
+        filenames = json.load(f)
+    if len(labels) != metadata["count"] or len(filenames) != metadata["count"]:
+        raise ValueError(
+            f"Snapshot labels or filenames do not match {metadata['count']} vectors"
+        )
+
+    watermark = metadata["watermark"]
+    return EmbeddingSnapshot(
+        vectors=vectors,
+        rows=rows,
+        labels=labels,
+        filenames=filenames,
+        watermark=datetime.fromisoformat(watermark) if watermark else None,
+    )
+
+
+async def write_snapshot(
+    db: AsyncSession,
+    path: str,
+    dim: int = 512,
+    batch_size: int = 5000,
+    model_version: str | None = None,
+) -> int:
+    """Write snapshot of all feature vectors in the database to the directory.
+
+    With `model_version` set, only vectors of that embedding model version
+    are written.
+
+    Rows are read in a single REPEATABLE READ transaction, so the count,
+    watermark and streamed rows are consistent with each other.
+    Vectors are written through memory-mapped files, without holding the whole
+    gallery in memory.
+
+    The snapshot is written to a temporary directory and swapped in place
+    of the previous one. Processes that have the previous snapshot open keep
+    their memory maps valid.
+
+    Returns the number of vectors written.
+    """
+    await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+    has_vector = FaceImage.feature_vector.is_not(None)
+    if model_version is not None:
+        has_vector &= FaceImage.embedding_version == model_version
+    count, watermark = (
+        await db.execute(
+            select(func.count(), func.max(FaceImage.created_at)).where(has_vector)
+        )
+    ).one()
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(tmp_path, EMBEDDINGS_FILE),
+        mode="w+",
+        dtype=np.float32,
+        shape=(count, dim),
+    )
+    rows = np.lib.format.open_memmap(
+        os.path.join(tmp_path, ROWS_FILE), mode="w+", dtype=ROW_DTYPE, shape=(count,)
+    )
+    labels: list[str | None] = []
+    filenames: list[str | None] = []
+
+    query = (
+        select(
+            FaceImage.id,
+            FaceImage.feature_vector,
+            FaceImage.created_at,
+            FaceImage.label,
+            FaceImage.filename,
+        )
+        .where(has_vector)
+        .order_by(FaceImage.created_at, FaceImage.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(query)
+
+    offset = 0
+    async for batch in result.partitions():
+        batch_vectors = np.stack([row.feature_vector for row in batch])
+        batch_vectors /= np.linalg.norm(batch_vectors, axis=1, keepdims=True)
+        end = offset + len(batch)
+        vectors[offset:end] = batch_vectors
+        rows["id"][offset:end] = [row.id.bytes for row in batch]
+        rows["created_at"][offset:end] = [row.created_at for row in batch]
+        labels.extend(row.label for row in batch)
+        filenames.extend(row.filename for row in batch)
+        offset = end
+
+    vectors.flush()
+    rows.flush()
+    del vectors, rows
+
+    with open(os.path.join(tmp_path, LABELS_FILE), "w") as f:
+        json.dump(labels, f)
+    with open(os.path.join(tmp_path, FILENAMES_FILE), "w") as f:
+        json.dump(filenames, f)
+    with open(os.path.join(tmp_path, METADATA_FILE), "w") as f:
+        json.dump(
+            {
+                "dim": dim,
+                "count": count,
+                "model_version": model_version,
+                "watermark": watermark.isoformat() if watermark else None,
+            },
+            f,
+        )
+
+    old_path = f"{path}.old"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    return count
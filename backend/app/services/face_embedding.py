@@ -1,55 +1,375 @@
 """Service for extracting face embeddings using ML models.
 
+- Decoding uploaded images at reduced resolution, upright by EXIF orientation.
 - Interface and Torch implementation for FaceEmbeddingService.
+- Detection of all faces in an image, with bounding boxes and probabilities.
+- Lossless PNG encoding of aligned face crops, for re-embedding without detection.
+- Micro-batching of embedding requests from concurrent callers.
 - Initialization and loading weights for facenet-pytorch models.
-- Dependency injection setup for FastAPI.
+- Cache of feature extractors compiled to TorchScript, for fast startup.
+- Optional feature extractor inference modes: channels last, compiled, int8 quantized.
+- Lazy loading and warm-up of the models, dependency injection setup for FastAPI.
+- Selection of local models or the shared inference server (remote_embedding).
 """
 
-from typing import Protocol
+import functools
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Callable, Literal, Protocol, Sequence
 
 import numpy as np
 import torch
-from facenet_pytorch import MTCNN, InceptionResnetV1
-from PIL.Image import Image
+from facenet_pytorch import MTCNN, InceptionResnetV1, extract_face
+from facenet_pytorch.models.mtcnn import fixed_image_standardization
+from PIL import ExifTags, ImageOps
+from PIL.Image import Image, Resampling, fromarray, new
+from PIL.Image import open as open_image
 from torch import Tensor
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
 
 from app.config import settings
 from app.logging import logger
+from app.metrics import embedding_batch_size
+
+
+@dataclass
+class DetectedFace:
+    """Single face detected in an image.
+
+    `box` is (x1, y1, x2, y2) in pixels of the input image.
+    """
+
+    cropped_image: Tensor
+    box: tuple[float, float, float, float]
+    probability: float
+
+
+def encode_face_crop(cropped_image: Tensor) -> bytes:
+    """Encode aligned face crop as a PNG image.
+
+    Crops produced by MTCNN are resized uint8 pixels standardized with
+    `fixed_image_standardization`, so reversing it makes the encoding lossless.
+    """
+    pixels = (cropped_image * 128 + 127.5).round().clamp(0, 255).to(torch.uint8)
+    output = BytesIO()
+    fromarray(pixels.permute(1, 2, 0).cpu().numpy()).save(output, format="PNG")
+    return output.getvalue()
+
+
+def decode_face_crop(data: bytes) -> Tensor:
+    """Decode face crop encoded by `encode_face_crop`, ready for the feature extractor."""
+    with open_image(BytesIO(data)) as image:
+        pixels = np.asarray(image.convert("RGB"))
+    return fixed_image_standardization(
+        torch.from_numpy(pixels.copy()).permute(2, 0, 1).float()
+    )
+
+
+@dataclass
+class ImageTransform:
+    """How a decoded image relates to the pixels of the uploaded image.
+
+    The decoded image is the uploaded one rotated upright by its EXIF
+    `orientation` (1 to 8, 1 means no rotation), then resized to `decoded_size`.
+    `original_size` is the size of the uploaded image, as stored in the file.
+    """
+
+    original_size: tuple[int, int]
+    decoded_size: tuple[int, int]
+    orientation: int = 1
+
+    def to_original(self, box: Sequence[float]) -> tuple[float, float, float, float]:
+        """Map (x1, y1, x2, y2) box in decoded image pixels to uploaded image pixels."""
+        width, height = self.original_size
+        upright_width, upright_height = (
+            (height, width) if self.orientation in (5, 6, 7, 8) else (width, height)
+        )
+        scale_x = upright_width / self.decoded_size[0]
+        scale_y = upright_height / self.decoded_size[1]
+        x1, y1 = self._unrotate(box[0] * scale_x, box[1] * scale_y)
+        x2, y2 = self._unrotate(box[2] * scale_x, box[3] * scale_y)
+        return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+    def _unrotate(self, x: float, y: float) -> tuple[float, float]:
+        """Map point of the upright image back through the EXIF orientation."""
+        width, height = self.original_size
+        match self.orientation:
+            case 2:  # mirrored horizontally
+                return width - x, y
+            case 3:  # rotated 180 degrees
+                return width - x, height - y
+            case 4:  # mirrored vertically
+                return x, height - y
+            case 5:  # transposed
+                return y, x
+            case 6:  # rotated 90 degrees counterclockwise
+                return y, height - x
+            case 7:  # transversed
+                return width - y, height - x
+            case 8:  # rotated 90 degrees clockwise
+                return width - y, x
+            case _:
+                return x, y
+
+
+def decode_image(
+    image_data: bytes, max_side: int | None = None, max_pixels: int | None = None
+) -> tuple[Image, ImageTransform]:
+    """Decode image to RGB, rotated upright according to its EXIF orientation.
+
+    With `max_side`, the longer side of the result is at most `max_side` pixels.
+    JPEG images are decoded directly at a reduced scale (draft mode, 1/2 to 1/8),
+    so large photos are never decoded at full resolution.
+    Returns the image with the transform applied to it, to map coordinates
+    detected in the image back to the uploaded one.
+    Raises ValueError for images with more than `max_pixels` pixels,
+    before decoding them.
+    """
+    with open_image(BytesIO(image_data)) as image:
+        width, height = image.size
+        if max_pixels is not None and width * height > max_pixels:
+            raise ValueError(f"Image too large ({width}x{height} pixels)")
+
+        orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+        if max_side is not None and max(width, height) > max_side:
+            # Draft picks the smallest scale that is not below the requested size
+            scale = max(width, height) / max_side
+            image.draft("RGB", (int(width / scale), int(height / scale)))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    if max_side is not None:
+        image.thumbnail((max_side, max_side), Resampling.BILINEAR)
+    transform = ImageTransform(
+        original_size=(width, height),
+        decoded_size=image.size,
+        orientation=orientation if orientation in range(1, 9) else 1,
+    )
+    return image, transform
 
 
 class FaceEmbeddingService(Protocol):
-    """Interface for face embedding services."""
+    """Interface for face embedding services.
+
+    Feature vectors are comparable only if computed with the same `model_version`.
+    """
+
+    model_version: str
 
     def get_cropped_image(self, image: Image) -> Tensor:
         """Use face detection model to crop and align face from input image."""
         ...
 
+    def detect_faces(self, image: Image) -> list[DetectedFace]:
+        """Detect all faces in the input image, largest first, with their crops."""
+        ...
+
     def compute_feature_vector(self, cropped_image: Tensor) -> np.ndarray:
         """Compute feature vector from cropped face image."""
         ...
 
+    def compute_feature_vectors(self, cropped_images: Sequence[Tensor]) -> np.ndarray:
+        """Compute feature vectors for a batch of cropped face images.
+
+        Returns a matrix with one feature vector per row, in input order.
+        """
+        ...
+
+
+def _box_area(box: Sequence[float]) -> float:
+    return (box[2] - box[0]) * (box[3] - box[1])
+
 
 class TorchFaceEmbeddingService(FaceEmbeddingService):
-    """Implementation of FaceEmbeddingService using models from facenet-pytorch library."""
+    """Implementation of FaceEmbeddingService using models from facenet-pytorch library.
+
+    Images with the longer side above `detection_max_side` are downscaled
+    for face detection, detected boxes are mapped back to the input image
+    and faces are cropped from it, at its full resolution.
+    """
 
-    def __init__(self, detector: MTCNN, feature_extractor: InceptionResnetV1):
+    def __init__(
+        self,
+        detector: MTCNN,
+        feature_extractor: torch.nn.Module,
+        model_version: str = "vggface2",
+        detection_max_side: int | None = None,
+    ):
         self.detector: MTCNN = detector
-        self.feature_extractor: InceptionResnetV1 = feature_extractor
+        self.feature_extractor = feature_extractor
+        self.model_version = model_version
+        self.detection_max_side = detection_max_side
+        # Models are loaded to the same device, TorchScript modules have no parameters
+        self.device = detector.device
+
+    def _detect(self, image: Image) -> tuple[np.ndarray | None, np.ndarray | None]:
+        """Detect face boxes and probabilities with MTCNN, boxes in input image pixels."""
+        width, height = image.size
+        if (
+            self.detection_max_side is None
+            or max(width, height) <= self.detection_max_side
+        ):
+            boxes, probabilities, *_ = self.detector.detect(image)
+            return boxes, probabilities
+
+        scale = self.detection_max_side / max(width, height)
+        detection_image = image.resize(
+            (round(width * scale), round(height * scale)), Resampling.BILINEAR
+        )
+        boxes, probabilities, *_ = self.detector.detect(detection_image)
+        if boxes is not None:
+            scale_x = width / detection_image.width
+            scale_y = height / detection_image.height
+            boxes = boxes * np.array([scale_x, scale_y, scale_x, scale_y])
+        return boxes, probabilities
+
+    def _crop(self, image: Image, box: Sequence[float]) -> Tensor:
+        """Crop face with margin and standardize it, the same way MTCNN does."""
+        cropped_image = extract_face(
+            image, box, self.detector.image_size, self.detector.margin
+        )
+        if self.detector.post_process:
+            cropped_image = fixed_image_standardization(cropped_image)
+        return cropped_image
 
     def get_cropped_image(self, image: Image) -> Tensor:
-        """Detect and crop face from input image using MTCNN detector."""
-        return self.detector(image)
+        """Detect faces with MTCNN and crop the largest one, None if there is none."""
+        boxes, _ = self._detect(image)
+        if boxes is None:
+            return None  # type: ignore
+        return self._crop(image, max(boxes, key=_box_area))
+
+    def detect_faces(self, image: Image) -> list[DetectedFace]:
+        """Detect all faces with a single MTCNN pass and crop each of them.
+
+        Crops are prepared the same way as by `get_cropped_image`.
+        """
+        boxes, probabilities = self._detect(image)
+        if boxes is None or probabilities is None:
+            return []
+
+        faces = [
+            DetectedFace(
+                cropped_image=self._crop(image, box),
+                box=(float(box[0]), float(box[1]), float(box[2]), float(box[3])),
+                probability=float(probability),
+            )
+            for box, probability in zip(boxes, probabilities)
+        ]
+        faces.sort(key=lambda face: _box_area(face.box), reverse=True)
+        return faces
 
     def compute_feature_vector(self, cropped_image: Tensor) -> np.ndarray:
         """Compute feature vector from cropped face image using InceptionResnetV1 model."""
-        return (
-            self.feature_extractor(cropped_image.unsqueeze(0))
-            .detach()
-            .cpu()
-            .numpy()
-            .flatten()
+        return self.compute_feature_vectors([cropped_image])[0]
+
+    def compute_feature_vectors(self, cropped_images: Sequence[Tensor]) -> np.ndarray:
+        """Compute feature vectors in a single InceptionResnetV1 forward pass."""
+        embedding_batch_size.observe(len(cropped_images))
+        with torch.inference_mode():
+            batch = torch.stack(list(cropped_images)).to(self.device)
+            return self.feature_extractor(batch).cpu().numpy()
+
+
+class EmbeddingBatcher:
+    """Collects embedding requests from concurrent threads into batches.
+
+    A background thread waits for the first request, then keeps collecting
+    until `max_batch_size` items are queued or `max_wait_ms` has passed,
+    and computes the whole batch with one call to `compute_batch`.
+    Callers block until their own row of the result is available.
+    """
+
+    def __init__(
+        self,
+        compute_batch: Callable[[Sequence[Tensor]], np.ndarray],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ):
+        self.compute_batch = compute_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue[tuple[Tensor, Future[np.ndarray]]] = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, cropped_image: Tensor) -> np.ndarray:
+        """Queue cropped face image for embedding and wait for its feature vector."""
+        future: Future[np.ndarray] = Future()
+        self._queue.put((cropped_image, future))
+        return future.result()
+
+    def _collect_batch(self) -> list[tuple[Tensor, Future[np.ndarray]]]:
+        """Block until at least one request arrives, then fill the batch."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                vectors = self.compute_batch([image for image, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+class BatchingFaceEmbeddingService(FaceEmbeddingService):
+    """FaceEmbeddingService decorator batching single-image embedding requests.
+
+    Concurrent `compute_feature_vector` calls (e.g. from inference executor threads)
+    are merged into one forward pass of the wrapped service.
+    Detection is delegated unchanged.
+    """
+
+    def __init__(
+        self, service: FaceEmbeddingService, max_batch_size: int, max_wait_ms: float
+    ):
+        self.service = service
+        self.model_version = service.model_version
+        self.batcher = EmbeddingBatcher(
+            service.compute_feature_vectors, max_batch_size, max_wait_ms
         )
 
+    def get_cropped_image(self, image: Image) -> Tensor:
+        """Detect and crop face using the wrapped service."""
+        return self.service.get_cropped_image(image)
+
+    def detect_faces(self, image: Image) -> list[DetectedFace]:
+        """Detect all faces using the wrapped service."""
+        return self.service.detect_faces(image)
+
+    def compute_feature_vector(self, cropped_image: Tensor) -> np.ndarray:
+        """Compute feature vector as part of a batch shared with concurrent callers."""
+        return self.batcher.submit(cropped_image)
+
+    def compute_feature_vectors(self, cropped_images: Sequence[Tensor]) -> np.ndarray:
+        """Compute feature vectors of an already assembled batch directly."""
+        return self.service.compute_feature_vectors(cropped_images)
+
 
 def get_device() -> torch.device:
     """Get available device for PyTorch (prefer GPU, fallback to CPU)."""
@@ -61,22 +381,200 @@ def load_feature_extractor(
 ) -> InceptionResnetV1:
     """Load InceptionResnetV1 model with pretrained or custom weights.
 
-    If no file with model weights is provided, use pretrained weights from facenet-pytorch library.
+    If no file with model weights is provided, use pretrained weights from facenet-pytorch library
+    (downloaded on first use). Custom weights are loaded into an uninitialized model,
+    so pretrained weights are neither downloaded nor loaded.
     """
-    model = InceptionResnetV1(pretrained="vggface2")
-    if weights_path is not None:
+    if weights_path is None:
+        model = InceptionResnetV1(pretrained="vggface2")
+    else:
         logger.info(f"Loading facenet weights from: {weights_path}")
-        state_dict = torch.load(weights_path, weights_only=True)
+        state_dict = torch.load(weights_path, weights_only=True, map_location=device)
         if weights_key in state_dict:
             state_dict = state_dict[weights_key]
 
-        model.load_state_dict(state_dict)
+        # Classification head of the pretrained model is not used for embeddings
+        state_dict = {
+            name: tensor
+            for name, tensor in state_dict.items()
+            if not name.startswith("logits.")
+        }
+        # Parameters on the meta device take no memory and skip random initialization
+        with torch.device("meta"):
+            model = InceptionResnetV1()
+        model.load_state_dict(state_dict, assign=True)
 
     model.to(device)
     model.eval()
     return model
 
 
+def _weights_file_key(weights_path: str | None) -> list[str]:
+    """Identify the weights file by its metadata, without reading it."""
+    if weights_path is None:
+        return []
+    stat = os.stat(weights_path)
+    return [os.path.abspath(weights_path), str(stat.st_size), str(stat.st_mtime_ns)]
+
+
+def _key_digest(key: list[str]) -> str:
+    return hashlib.sha256("\0".join(key).encode()).hexdigest()[:16]
+
+
+def get_weights_fingerprint(
+    weights_path: str | None, weights_key: str, cache_path: str | None = None
+) -> str:
+    """Short hash identifying InceptionResnetV1 weights loaded by `load_feature_extractor`.
+
+    Used as the embedding model version,
+    feature vectors computed with different weights are not comparable.
+    The hash covers the whole weights file. With `cache_path`, it is saved there,
+    keyed by the file metadata, so that the file is read once, not on every start.
+    """
+    if weights_path is None:
+        return "vggface2"
+
+    path = None
+    if cache_path is not None:
+        digest = _key_digest([weights_key, *_weights_file_key(weights_path)])
+        path = os.path.join(cache_path, f"weights-{digest}.fingerprint")
+        try:
+            with open(path) as f:
+                return f.read()
+        except OSError:
+            pass
+
+    digest = hashlib.sha256(weights_key.encode())
+    with open(weights_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()[:16]
+
+    if path is not None:
+        try:
+            # Write to a temporary file first, other workers never read partial files
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(fingerprint)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache weights fingerprint {path}: {e}")
+    return fingerprint
+
+
+def _scripted_model_path(
+    cache_path: str, weights_path: str | None, weights_key: str, device: torch.device
+) -> str:
+    """Path of the cached TorchScript feature extractor for the given weights.
+
+    Keyed by the weights file metadata instead of its contents, so that a cache hit
+    does not read the whole file. Torch version and device are part of the key,
+    as the compiled model may not work with others.
+    """
+    key = [weights_key, torch.__version__, device.type]
+    key += _weights_file_key(weights_path)
+    return os.path.join(cache_path, f"inception_resnet_v1-{_key_digest(key)}.pt")
+
+
+def load_scripted_feature_extractor(
+    weights_path: str | None, weights_key: str, device: torch.device, cache_path: str
+) -> torch.nn.Module:
+    """Load InceptionResnetV1 compiled to TorchScript, from the cache if possible.
+
+    On a cache miss, the model is loaded by `load_feature_extractor`, traced,
+    frozen (weights inlined as constants, batch norm folded into convolutions)
+    and saved to the cache directory. Loading the saved module skips building
+    the model in Python and takes a fraction of the time.
+    """
+    path = _scripted_model_path(cache_path, weights_path, weights_key, device)
+    if os.path.exists(path):
+        try:
+            model = torch.jit.load(path, map_location=device)
+            logger.info(f"Loaded TorchScript feature extractor from: {path}")
+            return model
+        except Exception as e:
+            logger.warning(f"Could not load cached feature extractor {path}: {e}")
+
+    model = load_feature_extractor(weights_path, weights_key, device)
+    with torch.no_grad():
+        # Traced with batch size > 1, the batch dimension stays dynamic
+        example = torch.zeros(2, 3, 160, 160, device=device)
+        scripted = torch.jit.freeze(torch.jit.trace(model, example))
+
+    try:
+        # Write to a temporary file first, other workers never load partial files
+        os.makedirs(cache_path, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        torch.jit.save(scripted, tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved TorchScript feature extractor to: {path}")
+    except OSError as e:
+        logger.warning(f"Could not cache feature extractor {path}: {e}")
+    return scripted
+
+
+FeatureExtractorMode = Literal[
+    "fp32", "channels_last", "compile", "int8_dynamic", "int8_static"
+]
+
+
+class ChannelsLastModule(torch.nn.Module):
+    """Model with weights and inputs in channels last (NHWC) memory format.
+
+    Convolutions on CPU are faster in NHWC, outputs are the same.
+    """
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model.to(memory_format=torch.channels_last)  # type: ignore
+
+    def forward(self, x: Tensor) -> Tensor:
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+def optimize_feature_extractor(
+    model: InceptionResnetV1,
+    mode: FeatureExtractorMode,
+    calibration_crops: Tensor | None = None,
+) -> torch.nn.Module:
+    """Prepare the feature extractor for inference in the given mode.
+
+    - fp32: eager model unchanged.
+    - channels_last: NHWC memory format of weights and inputs.
+    - compile: `torch.compile` with dynamic batch size, compiled on the first call.
+    - int8_dynamic: linear layers with int8 weights.
+    - int8_static: convolutions and linear layers in int8 (FX graph mode),
+      activation ranges calibrated on `calibration_crops`.
+
+    Feature vectors of the other modes differ slightly from fp32,
+    check the drift with `scripts.feature_extractor_modes evaluate` first.
+    Quantized models run on CPU only.
+    """
+    if mode == "fp32":
+        return model
+    if mode == "channels_last":
+        return ChannelsLastModule(model)
+    if mode == "compile":
+        return torch.compile(model, dynamic=True)  # type: ignore
+    if mode == "int8_dynamic":
+        return quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+
+    if calibration_crops is None:
+        raise ValueError("Static quantization needs calibration crops")
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(model.cpu(), qconfig_mapping, (calibration_crops[:2],))
+    with torch.inference_mode():
+        for batch in calibration_crops.split(32):
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def load_calibration_crops(path: str) -> Tensor:
+    """Load face crops saved by `scripts.feature_extractor_modes calibrate`."""
+    return torch.load(path, weights_only=True)
+
+
 def load_face_detector(device: torch.device) -> MTCNN:
     """Load MTCNN face detection model."""
     return MTCNN(
@@ -86,21 +584,188 @@ def load_face_detector(device: torch.device) -> MTCNN:
     ).eval()
 
 
-device = get_device()
-logger.info(f"Using device: {device}")
+@functools.cache
+def get_model_version() -> str:
+    """Embedding model version of the configured weights, without loading the models.
+
+    Computed once per process, the weights file is hashed only on the first start
+    with new weights (see `get_weights_fingerprint`). With the ONNX backend,
+    it is the version recorded when the models were exported. Clients of
+    an inference server compute it from the same settings and check that
+    the server agrees.
+    """
+    if settings.embedding_backend == "onnx":
+        # Imported here, ONNX Runtime is an optional dependency
+        from app.services.onnx_embedding import read_onnx_model_version
+
+        model_version = read_onnx_model_version(settings.onnx_model_path)
+    else:
+        model_version = get_weights_fingerprint(
+            settings.facenet_weights_path,
+            settings.facenet_weights_key,
+            settings.model_cache_path,
+        )
+    logger.info(f"Embedding model version: {model_version}")
+    return model_version
+
+
+def load_face_embedding_service() -> FaceEmbeddingService:
+    """Connect to the inference server if configured, otherwise load the models."""
+    if settings.inference_server_socket is None:
+        return load_local_face_embedding_service()
+
+    # Imported here, the inference server client depends on this module
+    from app.services.remote_embedding import RemoteFaceEmbeddingService
+
+    logger.info(f"Using inference server at: {settings.inference_server_socket}")
+    return RemoteFaceEmbeddingService(
+        settings.inference_server_socket,
+        get_model_version(),
+        settings.inference_server_timeout_s,
+        settings.inference_server_request_timeout_s,
+    )
+
+
+def load_local_face_embedding_service() -> FaceEmbeddingService:
+    """Load models configured in the settings into this process.
+
+    The torch backend loads the feature extractor from the TorchScript cache,
+    unless the cache is disabled. The ONNX backend loads models exported
+    by `scripts.export_onnx`.
+    """
+    service: FaceEmbeddingService
+    if settings.embedding_backend == "onnx":
+        service = load_onnx_face_embedding_service()
+    else:
+        service = load_torch_face_embedding_service()
+
+    if settings.embedding_batch_max_size > 1:
+        logger.info(
+            f"Embedding micro-batching: up to {settings.embedding_batch_max_size} items, "
+            f"{settings.embedding_batch_max_wait_ms} ms max wait"
+        )
+        service = BatchingFaceEmbeddingService(
+            service,
+            settings.embedding_batch_max_size,
+            settings.embedding_batch_max_wait_ms,
+        )
+    return service
+
+
+def load_optimized_feature_extractor(device: torch.device) -> torch.nn.Module:
+    """Load the feature extractor in the mode configured in the settings.
+
+    Bypasses the TorchScript cache, static quantization is calibrated
+    on every startup.
+    """
+    mode = settings.feature_extractor_mode
+    logger.info(f"Feature extractor mode: {mode}")
+    calibration_crops = None
+    if mode == "int8_static":
+        if settings.feature_extractor_calibration_path is None:
+            raise ValueError(
+                "FEATURE_EXTRACTOR_CALIBRATION_PATH is required for int8_static mode"
+            )
+        calibration_crops = load_calibration_crops(
+            settings.feature_extractor_calibration_path
+        )
+    model = load_feature_extractor(
+        settings.facenet_weights_path, settings.facenet_weights_key, device
+    )
+    return optimize_feature_extractor(model, mode, calibration_crops)
+
+
+def load_torch_face_embedding_service() -> TorchFaceEmbeddingService:
+    """Load PyTorch models on the best available device.
+
+    Quantized feature extractors run on CPU, so do the other models then.
+    """
+    if settings.feature_extractor_mode.startswith("int8"):
+        device = torch.device("cpu")
+    else:
+        device = get_device()
+    logger.info(f"Using device: {device}")
+
+    detector = load_face_detector(device)
+    if settings.feature_extractor_mode != "fp32":
+        feature_extractor = load_optimized_feature_extractor(device)
+    elif settings.model_cache_path is None:
+        feature_extractor = load_feature_extractor(
+            settings.facenet_weights_path, settings.facenet_weights_key, device
+        )
+    else:
+        feature_extractor = load_scripted_feature_extractor(
+            settings.facenet_weights_path,
+            settings.facenet_weights_key,
+            device,
+            settings.model_cache_path,
+        )
+
+    return TorchFaceEmbeddingService(
+        detector,
+        feature_extractor,
+        get_model_version(),
+        settings.face_detection_max_side,
+    )
+
 
-_detector = load_face_detector(device)
+def load_onnx_face_embedding_service() -> TorchFaceEmbeddingService:
+    """Load models exported to ONNX, run on CPU by ONNX Runtime."""
+    # Imported here, ONNX Runtime is an optional dependency
+    from app.services.onnx_embedding import OnnxFaceEmbeddingService
 
-_feature_extractor = load_feature_extractor(
-    settings.facenet_weights_path, settings.facenet_weights_key, device
-)
+    logger.info(f"Using ONNX Runtime with models from: {settings.onnx_model_path}")
+    return OnnxFaceEmbeddingService(
+        settings.onnx_model_path,
+        settings.onnx_intra_op_threads,
+        settings.onnx_inter_op_threads,
+        settings.face_detection_max_side,
+    )
 
-_face_embedding_service = TorchFaceEmbeddingService(_detector, _feature_extractor)
+
+_face_embedding_service: FaceEmbeddingService | None = None
+_face_embedding_service_lock = threading.Lock()
+_face_embedding_service_ready = threading.Event()
 
 
 def get_face_embedding_service() -> FaceEmbeddingService:
     """Dependency injector for FastAPI to provide FaceEmbeddingService instance.
 
-    FaceEmbeddingService is a singleton, initialized once at application startup.
+    FaceEmbeddingService is a singleton. Models are loaded on first use,
+    which is normally the warm-up at application startup.
     """
+    global _face_embedding_service
+    if _face_embedding_service is None:
+        with _face_embedding_service_lock:
+            if _face_embedding_service is None:
+                start = time.perf_counter()
+                _face_embedding_service = load_face_embedding_service()
+                elapsed = time.perf_counter() - start
+                logger.info(f"Loaded face embedding models in {elapsed:.2f}s")
     return _face_embedding_service
+
+
+def warm_up_face_embedding_service():
+    """Load the models and run them once, then mark the service as ready.
+
+    The first forward passes allocate memory and select kernels,
+    warm-up makes sure no request pays for it.
+    Blocking, run it off the event loop.
+    """
+    warm_up(get_face_embedding_service())
+    _face_embedding_service_ready.set()
+
+
+def warm_up(service: FaceEmbeddingService):
+    """Run the models once on blank input."""
+    start = time.perf_counter()
+    service.get_cropped_image(new("RGB", (160, 160)))
+    service.compute_feature_vectors([torch.zeros(3, 160, 160)])
+    logger.info(
+        f"Warmed up face embedding models in {time.perf_counter() - start:.2f}s"
+    )
+
+
+def is_face_embedding_service_ready() -> bool:
+    """Whether the models are loaded and warmed up, used by the readiness probe."""
+    return _face_embedding_service_ready.is_set()
@@ -1,81 +1,293 @@
 """Service for face recognition operations.
 
+- Browsing stored face images and thumbnails, without the models.
 - Uses FaceEmbeddingService to process images.
 - Handles database interactions.
+- Keeps identity templates up to date on enrollment.
+- Records latency of pipeline stages (decoding, detection, embedding, search).
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from io import BytesIO
-from typing import Sequence
+import asyncio
+import base64
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Collection, Literal, Sequence
+from typing import cast as type_cast
 from uuid import UUID
 
+import numpy as np
 from fastapi import Depends, UploadFile
+from pgvector import Vector
+from pgvector.sqlalchemy import BIT, HALFVEC
 from PIL import Image
-from sqlalchemy import select, text
+from sqlalchemy import (
+    ARRAY,
+    ColumnElement,
+    FromClause,
+    Select,
+    Text,
+    cast,
+    func,
+    insert,
+    literal,
+    select,
+    text,
+    true,
+    tuple_,
+)
 from sqlalchemy.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import aliased, undefer
+from torch import Tensor
 
-from app.db import FaceImage, get_db
-from app.services.face_embedding import FaceEmbeddingService, get_face_embedding_service
+from app.config import settings
+from app.db import FaceImage, Identity, get_db
+from app.metrics import pipeline_stage_seconds
+from app.services.blob_store import BlobStore, detect_content_type, get_blob_store
+from app.services.embedding_cache import (
+    CachedEmbedding,
+    EmbeddingCache,
+    content_hash,
+    get_embedding_cache,
+)
+from app.services.face_embedding import (
+    DetectedFace,
+    FaceEmbeddingService,
+    ImageTransform,
+    decode_image,
+    encode_face_crop,
+    get_face_embedding_service,
+)
+from app.services.identities import update_identities
+from app.services.inference_executor import InferenceExecutor, get_inference_executor
+from app.services.thumbnails import (
+    THUMBNAIL_CONTENT_TYPES,
+    ThumbnailCache,
+    ThumbnailFormat,
+    get_thumbnail_cache,
+    render_thumbnail,
+)
+from app.services.vector_index import (
+    FaceRecord,
+    InMemoryVectorIndex,
+    get_vector_index,
+)
+
+# Vector search strategy:
+# - exact - full scan with perfect recall, index scans disabled for the query
+# - hnsw - approximate search using the HNSW index with default `hnsw.ef_search`
+#   (raised to k if lower, HNSW finds at most ef_search rows)
+# - hnsw_tuned - HNSW index with `hnsw.ef_search` raised for better recall
+# - memory - exact search in the in-process vector index, no database round trip
+# - identity - nearest identity templates (HNSW index), re-ranked by the closest
+#   image of each identity, returns one match per person
+# With reduced vector search precision in settings, hnsw modes find candidates
+# with a halfvec or binary quantized index and re-rank them by exact float distance
+SearchMode = Literal["exact", "hnsw", "hnsw_tuned", "memory", "identity"]
 
 
 @dataclass
-class RecognitionResult:
-    """Result of face recognition search."""
+class FaceMatch:
+    """Single face found by recognition search."""
 
     face_image: FaceImage
     cosine_similarity: float
     cosine_distance: float
+
+
+@dataclass
+class RecognitionResult:
+    """Result of face recognition search.
+
+    Matches are ordered from the closest one.
+    """
+
+    matches: list[FaceMatch]
     search_vector: list[float]
+    search_mode: SearchMode
+    search_latency_ms: float
 
 
-class FaceRecognitionService:
-    """Application service for face recognition operations."""
+@dataclass
+class RecognizedFace:
+    """Face detected in an image together with its closest matches.
 
-    def __init__(self, face_embedding_service: FaceEmbeddingService, db: AsyncSession):
-        self.face_embedding_service = face_embedding_service
-        self.db = db
+    `box` is (x1, y1, x2, y2) in pixels of the uploaded image as stored,
+    before rotating it by its EXIF orientation.
+    """
 
-    def _to_pil_image(self, image_bytes: bytes) -> Image.Image:
-        """Create PIL Image from raw image data."""
-        return Image.open(BytesIO(image_bytes)).convert("RGB")
+    box: tuple[float, float, float, float]
+    probability: float
+    matches: list[FaceMatch]
 
-    async def add_face_image(self, file: UploadFile, label: str) -> FaceImage:
-        """Add a new face image to the database."""
-        image_data = await file.read()
-        image = self._to_pil_image(image_data)
-        cropped_img = self.face_embedding_service.get_cropped_image(image)
-        feature_vector = self.face_embedding_service.compute_feature_vector(cropped_img)
 
-        face_image = FaceImage(
-            image_data=image_data,
-            feature_vector=feature_vector,
-            label=label,
-            filename=file.filename,
-        )
+@dataclass
+class MultiFaceRecognitionResult:
+    """Result of face recognition search for every face detected in an image.
 
-        self.db.add(face_image)
-        await self.db.commit()
-        await self.db.refresh(face_image)
+    Faces are ordered from the largest one.
+    """
 
-        return face_image
+    faces: list[RecognizedFace]
+    search_mode: SearchMode
+    search_latency_ms: float
+
+
+@dataclass
+class ProbeResult:
+    """Recognition result of a single probe image of a batch.
+
+    Matches are ordered from the closest one, `error` is set if the probe
+    could not be processed.
+    """
+
+    index: int
+    filename: str | None
+    matches: list[FaceMatch] = field(default_factory=list)
+    error: str | None = None
+
+
+@dataclass
+class BatchRecognitionResult:
+    """Result of face recognition search for many probe images, in input order."""
+
+    probes: list[ProbeResult]
+    search_mode: SearchMode
+    search_latency_ms: float
+
+
+@dataclass
+class StoredImage:
+    """Face image file with metadata for serving it over HTTP.
+
+    Exactly one of `path` (file in a local blob store) and `data` is set.
+    """
+
+    content_type: str
+    content_hash: str
+    etag: str
+    last_modified: datetime
+    path: str | None = None
+    data: bytes | None = None
+
+
+@dataclass
+class FacesCursor:
+    """Position in the face listing for keyset pagination.
+
+    Points at the last face of the previous page in (created_at, id) order.
+    """
+
+    created_at: datetime
+    id: UUID
+
+    def encode(self) -> str:
+        """Encode cursor as an opaque URL-safe string."""
+        raw = f"{self.created_at.isoformat()}|{self.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> FacesCursor:
+        """Decode cursor from string created by `encode`.
+
+        Raises ValueError if the cursor is malformed.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, id = raw.split("|")
+            return cls(created_at=datetime.fromisoformat(created_at), id=UUID(id))
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+@dataclass
+class EnrollmentItem:
+    """Single face image to enroll as part of a batch."""
+
+    image_data: bytes
+    label: str
+    filename: str | None
+
+
+@dataclass
+class EnrollmentResult:
+    """Outcome of enrolling a single item of a batch.
+
+    Exactly one of `face_image_id` and `error` is set.
+    """
+
+    index: int
+    filename: str | None
+    label: str
+    face_image_id: UUID | None = None
+    error: str | None = None
+
+
+class FaceGalleryService:
+    """Application service for browsing stored face images.
+
+    Does not need the face embedding models, so it serves requests
+    while the models are still loading.
+    """
+
+    def __init__(
+        self,
+        blob_store: BlobStore,
+        thumbnail_cache: ThumbnailCache,
+        db: AsyncSession,
+    ):
+        self.blob_store = blob_store
+        self.thumbnail_cache = thumbnail_cache
+        self.db = db
+
+    async def _release_connection(self):
+        """Return the database connection of the session to the pool.
+
+        Called after read-only queries followed by slow work (inference, file I/O,
+        sending the response), the next query checks out a connection again.
+        Loaded objects stay usable, detached from the session.
+        """
+        await self.db.close()
 
     async def get_faces(self, page: int, page_size: int) -> Sequence[FaceImage]:
         """Retrieve paginated list of face images.
 
-        Lightweight, no image data included.
+        Lightweight, image data and feature vectors are deferred and not loaded.
+        Cost grows with the page number, prefer `get_faces_after` for deep pages.
         """
         offset = (page - 1) * page_size
 
         result = await self.db.execute(
             select(FaceImage)
-            .order_by(FaceImage.created_at.desc())
+            .order_by(FaceImage.created_at.desc(), FaceImage.id.desc())
             .offset(offset)
             .limit(page_size)
         )
         return result.scalars().all()
 
+    async def get_faces_after(
+        self, cursor: FacesCursor | None, page_size: int
+    ) -> Sequence[FaceImage]:
+        """Retrieve the page of face images following the cursor (keyset pagination).
+
+        Uses the (created_at, id) index to seek directly to the cursor,
+        so the cost is the same for every page.
+        """
+        query = select(FaceImage).order_by(
+            FaceImage.created_at.desc(), FaceImage.id.desc()
+        )
+        if cursor is not None:
+            query = query.where(
+                tuple_(FaceImage.created_at, FaceImage.id)
+                < tuple_(cursor.created_at, cursor.id)
+            )
+
+        result = await self.db.execute(query.limit(page_size))
+        return result.scalars().all()
+
     async def get_all_faces_count(self) -> int:
         """Get total count of face images in the database.
 
@@ -84,59 +296,1049 @@ class FaceRecognitionService:
         result = await self.db.execute(select(text("COUNT(*)")).select_from(FaceImage))
         return result.scalar_one()
 
+    async def get_approximate_faces_count(self) -> int:
+        """Estimate count of face images from PostgreSQL table statistics.
+
+        Constant time regardless of table size, as accurate as the last
+        (auto)vacuum or analyze. Falls back to exact count if the table
+        has never been analyzed.
+        """
+        result = await self.db.execute(
+            text(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = 'face_images'::regclass"
+            )
+        )
+        estimate = result.scalar_one()
+        if estimate < 0:
+            return await self.get_all_faces_count()
+        return estimate
+
     async def get_face_by_id(self, id: str) -> FaceImage:
-        """Retrieve a face image record by its ID."""
+        """Retrieve a face image record by its ID.
+
+        Image data and feature vector are not loaded.
+        """
         result = await self.db.execute(
             select(FaceImage).where(FaceImage.id == UUID(id))
         )
         return result.scalar_one_or_none()
 
-    async def find_closest_face(self, file: UploadFile) -> RecognitionResult | None:
-        """Find the closest matching face in the database for the uploaded image.
+    async def get_face_image_file(self, id: str) -> StoredImage | None:
+        """Retrieve the image file of a face image by its ID, with HTTP metadata.
+
+        Files in a local blob store are not read, only their path is returned.
+        """
+        result = await self.db.execute(
+            select(
+                FaceImage.image_key,
+                FaceImage.image_data,
+                FaceImage.content_type,
+                FaceImage.content_hash,
+                FaceImage.created_at,
+            ).where(FaceImage.id == UUID(id))
+        )
+        row = result.one_or_none()
+        await self._release_connection()
+        if row is None:
+            return None
+
+        image_key, image_data, content_type, image_hash, created_at = row
+        path = None
+        if image_key is not None:
+            path = self.blob_store.local_path(image_key)
+            if path is None:
+                image_data = await asyncio.to_thread(self.blob_store.get, image_key)
+
+        if image_data is not None:
+            content_type = content_type or detect_content_type(image_data)
+            image_hash = image_hash or content_hash(image_data)
+
+        image_hash = image_hash or image_key
+        if image_hash is None:
+            # Neither image data nor a blob, nothing to serve
+            return None
+        return StoredImage(
+            content_type=content_type or "application/octet-stream",
+            content_hash=image_hash,
+            etag=f'"{image_hash}"',
+            last_modified=created_at,
+            path=path,
+            data=image_data if path is None else None,
+        )
+
+    async def get_face_thumbnail(
+        self, id: str, size: int, format: ThumbnailFormat
+    ) -> StoredImage | None:
+        """Retrieve a downscaled rendition of a face image by its ID.
+
+        Thumbnails are rendered on the first request, off the event loop,
+        and kept in the thumbnail cache.
+        The original image is loaded only on a thumbnail cache miss.
+        """
+        result = await self.db.execute(
+            select(
+                FaceImage.image_key, FaceImage.content_hash, FaceImage.created_at
+            ).where(FaceImage.id == UUID(id))
+        )
+        row = result.one_or_none()
+        await self._release_connection()
+        if row is None:
+            return None
+
+        image_key, image_hash, created_at = row
+        key = image_hash or image_key
+        image = None
+        if key is None:
+            # Rows without a stored hash are keyed by the hash of their data
+            image = await self.get_face_image_file(id)
+            if image is None:
+                return None
+            key = image.content_hash
+
+        thumbnail = await asyncio.to_thread(self.thumbnail_cache.get, key, size, format)
+        if thumbnail is None:
+            image = image or await self.get_face_image_file(id)
+            if image is None:
+                return None
+            thumbnail = await asyncio.to_thread(
+                self._render_thumbnail, image, key, size, format
+            )
+
+        return StoredImage(
+            content_type=THUMBNAIL_CONTENT_TYPES[format],
+            content_hash=key,
+            etag=f'"{key}-{size}.{format}"',
+            last_modified=created_at,
+            data=thumbnail,
+        )
 
-        Returns the closest face in terms of cosine similarity.
-        Search uses pgvector vector index for efficiency.
-        According to pgvector docs, the results are approximate and may not be 100% accurate
-        as a tradeoff for speed.
+    def _render_thumbnail(
+        self, image: StoredImage, key: str, size: int, format: ThumbnailFormat
+    ) -> bytes:
+        """Render thumbnail of the image and store it in the thumbnail cache.
+
+        Blocking, must be run off the event loop.
+        """
+        image_data = image.data
+        if image_data is None:
+            assert image.path is not None
+            with open(image.path, "rb") as f:
+                image_data = f.read()
+
+        thumbnail = render_thumbnail(image_data, size, format)
+        self.thumbnail_cache.put(key, size, format, thumbnail)
+        return thumbnail
+
+
+class FaceRecognitionService(FaceGalleryService):
+    """Application service for face recognition operations."""
+
+    def __init__(
+        self,
+        face_embedding_service: FaceEmbeddingService,
+        inference_executor: InferenceExecutor,
+        vector_index: InMemoryVectorIndex,
+        embedding_cache: EmbeddingCache,
+        blob_store: BlobStore,
+        thumbnail_cache: ThumbnailCache,
+        db: AsyncSession,
+    ):
+        super().__init__(blob_store, thumbnail_cache, db)
+        self.face_embedding_service = face_embedding_service
+        self.inference_executor = inference_executor
+        self.vector_index = vector_index
+        self.embedding_cache = embedding_cache
+
+    @property
+    def memory_index_enabled(self) -> bool:
+        """Whether the in-process vector index is used and kept up to date."""
+        return settings.search_backend == "memory"
+
+    @property
+    def model_version(self) -> str:
+        """Embedding model version of computed feature vectors.
+
+        Only stored vectors of the same version are comparable and searched.
+        """
+        return self.face_embedding_service.model_version
+
+    def _to_pil_image(self, image_bytes: bytes) -> tuple[Image.Image, ImageTransform]:
+        """Decode raw image data, downscaled to the configured maximum size.
+
+        Returns the image with the transform applied to it by decoding.
+        Raises ValueError if the image has too many pixels.
+        """
+        with pipeline_stage_seconds.labels("decode").time():
+            return decode_image(
+                image_bytes, settings.image_decode_max_side, settings.max_image_pixels
+            )
+
+    async def _store_image(self, image_data: bytes) -> dict:
+        """Store image file according to settings.
+
+        Returns values of FaceImage columns describing the stored file.
+        Files go to the blob store, or to the `image_data` column
+        with database image storage.
+        """
+        columns = {
+            "content_type": detect_content_type(image_data),
+            "image_size": len(image_data),
+        }
+        if settings.image_storage == "blob_store":
+            with pipeline_stage_seconds.labels("store_image").time():
+                columns["image_key"] = await asyncio.to_thread(
+                    self.blob_store.put, image_data
+                )
+        else:
+            columns["image_data"] = image_data
+        return columns
+
+    def _crop_face(self, image_bytes: bytes) -> Tensor:
+        """Decode image and crop the face from it.
+
+        Raises ValueError if no face is detected.
+        """
+        image, _ = self._to_pil_image(image_bytes)
+        with pipeline_stage_seconds.labels("detect").time():
+            cropped_img = self.face_embedding_service.get_cropped_image(image)
+        if cropped_img is None:
+            raise ValueError("No face detected in the image")
+        return cropped_img
+
+    def _compute_feature_vector(
+        self, image_bytes: bytes, encode_crop: bool = False
+    ) -> tuple[np.ndarray, bytes | None]:
+        """Decode image, crop the face and compute its feature vector.
+
+        Blocking and CPU-bound, must be run through the inference executor.
+        Returns the feature vector and, with `encode_crop`, the face crop as PNG.
+        """
+        cropped_img = self._crop_face(image_bytes)
+        with pipeline_stage_seconds.labels("embed").time():
+            feature_vector = self.face_embedding_service.compute_feature_vector(
+                cropped_img
+            )
+        return feature_vector, encode_face_crop(cropped_img) if encode_crop else None
+
+    def _compute_feature_vectors(
+        self, images: Sequence[bytes], encode_crops: bool = False
+    ) -> list[tuple[np.ndarray, bytes | None] | Exception]:
+        """Crop faces from all images and embed them in a single batch.
+
+        Blocking and CPU-bound, must be run through the inference executor.
+        Returns (feature vector, PNG face crop) pairs like `_compute_feature_vector`.
+        Images that fail to decode or contain no face get their exception
+        in place of the pair.
+        """
+        crops: list[Tensor | Exception] = []
+        for image_bytes in images:
+            try:
+                crops.append(self._crop_face(image_bytes))
+            except Exception as e:
+                crops.append(e)
+
+        valid_crops = [crop for crop in crops if isinstance(crop, Tensor)]
+        if not valid_crops:
+            return [crop for crop in crops if isinstance(crop, Exception)]
+
+        with pipeline_stage_seconds.labels("embed").time():
+            vectors = iter(
+                self.face_embedding_service.compute_feature_vectors(valid_crops)
+            )
+        return [
+            (
+                (next(vectors), encode_face_crop(crop) if encode_crops else None)
+                if isinstance(crop, Tensor)
+                else crop
+            )
+            for crop in crops
+        ]
+
+    def _detect_and_embed_faces(
+        self, image_bytes: bytes
+    ) -> tuple[list[DetectedFace], np.ndarray]:
+        """Decode image, detect all faces and embed them in a single batch.
+
+        Blocking and CPU-bound, must be run through the inference executor.
+        Faces detected with probability below the configured minimum are skipped.
+        Face boxes are mapped back to pixels of the uploaded image.
+        Raises ValueError if no face is detected.
+        """
+        image, transform = self._to_pil_image(image_bytes)
+        with pipeline_stage_seconds.labels("detect").time():
+            faces = [
+                replace(face, box=transform.to_original(face.box))
+                for face in self.face_embedding_service.detect_faces(image)
+                if face.probability >= settings.face_detection_min_probability
+            ]
+        if not faces:
+            raise ValueError("No face detected in the image")
+
+        with pipeline_stage_seconds.labels("embed").time():
+            vectors = self.face_embedding_service.compute_feature_vectors(
+                [face.cropped_image for face in faces]
+            )
+        return faces, vectors
+
+    async def _lookup_embeddings(
+        self, image_hashes: Sequence[str], check_stored: bool, with_crops: bool
+    ) -> list[CachedEmbedding | None]:
+        """Find embeddings of the images in the cache and, with `check_stored`,
+        of byte-identical images already in the database.
+
+        With `with_crops`, embeddings without a face crop count as missing,
+        so that the crop is computed together with the vector.
+        """
+
+        def usable(entry: CachedEmbedding | None) -> bool:
+            return entry is not None and (not with_crops or entry.face_crop is not None)
+
+        entries = [self.embedding_cache.get(image_hash) for image_hash in image_hashes]
+        entries = [entry if usable(entry) else None for entry in entries]
+
+        missing = [h for h, entry in zip(image_hashes, entries) if entry is None]
+        if check_stored and missing:
+            stored = await self._get_stored_embeddings(missing, with_crops)
+            entries = [
+                entry or (stored.get(h) if usable(stored.get(h)) else None)
+                for h, entry in zip(image_hashes, entries)
+            ]
+        return entries
+
+    async def _get_feature_vector(
+        self,
+        image_data: bytes,
+        image_hash: str,
+        check_stored: bool = False,
+        face_crops: dict[str, bytes] | None = None,
+    ) -> np.ndarray:
+        """Get feature vector of the image from the embedding cache or compute it.
+
+        With `check_stored`, feature vector of a byte-identical image already
+        in the database is reused before running inference.
+        If `face_crops` is given, face crop of the image is added to it as PNG
+        under the image hash, taken from the cache or the database with the vector.
+        """
+        with_crop = face_crops is not None
+        [entry] = await self._lookup_embeddings([image_hash], check_stored, with_crop)
+        if entry is None:
+            feature_vector, face_crop = await self.inference_executor.run(
+                self._compute_feature_vector, image_data, with_crop
+            )
+            entry = CachedEmbedding(feature_vector, face_crop)
+
+        self.embedding_cache.put(image_hash, entry.feature_vector, entry.face_crop)
+        if face_crops is not None and entry.face_crop is not None:
+            face_crops[image_hash] = entry.face_crop
+        return entry.feature_vector
+
+    async def _get_feature_vectors(
+        self,
+        images: Sequence[bytes],
+        image_hashes: Sequence[str],
+        check_stored: bool = False,
+        face_crops: dict[str, bytes] | None = None,
+    ) -> list[np.ndarray | Exception]:
+        """Get feature vectors of many images, like `_get_feature_vector`.
+
+        Images not found in the cache (or the database) are embedded
+        in a single inference job.
+        """
+        with_crops = face_crops is not None
+        entries: list[CachedEmbedding | Exception | None] = [
+            *await self._lookup_embeddings(image_hashes, check_stored, with_crops)
+        ]
+
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        if missing:
+            computed = await self.inference_executor.run(
+                self._compute_feature_vectors, [images[i] for i in missing], with_crops
+            )
+            for i, item in zip(missing, computed):
+                entries[i] = (
+                    item if isinstance(item, Exception) else CachedEmbedding(*item)
+                )
+
+        vectors: list[np.ndarray | Exception] = []
+        for image_hash, entry in zip(image_hashes, entries):
+            if not isinstance(entry, CachedEmbedding):
+                vectors.append(entry)  # type: ignore
+                continue
+            self.embedding_cache.put(image_hash, entry.feature_vector, entry.face_crop)
+            if face_crops is not None and entry.face_crop is not None:
+                face_crops[image_hash] = entry.face_crop
+            vectors.append(entry.feature_vector)
+        return vectors
+
+    async def _get_stored_embeddings(
+        self, image_hashes: Collection[str], with_crops: bool = False
+    ) -> dict[str, CachedEmbedding]:
+        """Get feature vectors (and face crops) of enrolled images by content hash.
+
+        Only vectors of the current embedding model version are returned.
+        Of byte-identical images, one with a stored face crop is preferred.
+        The connection is released right away, inference usually follows.
+        """
+        columns = [FaceImage.content_hash, FaceImage.feature_vector]
+        if with_crops:
+            columns.append(FaceImage.face_crop)
+        with pipeline_stage_seconds.labels("stored_vector_lookup").time():
+            result = await self.db.execute(
+                select(*columns).where(
+                    FaceImage.content_hash.in_(set(image_hashes)),
+                    FaceImage.feature_vector.is_not(None),
+                    FaceImage.embedding_version == self.model_version,
+                )
+            )
+
+        stored: dict[str, CachedEmbedding] = {}
+        for image_hash, vector, *face_crop in result.all():
+            entry = CachedEmbedding(vector, face_crop[0] if face_crop else None)
+            if image_hash not in stored or stored[image_hash].face_crop is None:
+                stored[image_hash] = entry
+        await self._release_connection()
+        return stored
+
+    async def add_face_image(self, file: UploadFile, label: str) -> FaceImage:
+        """Add a new face image to the database.
+
+        Inference is skipped for images that are cached or already enrolled,
+        their face crop is reused from the cache or the enrolled image.
+        """
+        image_data = await file.read()
+        image_hash = content_hash(image_data)
+        face_crops: dict[str, bytes] = {}
+        feature_vector = await self._get_feature_vector(
+            image_data, image_hash, check_stored=True, face_crops=face_crops
+        )
+
+        face_image = FaceImage(
+            **await self._store_image(image_data),
+            feature_vector=feature_vector,
+            embedding_version=self.model_version,
+            face_crop=face_crops.get(image_hash),
+            label=label,
+            filename=file.filename,
+            content_hash=image_hash,
+        )
+
+        self.db.add(face_image)
+        with pipeline_stage_seconds.labels("db_insert").time():
+            await update_identities(
+                self.db, self.model_version, [(label, feature_vector)]
+            )
+            await self.db.commit()
+        await self.db.refresh(face_image)
+        await self._release_connection()
+
+        if self.memory_index_enabled:
+            self.vector_index.add(
+                UUID(str(face_image.id)),
+                feature_vector,
+                FaceRecord(
+                    label, file.filename, type_cast(datetime, face_image.created_at)
+                ),
+            )
+
+        return face_image
+
+    async def add_face_images(
+        self, items: AsyncIterable[EnrollmentItem]
+    ) -> AsyncIterator[EnrollmentResult]:
+        """Add many face images to the database, processing them in chunks.
+
+        Each chunk is embedded in one batch and stored with one multi-row INSERT.
+        Results are yielded in input order as soon as their chunk is committed,
+        failed items are reported without interrupting the rest of the batch.
+        """
+        chunk: list[EnrollmentItem] = []
+        start_index = 0
+
+        async for item in items:
+            chunk.append(item)
+            if len(chunk) == settings.enrollment_chunk_size:
+                for result in await self._add_face_images_chunk(chunk, start_index):
+                    yield result
+                start_index += len(chunk)
+                chunk = []
+
+        if chunk:
+            for result in await self._add_face_images_chunk(chunk, start_index):
+                yield result
+
+    async def _add_face_images_chunk(
+        self, chunk: Sequence[EnrollmentItem], start_index: int
+    ) -> list[EnrollmentResult]:
+        """Embed and insert a single chunk of a batch enrollment.
+
+        Inference is skipped for images that are cached or already enrolled.
+        """
+        results = [
+            EnrollmentResult(
+                index=start_index + i, filename=item.filename, label=item.label
+            )
+            for i, item in enumerate(chunk)
+        ]
+        image_hashes = [content_hash(item.image_data) for item in chunk]
+        face_crops: dict[str, bytes] = {}
+
+        try:
+            vectors = await self._get_feature_vectors(
+                [item.image_data for item in chunk],
+                image_hashes,
+                check_stored=True,
+                face_crops=face_crops,
+            )
+        except Exception as e:
+            for result in results:
+                result.error = str(e)
+            return results
+
+        rows = []
+        for item, result, vector, image_hash in zip(
+            chunk, results, vectors, image_hashes
+        ):
+            if isinstance(vector, Exception):
+                result.error = str(vector)
+                continue
+            try:
+                stored_image = await self._store_image(item.image_data)
+            except Exception as e:
+                result.error = f"Storing image failed: {e}"
+                continue
+
+            result.face_image_id = uuid.uuid4()
+            rows.append(
+                {
+                    "id": result.face_image_id,
+                    **stored_image,
+                    "feature_vector": vector,
+                    "embedding_version": self.model_version,
+                    "face_crop": face_crops.get(image_hash),
+                    "label": item.label,
+                    "filename": item.filename,
+                    "content_hash": image_hash,
+                }
+            )
+
+        if not rows:
+            return results
+
+        try:
+            with pipeline_stage_seconds.labels("db_insert").time():
+                result = await self.db.execute(
+                    insert(FaceImage).returning(
+                        FaceImage.id, FaceImage.created_at, sort_by_parameter_order=True
+                    ),
+                    rows,
+                )
+                created_at = dict(result.tuples().all())
+                await update_identities(
+                    self.db,
+                    self.model_version,
+                    [(row["label"], row["feature_vector"]) for row in rows],
+                )
+                await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            for result in results:
+                if result.face_image_id is not None:
+                    result.face_image_id = None
+                    result.error = f"Database insert failed: {e}"
+            return results
+
+        if self.memory_index_enabled:
+            self.vector_index.add_many(
+                [row["id"] for row in rows],
+                np.stack([row["feature_vector"] for row in rows]),
+                [
+                    FaceRecord(row["label"], row["filename"], created_at[row["id"]])
+                    for row in rows
+                ],
+            )
+
+        return results
+
+    async def find_closest_faces(
+        self,
+        file: UploadFile,
+        k: int = 1,
+        threshold: float | None = None,
+        mode: SearchMode | None = None,
+        ef_search: int | None = None,
+    ) -> RecognitionResult:
+        """Find the k closest matching faces in the database for the uploaded image.
+
+        Faces are compared in terms of cosine similarity, matches with cosine distance
+        above `threshold` are dropped.
+        Search uses pgvector vector index for efficiency, unless `exact` mode is used.
+        According to pgvector docs, the index results are approximate and may not be
+        100% accurate as a tradeoff for speed. `hnsw_tuned` mode trades some of the speed
+        back for recall with a larger candidate list (`ef_search`, defaults to settings).
+        `memory` mode searches the in-process vector index instead of the database,
+        it is the default when enabled in settings.
+        `identity` mode searches identity templates first and returns the closest
+        image of each of the k closest persons, so matches are distinct persons.
+        In all modes, only faces embedded with the current model version are searched.
 
         https://github.com/pgvector/pgvector?tab=readme-ov-file#indexing
         """
+        mode = self._resolve_search_mode(mode)
+
         image_data = await file.read()
-        image = self._to_pil_image(image_data)
-        cropped_img = self.face_embedding_service.get_cropped_image(image)
-        search_vector = self.face_embedding_service.compute_feature_vector(
-            cropped_img
-        ).tolist()
+        feature_vector = await self._get_feature_vector(
+            image_data, content_hash(image_data)
+        )
+        search_vector = feature_vector.tolist()
 
-        result = await self.db.execute(
-            select(
-                FaceImage,
-                FaceImage.feature_vector.cosine_distance(search_vector).label(
-                    "cosine_distance"
+        start = time.perf_counter()
+        if mode == "memory":
+            [matches] = await self._search_memory(feature_vector.reshape(1, -1), k)
+        else:
+            matches = await self._search_pgvector(search_vector, k, mode, ef_search)
+        search_latency_ms = (time.perf_counter() - start) * 1000
+        pipeline_stage_seconds.labels("search").observe(search_latency_ms / 1000)
+        await self._release_connection()
+
+        return RecognitionResult(
+            matches=self._filter_matches(matches, threshold),
+            search_vector=search_vector,
+            search_mode=mode,
+            search_latency_ms=search_latency_ms,
+        )
+
+    async def find_closest_faces_multi(
+        self,
+        file: UploadFile,
+        k: int = 1,
+        threshold: float | None = None,
+        mode: SearchMode | None = None,
+        ef_search: int | None = None,
+    ) -> MultiFaceRecognitionResult:
+        """Find the k closest matching faces for every face detected in the image.
+
+        All faces are found with one detector pass and embedded in one batch,
+        then searched together like probes of `find_closest_faces_batch`.
+        Search modes work the same way as in `find_closest_faces`.
+        """
+        mode = self._resolve_search_mode(mode)
+
+        image_data = await file.read()
+        faces, vectors = await self.inference_executor.run(
+            self._detect_and_embed_faces, image_data
+        )
+
+        start = time.perf_counter()
+        if mode == "memory":
+            matches = await self._search_memory(vectors, k)
+        else:
+            matches = await self._search_pgvector_batch(vectors, k, mode, ef_search)
+        search_latency_ms = (time.perf_counter() - start) * 1000
+        pipeline_stage_seconds.labels("search").observe(search_latency_ms / 1000)
+        await self._release_connection()
+
+        return MultiFaceRecognitionResult(
+            faces=[
+                RecognizedFace(
+                    box=face.box,
+                    probability=face.probability,
+                    matches=self._filter_matches(face_matches, threshold),
+                )
+                for face, face_matches in zip(faces, matches)
+            ],
+            search_mode=mode,
+            search_latency_ms=search_latency_ms,
+        )
+
+    async def find_closest_faces_batch(
+        self,
+        files: Sequence[UploadFile],
+        k: int = 1,
+        threshold: float | None = None,
+        mode: SearchMode | None = None,
+        ef_search: int | None = None,
+    ) -> BatchRecognitionResult:
+        """Find the k closest matching faces for each of many probe images.
+
+        Probes are embedded in chunks, one inference job per chunk.
+        Nearest neighbours of all probes are found together, with one database
+        round trip or one matrix product in the in-process index.
+        Probes that fail (e.g. no face detected) are reported without
+        interrupting the rest of the batch.
+        Search modes work the same way as in `find_closest_faces`.
+        """
+        mode = self._resolve_search_mode(mode)
+
+        probes = [
+            ProbeResult(index=i, filename=file.filename) for i, file in enumerate(files)
+        ]
+        images = [await file.read() for file in files]
+
+        vectors: list[np.ndarray | Exception] = []
+        chunk_size = settings.enrollment_chunk_size
+        for start in range(0, len(images), chunk_size):
+            chunk = images[start : start + chunk_size]
+            vectors += await self._get_feature_vectors(
+                chunk, [content_hash(image_data) for image_data in chunk]
+            )
+
+        embedded: list[tuple[ProbeResult, np.ndarray]] = []
+        for probe, vector in zip(probes, vectors):
+            if isinstance(vector, Exception):
+                probe.error = str(vector)
+            else:
+                embedded.append((probe, vector))
+
+        start = time.perf_counter()
+        if embedded:
+            search_vectors = np.stack([vector for _, vector in embedded])
+            if mode == "memory":
+                matches = await self._search_memory(search_vectors, k)
+            else:
+                matches = await self._search_pgvector_batch(
+                    search_vectors, k, mode, ef_search
+                )
+            for (probe, _), probe_matches in zip(embedded, matches):
+                probe.matches = self._filter_matches(probe_matches, threshold)
+        search_latency_ms = (time.perf_counter() - start) * 1000
+        pipeline_stage_seconds.labels("search").observe(search_latency_ms / 1000)
+        await self._release_connection()
+
+        return BatchRecognitionResult(
+            probes=probes, search_mode=mode, search_latency_ms=search_latency_ms
+        )
+
+    def _resolve_search_mode(self, mode: SearchMode | None) -> SearchMode:
+        """Pick the default search mode and check the requested one is available."""
+        if mode is None:
+            mode = "memory" if self.memory_index_enabled else "hnsw"
+        if mode == "memory" and not self.memory_index_enabled:
+            raise ValueError("In-memory vector index is disabled in settings")
+        return mode
+
+    def _filter_matches(
+        self, matches: list[FaceMatch], threshold: float | None
+    ) -> list[FaceMatch]:
+        """Drop matches with cosine distance above the threshold."""
+        if threshold is None:
+            return matches
+        return [match for match in matches if match.cosine_distance <= threshold]
+
+    async def _search_memory(
+        self, search_vectors: np.ndarray, k: int
+    ) -> list[list[FaceMatch]]:
+        """Find nearest neighbours of each vector in the in-process vector index.
+
+        Matches are built from metadata kept in the index, without a database
+        round trip. The database is queried only to sync the index if the
+        background sync fell behind by more than the staleness bound,
+        and for records of faces indexed without metadata.
+        """
+        await self.vector_index.sync_if_stale(
+            self.db, settings.vector_index_max_staleness_s
+        )
+        hits = self.vector_index.search_faces(search_vectors, k)
+
+        missing = {hit.id for face_hits in hits for hit in face_hits if not hit.record}
+        stored: dict[UUID, FaceImage] = {}
+        if missing:
+            result = await self.db.execute(
+                select(FaceImage)
+                .options(undefer(FaceImage.feature_vector))
+                .where(FaceImage.id.in_(missing))
+            )
+            stored = {UUID(str(face.id)): face for face in result.scalars().all()}
+
+        matches: list[list[FaceMatch]] = []
+        for face_hits in hits:
+            face_matches = []
+            for hit in face_hits:
+                if hit.record is not None:
+                    face_image = FaceImage(
+                        id=hit.id,
+                        label=hit.record.label,
+                        filename=hit.record.filename,
+                        created_at=hit.record.created_at,
+                        feature_vector=hit.vector,
+                    )
+                elif hit.id in stored:
+                    face_image = stored[hit.id]
+                else:
+                    continue
+                face_matches.append(
+                    FaceMatch(
+                        face_image=face_image,
+                        cosine_similarity=1 - hit.cosine_distance,
+                        cosine_distance=hit.cosine_distance,
+                    )
+                )
+            matches.append(face_matches)
+        return matches
+
+    async def _configure_search(self, mode: SearchMode, k: int, ef_search: int | None):
+        """Apply planner settings of the search mode to the current transaction.
+
+        Settings are changed with `set_config(..., is_local => true)`,
+        so they only apply to the current transaction of this request's session.
+        """
+        if mode == "exact":
+            await self.db.execute(
+                text("SELECT set_config('enable_indexscan', 'off', true)")
+            )
+        elif mode == "hnsw":
+            # HNSW returns at most ef_search rows,
+            # raise the default to the number of candidates if lower
+            await self.db.execute(
+                text(
+                    "SELECT set_config('hnsw.ef_search', greatest(coalesce("
+                    "current_setting('hnsw.ef_search', true), '40')::int, "
+                    ":num_candidates)::text, true)"
                 ),
+                {"num_candidates": self._num_candidates(k)},
+            )
+        elif mode in ("hnsw_tuned", "identity"):
+            # HNSW returns at most ef_search rows
+            num_candidates = (
+                self._num_identity_candidates(k)
+                if mode == "identity"
+                else self._num_candidates(k)
+            )
+            ef_search = max(ef_search or settings.hnsw_ef_search, num_candidates)
+            await self.db.execute(
+                text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+                {"ef_search": str(ef_search)},
+            )
+
+    def _num_candidates(self, k: int) -> int:
+        """Number of rows fetched from the vector index to find k nearest faces."""
+        if settings.vector_search_precision == "full":
+            return k
+        return k * settings.vector_search_rerank_factor
+
+    def _num_identity_candidates(self, k: int) -> int:
+        """Number of identities whose images are re-ranked to find k persons."""
+        return max(k, settings.identity_search_candidates)
+
+    def _identity_nearest(
+        self, probe: ColumnElement, k: int, *correlate: FromClause
+    ) -> Select:
+        """Query of the closest image of each of the k persons nearest to the probe.
+
+        Candidate identities are found by template distance, then all their
+        images are compared with the probe and the persons are ranked
+        by their closest image. Yields face image id and cosine distance.
+        `correlate` are the enclosing FROM objects the probe comes from.
+        """
+        labels = (
+            select(Identity.label)
+            .where(Identity.model_version == self.model_version)
+            .order_by(Identity.template.cosine_distance(probe))
+            .limit(self._num_identity_candidates(k))
+        )
+        candidate = aliased(FaceImage)
+        distance = candidate.feature_vector.cosine_distance(probe)
+        closest = (
+            select(candidate.id, distance.label("cosine_distance"))
+            .where(
+                candidate.embedding_version == self.model_version,
+                candidate.label.in_(labels),
             )
-            .order_by(FaceImage.feature_vector.cosine_distance(search_vector))
-            .limit(1)
+            .distinct(candidate.label)
+            .order_by(candidate.label, distance)
+        )
+        if correlate:
+            closest = closest.correlate(*correlate)
+        closest = closest.subquery()
+        return (
+            select(closest.c.id, closest.c.cosine_distance)
+            .order_by(closest.c.cosine_distance)
+            .limit(k)
         )
-        row = result.first()
 
-        if not row:
+    def _reranked_nearest(
+        self, probe: ColumnElement, k: int, mode: SearchMode, *correlate: FromClause
+    ) -> Select | None:
+        """Query of the k faces nearest to the probe, via a reduced-precision index.
+
+        Candidates are fetched with their vectors using the reduced-precision index,
+        then re-ranked by exact float distance. The re-ranking sorts the candidate
+        subquery, so it cannot be served by the float vector index.
+        Yields face image id and cosine distance. `correlate` are the enclosing
+        FROM objects the probe comes from.
+        Returns None if the float vector index (or full scan) is searched directly.
+        Expressions match the indexes of migrations/006_reduced_precision_indexes.sql.
+        """
+        precision = settings.vector_search_precision
+        if precision == "full" or mode == "exact":
             return None
 
-        closest_face = row[0]
-        cosine_distance = row[1]
-        cosine_similarity = 1 - cosine_distance
+        candidate = aliased(FaceImage)
+        if precision == "half":
+            distance = cast(candidate.feature_vector, HALFVEC(512)).cosine_distance(
+                cast(probe, HALFVEC(512))
+            )
+        else:
+            distance = cast(
+                func.binary_quantize(candidate.feature_vector), BIT(512)
+            ).hamming_distance(cast(func.binary_quantize(probe), BIT(512)))
 
-        return RecognitionResult(
-            face_image=closest_face,
-            cosine_similarity=cosine_similarity,
-            cosine_distance=cosine_distance,
-            search_vector=search_vector,
+        candidates = (
+            select(candidate.id, candidate.feature_vector)
+            .where(candidate.embedding_version == self.model_version)
+            .order_by(distance)
+            .limit(self._num_candidates(k))
+        )
+        if correlate:
+            candidates = candidates.correlate(*correlate)
+        candidates = candidates.subquery()
+        exact_distance = candidates.c.feature_vector.cosine_distance(probe)
+        return (
+            select(candidates.c.id, exact_distance.label("cosine_distance"))
+            .order_by(exact_distance)
+            .limit(k)
+        )
+
+    async def _search_pgvector(
+        self,
+        search_vector: list[float],
+        k: int,
+        mode: SearchMode,
+        ef_search: int | None,
+    ) -> list[FaceMatch]:
+        """Run nearest neighbour query in PostgreSQL using the given search mode."""
+        await self._configure_search(mode, k, ef_search)
+        vector_type = FaceImage.feature_vector.type
+        probe = cast(literal(search_vector, vector_type), vector_type)
+
+        nearest = (
+            self._identity_nearest(probe, k)
+            if mode == "identity"
+            else self._reranked_nearest(probe, k, mode)
         )
+        if nearest is None:
+            query = (
+                select(
+                    FaceImage,
+                    FaceImage.feature_vector.cosine_distance(search_vector).label(
+                        "cosine_distance"
+                    ),
+                )
+                .options(undefer(FaceImage.feature_vector))
+                .where(FaceImage.embedding_version == self.model_version)
+                .order_by(FaceImage.feature_vector.cosine_distance(search_vector))
+                .limit(k)
+            )
+        else:
+            nearest = nearest.subquery()
+            query = (
+                select(FaceImage, nearest.c.cosine_distance)
+                .options(undefer(FaceImage.feature_vector))
+                .join(nearest, FaceImage.id == nearest.c.id)
+                .order_by(nearest.c.cosine_distance)
+            )
+
+        result = await self.db.execute(query)
+
+        return [
+            FaceMatch(
+                face_image=face_image,
+                cosine_similarity=1 - cosine_distance,
+                cosine_distance=cosine_distance,
+            )
+            for face_image, cosine_distance in result.all()
+        ]
+
+    async def _search_pgvector_batch(
+        self,
+        search_vectors: np.ndarray,
+        k: int,
+        mode: SearchMode,
+        ef_search: int | None,
+    ) -> list[list[FaceMatch]]:
+        """Run nearest neighbour queries for many vectors in one database round trip.
+
+        Vectors are sent as a single array parameter and unnested WITH ORDINALITY.
+        Each of them runs its own (index) scan in a LATERAL subquery,
+        results are grouped back by ordinality.
+        """
+        await self._configure_search(mode, k, ef_search)
+
+        probes = (
+            func.unnest(
+                literal(
+                    [Vector(vector).to_text() for vector in search_vectors],
+                    ARRAY(Text),
+                )
+            )
+            .table_valued("vector", with_ordinality="ordinality")
+            .render_derived()
+        )
+        probe = cast(probes.c.vector, FaceImage.feature_vector.type)
+        nearest = (
+            self._identity_nearest(probe, k, probes)
+            if mode == "identity"
+            else self._reranked_nearest(probe, k, mode, probes)
+        )
+        if nearest is None:
+            candidate = aliased(FaceImage)
+            distance = candidate.feature_vector.cosine_distance(probe)
+            nearest = (
+                select(candidate.id, distance.label("cosine_distance"))
+                .where(candidate.embedding_version == self.model_version)
+                .order_by(distance)
+                .limit(k)
+            )
+        nearest = nearest.lateral()
+
+        result = await self.db.execute(
+            select(probes.c.ordinality, FaceImage, nearest.c.cosine_distance)
+            .select_from(probes)
+            .join(nearest, true())
+            .join(FaceImage, FaceImage.id == nearest.c.id)
+            .order_by(probes.c.ordinality, nearest.c.cosine_distance)
+        )
+
+        matches: list[list[FaceMatch]] = [[] for _ in search_vectors]
+        for ordinality, face_image, cosine_distance in result.all():
+            matches[ordinality - 1].append(
+                FaceMatch(
+                    face_image=face_image,
+                    cosine_similarity=1 - cosine_distance,
+                    cosine_distance=cosine_distance,
+                )
+            )
+        return matches
+
+
+def get_face_gallery_service(
+    blob_store=Depends(get_blob_store),
+    thumbnail_cache=Depends(get_thumbnail_cache),
+    db=Depends(get_db),
+) -> FaceGalleryService:
+    """Dependency injector for FaceGalleryService.
+
+    Does not depend on the face embedding models.
+    """
+    return FaceGalleryService(blob_store, thumbnail_cache, db)
 
 
 def get_face_recognition_service(
-    face_embedding_service=Depends(get_face_embedding_service), db=Depends(get_db)
+    face_embedding_service=Depends(get_face_embedding_service),
+    inference_executor=Depends(get_inference_executor),
+    vector_index=Depends(get_vector_index),
+    embedding_cache=Depends(get_embedding_cache),
+    blob_store=Depends(get_blob_store),
+    thumbnail_cache=Depends(get_thumbnail_cache),
+    db=Depends(get_db),
 ) -> FaceRecognitionService:
     """Dependency injector for FaceRecognitionService."""
-    return FaceRecognitionService(face_embedding_service, db)
+    return FaceRecognitionService(
+        face_embedding_service,
+        inference_executor,
+        vector_index,
+        embedding_cache,
+        blob_store,
+        thumbnail_cache,
+        db,
+    )
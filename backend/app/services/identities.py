@@ -0,0 +1,95 @@
+"""Identity templates, one search vector per enrolled person.
+
+- Incremental update of templates in the enrollment transaction.
+- Rebuilding templates of a model version from the stored feature vectors.
+
+The template of a label is the L2-normalized sum (equivalently, mean) of
+its feature vectors. The sum is kept next to it, so that a new image
+updates the template without reading the other images of the person.
+"""
+
+from collections import defaultdict
+from typing import Sequence
+
+import numpy as np
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import FaceImage, Identity
+
+
+async def update_identities(
+    db: AsyncSession,
+    model_version: str,
+    faces: Sequence[tuple[str, np.ndarray]],
+):
+    """Add (label, feature vector) pairs of new face images to the templates.
+
+    Runs in the caller's transaction, commit it together with the images.
+    Rows are upserted in label order, so that concurrent enrollments
+    lock templates in the same order and do not deadlock.
+    """
+    sums: dict[str, np.ndarray] = {}
+    counts: dict[str, int] = defaultdict(int)
+    for label, vector in faces:
+        sums[label] = sums.get(label, 0) + vector.astype(np.float32)
+        counts[label] += 1
+    if not sums:
+        return
+
+    rows = [
+        {
+            "label": label,
+            "model_version": model_version,
+            "embedding_sum": sums[label],
+            "template": sums[label] / np.linalg.norm(sums[label]),
+            "image_count": counts[label],
+        }
+        for label in sorted(sums)
+    ]
+    statement = insert(Identity).values(rows)
+    embedding_sum = Identity.embedding_sum.op("+", return_type=Vector(512))(
+        statement.excluded.embedding_sum
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[Identity.label, Identity.model_version],
+            set_={
+                "embedding_sum": embedding_sum,
+                "template": func.l2_normalize(embedding_sum),
+                "image_count": Identity.image_count + statement.excluded.image_count,
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+
+async def rebuild_identities(db: AsyncSession, model_version: str) -> int:
+    """Recompute templates of the model version from stored feature vectors.
+
+    Used after feature vectors were changed in bulk (re-embedding, stamping).
+    Runs in the caller's transaction, returns the number of identities.
+    """
+    await db.execute(delete(Identity).where(Identity.model_version == model_version))
+    embedding_sum = func.sum(FaceImage.feature_vector)
+    result = await db.execute(
+        insert(Identity).from_select(
+            ["label", "model_version", "embedding_sum", "template", "image_count"],
+            select(
+                FaceImage.label,
+                FaceImage.embedding_version,
+                embedding_sum,
+                func.l2_normalize(embedding_sum),
+                func.count(),
+            )
+            .where(
+                FaceImage.embedding_version == model_version,
+                FaceImage.feature_vector.is_not(None),
+                FaceImage.label.is_not(None),
+            )
+            .group_by(FaceImage.label, FaceImage.embedding_version),
+        )
+    )
+    return result.rowcount  # type: ignore
@@ -0,0 +1,111 @@
+"""Bounded executor for running ML inference off the event loop.
+
+- Thread pool running blocking FaceEmbeddingService calls.
+- Backpressure when too many jobs are waiting for a worker.
+- Dependency injection setup for FastAPI.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, ParamSpec, TypeVar
+
+from app.config import settings
+from app.logging import logger
+from app.metrics import (
+    inference_compute_seconds,
+    inference_queue_depth,
+    inference_queue_wait_seconds,
+    inference_rejected_total,
+)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class InferenceQueueFullError(Exception):
+    """Raised when the inference executor cannot accept more jobs."""
+
+
+class InferenceExecutor:
+    """Runs blocking inference jobs in a bounded thread pool.
+
+    Torch releases the GIL during forward passes, so threads are enough to keep
+    the event loop responsive while models are running.
+    At most `max_workers` jobs run at once and at most `max_queue_size` jobs wait,
+    any further job is rejected with InferenceQueueFullError.
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+        self._in_flight = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of accepted jobs still waiting for a free worker."""
+        return self._in_flight - self._running
+
+    async def run(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Run blocking function in the executor and await its result.
+
+        Raises InferenceQueueFullError if the queue depth limit is reached.
+        A job whose caller is cancelled (e.g. client disconnected) is dropped
+        if it has not started yet, otherwise it counts towards the limits
+        until it finishes.
+        """
+        if self.queue_depth >= self.max_queue_size:
+            inference_rejected_total.inc()
+            raise InferenceQueueFullError(
+                f"Inference queue is full ({self.max_queue_size} jobs waiting)"
+            )
+
+        submitted_at = time.perf_counter()
+
+        def job() -> T:
+            started_at = time.perf_counter()
+            inference_queue_wait_seconds.observe(started_at - submitted_at)
+            with self._lock:
+                self._running += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                inference_compute_seconds.observe(time.perf_counter() - started_at)
+
+        def job_done(_: Future):
+            with self._lock:
+                self._in_flight -= 1
+
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(job)
+        # Called when the job finishes or is cancelled before it starts,
+        # not when the awaiting coroutine is cancelled
+        future.add_done_callback(job_done)
+        return await asyncio.wrap_future(future)
+
+
+_inference_executor = InferenceExecutor(
+    settings.inference_workers, settings.inference_queue_size
+)
+inference_queue_depth.set_function(lambda: _inference_executor.queue_depth)
+logger.info(
+    f"Inference executor: {settings.inference_workers} workers, "
+    f"queue size {settings.inference_queue_size}"
+)
+
+
+def get_inference_executor() -> InferenceExecutor:
+    """Dependency injector for FastAPI to provide InferenceExecutor instance.
+
+    InferenceExecutor is a singleton shared by all requests.
+    """
+    return _inference_executor
@@ -0,0 +1,147 @@
+"""Face embedding with the models exported to ONNX and run by ONNX Runtime.
+
+- Export of MTCNN (P-Net, R-Net, O-Net) and InceptionResnetV1 to ONNX.
+- OnnxFaceEmbeddingService running the exported models on CPU.
+
+ONNX Runtime is an optional dependency, install it with `uv sync --extra onnx`.
+This module is imported only when the ONNX backend is selected in settings.
+"""
+
+import json
+import os
+
+import onnxruntime
+import torch
+from facenet_pytorch import MTCNN
+from torch import Tensor
+
+from app.logging import logger
+from app.services.face_embedding import TorchFaceEmbeddingService, load_face_detector
+
+# Exported model file and (input, output names) of every network
+ONNX_MODELS: dict[str, tuple[str, list[str]]] = {
+    "pnet": ("images", ["regression", "probabilities"]),
+    "rnet": ("images", ["regression", "probabilities"]),
+    "onet": ("images", ["regression", "landmarks", "probabilities"]),
+    "inception_resnet_v1": ("images", ["embeddings"]),
+}
+MANIFEST_FILE = "manifest.json"
+
+
+def export_onnx_models(
+    detector: MTCNN,
+    feature_extractor: torch.nn.Module,
+    output_path: str,
+    model_version: str,
+):
+    """Export the networks to ONNX files in the output directory.
+
+    Batch dimension is dynamic, and so are image dimensions of P-Net,
+    which runs on every scale of the image pyramid.
+    The manifest records the embedding model version of the exported weights.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    examples = {
+        "pnet": (detector.pnet, torch.zeros(1, 3, 48, 64)),
+        "rnet": (detector.rnet, torch.zeros(2, 3, 24, 24)),
+        "onet": (detector.onet, torch.zeros(2, 3, 48, 48)),
+        "inception_resnet_v1": (feature_extractor, torch.zeros(2, 3, 160, 160)),
+    }
+
+    for name, (model, example) in examples.items():
+        input_name, output_names = ONNX_MODELS[name]
+        dynamic_axes = {input_name: {0: "batch"}} | {
+            output_name: {0: "batch"} for output_name in output_names
+        }
+        if name == "pnet":
+            dynamic_axes[input_name] |= {2: "height", 3: "width"}
+
+        path = os.path.join(output_path, f"{name}.onnx")
+        torch.onnx.export(
+            model.cpu().eval(),
+            (example,),
+            path,
+            input_names=[input_name],
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+        logger.info(f"Exported {name} to {path}")
+
+    with open(os.path.join(output_path, MANIFEST_FILE), "w") as f:
+        json.dump({"model_version": model_version}, f)
+
+
+def read_onnx_model_version(model_path: str) -> str:
+    """Embedding model version of the models exported to the directory."""
+    with open(os.path.join(model_path, MANIFEST_FILE)) as f:
+        return json.load(f)["model_version"]
+
+
+class OnnxModule(torch.nn.Module):
+    """Module running an ONNX Runtime session in place of a torch network.
+
+    Takes and returns CPU tensors, so that pre- and post-processing code
+    written for the torch network works unchanged.
+    """
+
+    def __init__(self, session: onnxruntime.InferenceSession):
+        super().__init__()
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        # MTCNN reads the input dtype from the parameters of P-Net
+        self.dtype_marker = torch.nn.Parameter(torch.empty(0), requires_grad=False)
+
+    def forward(self, x: Tensor) -> Tensor | tuple[Tensor, ...]:
+        outputs = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})
+        tensors = tuple(torch.from_numpy(output) for output in outputs)
+        return tensors[0] if len(tensors) == 1 else tensors
+
+
+class OnnxFaceEmbeddingService(TorchFaceEmbeddingService):
+    """FaceEmbeddingService running the networks with ONNX Runtime on CPU.
+
+    Loads models exported by `export_onnx_models`. Only the forward passes
+    of the networks are replaced, the image pyramid, box regression, NMS
+    and cropping are shared with TorchFaceEmbeddingService, so both produce
+    the same faces and feature vectors (up to floating point error).
+
+    `intra_op_threads` parallelize a single forward pass, `inter_op_threads`
+    independent operators of the graph. 0 leaves the choice to ONNX Runtime.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        detection_max_side: int | None = None,
+    ):
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        modules = {
+            name: OnnxModule(
+                onnxruntime.InferenceSession(
+                    os.path.join(model_path, f"{name}.onnx"),
+                    options,
+                    providers=["CPUExecutionProvider"],
+                )
+            )
+            for name in ONNX_MODELS
+        }
+        logger.info(f"Loaded ONNX models from: {model_path}")
+
+        detector = load_face_detector(torch.device("cpu"))
+        # Replace the MTCNN stages, nn.Module registers them as submodules
+        for name in ("pnet", "rnet", "onet"):
+            setattr(detector, name, modules[name])
+
+        super().__init__(
+            detector,
+            modules["inception_resnet_v1"],
+            read_onnx_model_version(model_path),
+            detection_max_side,
+        )
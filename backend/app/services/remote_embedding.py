@@ -0,0 +1,262 @@
+"""Face embedding models shared by web workers through an inference server.
+
+- Message framing over a Unix socket: JSON header followed by raw numpy arrays.
+- InferenceServer, serving a FaceEmbeddingService to many connections.
+- RemoteFaceEmbeddingService, the client used by web workers.
+
+A single server process owns the models and their thread pool, instead of
+every uvicorn worker loading its own copy. Concurrent embedding requests
+of all workers are batched together by the server.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Sequence
+
+import numpy as np
+import torch
+from PIL.Image import Image, fromarray
+from torch import Tensor
+
+from app.logging import logger
+from app.services.face_embedding import DetectedFace, FaceEmbeddingService
+
+_HEADER_LENGTH = struct.Struct("!I")
+MAX_HEADER_BYTES = 1024 * 1024
+# Decoded RGB images and float32 crops and vectors, never object arrays
+ALLOWED_DTYPES = {np.dtype(np.uint8), np.dtype(np.float32)}
+
+
+class InferenceServerError(Exception):
+    """Inference server failed to process a request."""
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed by peer")
+        received += count
+    return buffer
+
+
+def send_message(sock: socket.socket, header: dict, arrays: Sequence[np.ndarray] = ()):
+    """Send a JSON header followed by the raw data of the arrays."""
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    header = header | {"arrays": [[array.shape, array.dtype.str] for array in arrays]}
+    data = json.dumps(header).encode()
+    sock.sendall(_HEADER_LENGTH.pack(len(data)) + data)
+    for array in arrays:
+        sock.sendall(array)
+
+
+def receive_message(sock: socket.socket) -> tuple[dict, list[np.ndarray]]:
+    """Receive a message sent by `send_message`."""
+    (length,) = _HEADER_LENGTH.unpack(_receive_exactly(sock, _HEADER_LENGTH.size))
+    if length > MAX_HEADER_BYTES:
+        raise ValueError(f"Message header too large: {length} bytes")
+    header = json.loads(_receive_exactly(sock, length))
+
+    arrays = []
+    for shape, dtype_str in header.pop("arrays"):
+        dtype = np.dtype(dtype_str)
+        if dtype not in ALLOWED_DTYPES:
+            raise ValueError(f"Unsupported array dtype: {dtype}")
+        size = int(np.prod(shape)) * dtype.itemsize
+        data = _receive_exactly(sock, size)
+        arrays.append(np.frombuffer(data, dtype).reshape(shape))
+    return header, arrays
+
+
+class _InferenceRequestHandler(socketserver.BaseRequestHandler):
+    """Serves requests of one connection until the client disconnects."""
+
+    server: "InferenceServer"
+
+    def handle(self):
+        while True:
+            try:
+                header, arrays = receive_message(self.request)
+            except (ConnectionError, ValueError):
+                return
+
+            try:
+                response, outputs = self.server.dispatch(header["method"], arrays)
+            except Exception as e:
+                logger.exception(f"Inference request {header.get('method')} failed")
+                response, outputs = {"error": f"{type(e).__name__}: {e}"}, []
+            send_message(self.request, response, outputs)
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server running a FaceEmbeddingService for web workers.
+
+    Every connection is served by its own thread, web workers keep
+    one connection per inference thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, service: FaceEmbeddingService):
+        self.service = service
+        # Socket file left behind by a previous server would fail the bind
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        super().__init__(socket_path, _InferenceRequestHandler)
+
+    def dispatch(
+        self, method: str, arrays: list[np.ndarray]
+    ) -> tuple[dict, list[np.ndarray]]:
+        """Call the service method, returns the response header and arrays."""
+        if method == "model_version":
+            return {"model_version": self.service.model_version}, []
+        if method == "get_cropped_image":
+            crop = self.service.get_cropped_image(fromarray(arrays[0]))
+            if crop is None:
+                return {"found": False}, []
+            return {"found": True}, [crop.cpu().numpy()]
+        if method == "detect_faces":
+            faces = self.service.detect_faces(fromarray(arrays[0]))
+            header = {
+                "faces": [
+                    {"box": list(face.box), "probability": face.probability}
+                    for face in faces
+                ]
+            }
+            return header, [face.cropped_image.cpu().numpy() for face in faces]
+        if method == "compute_feature_vector":
+            vector = self.service.compute_feature_vector(torch.from_numpy(arrays[0]))
+            return {}, [vector]
+        if method == "compute_feature_vectors":
+            crops = list(torch.from_numpy(arrays[0]))
+            return {}, [self.service.compute_feature_vectors(crops)]
+        raise ValueError(f"Unknown method: {method}")
+
+
+def connect(socket_path: str, timeout_s: float) -> socket.socket:
+    """Connect to the inference server, waiting up to `timeout_s` for it to start."""
+    deadline = time.monotonic() + timeout_s
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+            return sock
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+class RemoteFaceEmbeddingService(FaceEmbeddingService):
+    """FaceEmbeddingService running the models in an inference server process.
+
+    Every thread uses its own connection, opened on first use and reopened
+    once if the server closed it (e.g. after a restart). Connections are
+    refused if the server models changed, vectors of a different
+    `model_version` are not comparable.
+    `timeout_s` is how long to wait for the server to start, requests
+    fail with InferenceServerError if the server does not respond
+    within `request_timeout_s`.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        model_version: str,
+        timeout_s: float = 30.0,
+        request_timeout_s: float = 60.0,
+    ):
+        self.socket_path = socket_path
+        self.model_version = model_version
+        self.timeout_s = timeout_s
+        self.request_timeout_s = request_timeout_s
+        self._local = threading.local()
+
+    def _timeout_error(self, method: str) -> InferenceServerError:
+        return InferenceServerError(
+            f"Inference server did not respond to {method} "
+            f"within {self.request_timeout_s}s"
+        )
+
+    def _connect(self) -> socket.socket:
+        sock = connect(self.socket_path, self.timeout_s)
+        sock.settimeout(self.request_timeout_s)
+        try:
+            send_message(sock, {"method": "model_version"})
+            header, _ = receive_message(sock)
+        except TimeoutError as e:
+            sock.close()
+            raise self._timeout_error("model_version") from e
+        if header["model_version"] != self.model_version:
+            sock.close()
+            raise InferenceServerError(
+                f"Inference server runs model version {header['model_version']}, "
+                f"expected {self.model_version}"
+            )
+        return sock
+
+    def _call(
+        self, method: str, arrays: Sequence[np.ndarray] = ()
+    ) -> tuple[dict, list[np.ndarray]]:
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                send_message(sock, {"method": method}, arrays)
+                header, outputs = receive_message(sock)
+                break
+            except TimeoutError as e:
+                # The server may still be busy with the request, not retried
+                sock.close()
+                self._local.sock = None
+                raise self._timeout_error(method) from e
+            except OSError:
+                sock.close()
+                self._local.sock = None
+                if attempt > 0:
+                    raise
+
+        if "error" in header:
+            raise InferenceServerError(header["error"])
+        return header, outputs
+
+    def get_cropped_image(self, image: Image) -> Tensor:
+        """Detect the largest face in the server, returns the crop or None."""
+        header, outputs = self._call(
+            "get_cropped_image", [np.asarray(image.convert("RGB"))]
+        )
+        return torch.from_numpy(outputs[0]) if header["found"] else None  # type: ignore
+
+    def detect_faces(self, image: Image) -> list[DetectedFace]:
+        """Detect all faces in the server."""
+        header, outputs = self._call("detect_faces", [np.asarray(image.convert("RGB"))])
+        return [
+            DetectedFace(
+                cropped_image=torch.from_numpy(crop),
+                box=tuple(float(x) for x in face["box"]),  # type: ignore
+                probability=face["probability"],
+            )
+            for face, crop in zip(header["faces"], outputs, strict=True)
+        ]
+
+    def compute_feature_vector(self, cropped_image: Tensor) -> np.ndarray:
+        """Compute feature vector in the server, batched with other workers."""
+        _, outputs = self._call("compute_feature_vector", [cropped_image.cpu().numpy()])
+        return outputs[0]
+
+    def compute_feature_vectors(self, cropped_images: Sequence[Tensor]) -> np.ndarray:
+        """Compute feature vectors of a batch in the server."""
+        crops = torch.stack(list(cropped_images)).cpu().numpy()
+        _, outputs = self._call("compute_feature_vectors", [crops])
+        return outputs[0]
@@ -0,0 +1,211 @@
+"""Thumbnail renditions of face images.
+
+- Rendering downscaled WebP/JPEG thumbnails.
+- Bounded on-disk thumbnail cache with least recently used eviction.
+- Dependency injection setup for FastAPI.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Literal
+
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.logging import logger
+
+# Fixed set of sizes, so that clients cannot fill the cache with arbitrary renditions
+THUMBNAIL_SIZES = (64, 128, 256, 512)
+ThumbnailFormat = Literal["webp", "jpeg"]
+
+THUMBNAIL_CONTENT_TYPES: dict[ThumbnailFormat, str] = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+# Temporary files older than this are left over by an interrupted write
+STALE_TMP_FILE_AGE_S = 60
+
+# Worker processes share the directory, each of them rescans it this often
+# to evict according to its actual size, including files of other workers
+RESCAN_INTERVAL_S = 30
+
+
+def render_thumbnail(image_data: bytes, size: int, format: ThumbnailFormat) -> bytes:
+    """Downscale the image so that its longer side is at most `size` pixels.
+
+    Blocking and CPU-bound, run it off the event loop.
+    JPEG images are decoded directly at a reduced scale (draft mode),
+    so large originals are never decoded at full resolution.
+    """
+    with Image.open(BytesIO(image_data)) as image:
+        image.draft("RGB", (size, size))
+        thumbnail = ImageOps.exif_transpose(image).convert("RGB")
+
+    thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    thumbnail.save(output, format=format.upper(), quality=settings.thumbnail_quality)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """Thumbnail files in a local directory, bounded by total size.
+
+    Least recently used files are deleted when the files take more than
+    `max_bytes`. Hits update modification time of the file, so recency
+    is kept on disk. The directory may be shared by worker processes:
+    each of them rescans it every `RESCAN_INTERVAL_S` (and at startup),
+    ordering files by modification time, so the budget applies to the whole
+    directory rather than to every worker. Between rescans the directory can
+    exceed the budget by the thumbnails other workers have written since.
+    Leftover temporary files are deleted.
+    Thumbnails are returned as bytes, so a file evicted right after a hit
+    is never deleted from under a response that is still being sent.
+    Thread-safe.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._files: OrderedDict[str, int] = OrderedDict()
+        self._size_bytes = 0
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        with self._lock:
+            self._rescan()
+
+    @property
+    def size_bytes(self) -> int:
+        """Total size of cached thumbnail files."""
+        return self._size_bytes
+
+    def _rescan(self):
+        """Replace tracked files with the files in the directory and evict.
+
+        Must be called with the lock held.
+        """
+        self._scanned_at = time.monotonic()
+        if not os.path.isdir(self.root):
+            return
+
+        entries = []
+        for entry in os.scandir(self.root):
+            try:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".tmp"):
+                    self._remove_stale_tmp_file(entry)
+                else:
+                    entries.append(
+                        (entry.stat().st_mtime, entry.name, entry.stat().st_size)
+                    )
+            except FileNotFoundError:
+                # Evicted by another worker during the scan
+                continue
+
+        self._files.clear()
+        self._size_bytes = 0
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._size_bytes += size
+        self._evict()
+
+    def _remove_stale_tmp_file(self, entry: os.DirEntry):
+        """Delete temporary file of an interrupted write.
+
+        Recent files are kept, they may still be written by another worker.
+        """
+        try:
+            if time.time() - entry.stat().st_mtime > STALE_TMP_FILE_AGE_S:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Could not remove temporary thumbnail {entry.name}: {e}")
+
+    def _name(self, key: str, size: int, format: ThumbnailFormat) -> str:
+        return f"{key}-{size}.{format}"
+
+    def get(self, key: str, size: int, format: ThumbnailFormat) -> bytes | None:
+        """Content of the cached thumbnail, None on a miss.
+
+        Blocking, run it off the event loop.
+        """
+        name = self._name(key, size, format)
+        path = os.path.join(self.root, name)
+
+        # Open under the lock, eviction cannot delete the file before it is open
+        with self._lock:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                # Evicted by another worker process, or never cached
+                self._size_bytes -= self._files.pop(name, 0)
+                return None
+            if name not in self._files:
+                # Written by another worker process since the last rescan
+                self._files[name] = os.fstat(f.fileno()).st_size
+                self._size_bytes += self._files[name]
+            self._files.move_to_end(name)
+            os.utime(f.fileno())
+
+        with f:
+            return f.read()
+
+    def put(self, key: str, size: int, format: ThumbnailFormat, data: bytes):
+        """Write thumbnail file, evicting old ones over the size budget.
+
+        Blocking, run it off the event loop.
+        """
+        name = self._name(key, size, format)
+        path = os.path.join(self.root, name)
+
+        # Write to a temporary file first, readers never see partial files
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if time.monotonic() - self._scanned_at > RESCAN_INTERVAL_S:
+                self._rescan()
+                return
+            self._size_bytes -= self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._size_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used files until the size budget is met.
+
+        The most recently used file is always kept.
+        """
+        while self._size_bytes > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            self._size_bytes -= size
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError as e:
+                logger.warning(f"Could not remove thumbnail {name}: {e}")
+
+
+_thumbnail_cache: ThumbnailCache | None = None
+_thumbnail_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Dependency injector for FastAPI to provide ThumbnailCache instance.
+
+    The cache is a singleton shared by all requests of the worker process,
+    created (and the directory scanned) on first use.
+    """
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        with _thumbnail_cache_lock:
+            if _thumbnail_cache is None:
+                _thumbnail_cache = ThumbnailCache(
+                    settings.thumbnail_cache_path, settings.thumbnail_cache_max_bytes
+                )
+    return _thumbnail_cache
@@ -0,0 +1,348 @@
+"""In-process vector index for exact nearest neighbour search.
+
+- Normalized float32 matrix of gallery feature vectors held in memory.
+- Face metadata (label, filename) kept next to the vectors.
+- Optional memory-mapped snapshot as the base of the index.
+- Incremental synchronization with the face_images table, in the background.
+- Dependency injection setup for FastAPI.
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Sequence
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import FaceImage
+from app.logging import logger
+
+from .embedding_snapshot import EmbeddingSnapshot
+from .face_embedding import get_model_version
+
+
+@dataclass
+class FaceRecord:
+    """Metadata of an indexed face, enough to return it as a match."""
+
+    label: str | None
+    filename: str | None
+    created_at: datetime | None
+
+
+@dataclass
+class IndexedFace:
+    """Nearest neighbour found in the index.
+
+    `vector` is the L2-normalized feature vector, `record` is None
+    for faces indexed without metadata.
+    """
+
+    id: UUID
+    cosine_distance: float
+    vector: np.ndarray
+    record: FaceRecord | None
+
+
+class InMemoryVectorIndex:
+    """Exact cosine similarity search over feature vectors kept in memory.
+
+    Vectors are L2-normalized on insert, so a single matrix-vector product
+    gives cosine similarities to the whole gallery.
+
+    The index is synchronized with the database incrementally, loading rows
+    with `created_at` newer than the watermark of the previous sync.
+    Rows are committed with `created_at` set at the start of their transaction,
+    so each sync also re-reads an overlap window before the watermark
+    and skips rows that are already indexed.
+
+    With `model_version` set, only feature vectors of that embedding model version
+    are loaded.
+
+    Label, filename and creation time of every face are kept with its vector,
+    so that matches are returned without querying the database.
+    The sync runs every `sync_interval_s` in a background task, see `sync_periodically`.
+
+    The index can start from an on-disk snapshot, see `load_snapshot`.
+    Snapshot vectors stay memory-mapped and only rows newer than the snapshot
+    are loaded from the database into memory. Labels and filenames of snapshot
+    rows come from the snapshot too.
+
+    Not thread-safe, meant to be used from the event loop only.
+    """
+
+    sync_batch_size = 5000
+
+    def __init__(
+        self,
+        dim: int = 512,
+        sync_interval_s: float = 5.0,
+        sync_overlap_s: float = 60.0,
+        model_version: str | None = None,
+    ):
+        self.dim = dim
+        self.model_version = model_version
+        self.sync_interval_s = sync_interval_s
+        self.sync_overlap = timedelta(seconds=sync_overlap_s)
+        self._base_vectors = np.empty((0, dim), dtype=np.float32)
+        self._base_ids = np.empty(0, dtype="V16")
+        self._base_created_at = np.empty(0, dtype="datetime64[us]")
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: list[UUID] = []
+        self._records: list[FaceRecord | None] = []
+        self._base_labels: Sequence[str | None] = []
+        self._base_filenames: Sequence[str | None] = []
+        self._indexed_ids: set[UUID] = set()
+        self._watermark: datetime | None = None
+        self._last_sync: float | None = None
+        self._sync_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._base_vectors) + self._size
+
+    def load_snapshot(self, snapshot: EmbeddingSnapshot):
+        """Replace contents of the index with the snapshot.
+
+        Following syncs load only rows created after the snapshot watermark
+        (minus the overlap window).
+        """
+        self._base_vectors = snapshot.vectors
+        self._base_ids = snapshot.rows["id"]
+        self._base_created_at = snapshot.rows["created_at"]
+        self._base_labels = snapshot.labels
+        self._base_filenames = snapshot.filenames
+        self._size = 0
+        self._ids = []
+        self._records = []
+        self._watermark = snapshot.watermark
+        self._last_sync = None
+
+        # Only snapshot rows within the overlap window are read again by sync
+        self._indexed_ids = set()
+        if self._watermark is not None:
+            overlap_start = np.searchsorted(
+                snapshot.rows["created_at"],
+                np.datetime64(self._watermark - self.sync_overlap, "us"),
+                side="right",
+            )
+            self._indexed_ids = {
+                UUID(bytes=id.tobytes()) for id in self._base_ids[overlap_start:]
+            }
+
+    def _get_id(self, i: int) -> UUID:
+        base_size = len(self._base_vectors)
+        if i < base_size:
+            return UUID(bytes=self._base_ids[i].tobytes())
+        return self._ids[i - base_size]
+
+    def _get_vector(self, i: int) -> np.ndarray:
+        base_size = len(self._base_vectors)
+        if i < base_size:
+            return np.array(self._base_vectors[i])
+        return self._vectors[i - base_size].copy()
+
+    def _get_record(self, i: int) -> FaceRecord | None:
+        base_size = len(self._base_vectors)
+        if i < base_size:
+            return FaceRecord(
+                label=self._base_labels[i],
+                filename=self._base_filenames[i],
+                created_at=self._base_created_at[i].item(),
+            )
+        return self._records[i - base_size]
+
+    def _reserve(self, capacity: int):
+        """Grow the vector buffer to hold at least `capacity` rows."""
+        if capacity <= len(self._vectors):
+            return
+        new_capacity = max(capacity, 2 * len(self._vectors), 1024)
+        vectors = np.empty((new_capacity, self.dim), dtype=np.float32)
+        vectors[: self._size] = self._vectors[: self._size]
+        self._vectors = vectors
+
+    def add_many(
+        self,
+        ids: Sequence[UUID],
+        vectors: np.ndarray,
+        records: Sequence[FaceRecord] | None = None,
+    ):
+        """Add feature vectors to the index, skipping ids that are already indexed.
+
+        `records` are metadata of the faces, in the order of `ids`.
+        """
+        new_rows = [i for i, id in enumerate(ids) if id not in self._indexed_ids]
+        if not new_rows:
+            return
+
+        new_vectors = np.asarray(vectors, dtype=np.float32)[new_rows]
+        new_vectors /= np.linalg.norm(new_vectors, axis=1, keepdims=True)
+
+        self._reserve(self._size + len(new_rows))
+        self._vectors[self._size : self._size + len(new_rows)] = new_vectors
+        self._size += len(new_rows)
+
+        for i in new_rows:
+            self._ids.append(ids[i])
+            self._records.append(records[i] if records is not None else None)
+            self._indexed_ids.add(ids[i])
+
+    def add(self, id: UUID, vector: np.ndarray, record: FaceRecord | None = None):
+        """Add a single feature vector to the index."""
+        self.add_many(
+            [id],
+            np.asarray(vector).reshape(1, -1),
+            [record] if record is not None else None,
+        )
+
+    def search(self, vector: np.ndarray, k: int) -> list[tuple[UUID, float]]:
+        """Find k nearest neighbours of the vector.
+
+        Returns (id, cosine distance) pairs, closest first.
+        """
+        return self.search_many(np.asarray(vector).reshape(1, -1), k)[0]
+
+    def search_many(
+        self, vectors: np.ndarray, k: int
+    ) -> list[list[tuple[UUID, float]]]:
+        """Find k nearest neighbours of each row of `vectors` with one matrix product.
+
+        Returns (id, cosine distance) pairs for each query vector, closest first.
+        """
+        return [
+            [(self._get_id(i), distance) for i, distance in rows]
+            for rows in self._search_rows(vectors, k)
+        ]
+
+    def search_faces(self, vectors: np.ndarray, k: int) -> list[list[IndexedFace]]:
+        """Find k nearest neighbours of each row of `vectors`, with their metadata."""
+        return [
+            [
+                IndexedFace(
+                    id=self._get_id(i),
+                    cosine_distance=distance,
+                    vector=self._get_vector(i),
+                    record=self._get_record(i),
+                )
+                for i, distance in rows
+            ]
+            for rows in self._search_rows(vectors, k)
+        ]
+
+    def _search_rows(
+        self, vectors: np.ndarray, k: int
+    ) -> list[list[tuple[int, float]]]:
+        """Row numbers and cosine distances of the k nearest neighbours of each vector."""
+        queries = np.asarray(vectors, dtype=np.float32)
+        if len(self) == 0:
+            return [[] for _ in queries]
+
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        similarities = self._vectors[: self._size] @ queries.T
+        if len(self._base_vectors):
+            similarities = np.concatenate(
+                [self._base_vectors @ queries.T, similarities]
+            )
+
+        # Columns of `similarities` and `top_k` correspond to query vectors
+        k = min(k, len(self))
+        top_k = np.argpartition(-similarities, k - 1, axis=0)[:k]
+        order = np.argsort(-np.take_along_axis(similarities, top_k, axis=0), axis=0)
+        top_k = np.take_along_axis(top_k, order, axis=0)
+
+        return [
+            [(int(i), float(1 - similarities[i, j])) for i in top_k[:, j]]
+            for j in range(len(queries))
+        ]
+
+    def is_stale(self, max_age_s: float | None = None) -> bool:
+        """Check if more than `max_age_s` (default sync interval) passed since last sync."""
+        if max_age_s is None:
+            max_age_s = self.sync_interval_s
+        return self._last_sync is None or time.monotonic() - self._last_sync > max_age_s
+
+    async def sync(self, db: AsyncSession):
+        """Load face images created since the last sync from the database."""
+        async with self._sync_lock:
+            await self._sync(db)
+
+    async def _sync(self, db: AsyncSession):
+        query = select(
+            FaceImage.id,
+            FaceImage.feature_vector,
+            FaceImage.created_at,
+            FaceImage.label,
+            FaceImage.filename,
+        ).where(FaceImage.feature_vector.is_not(None))
+        if self.model_version is not None:
+            query = query.where(FaceImage.embedding_version == self.model_version)
+        if self._watermark is not None:
+            query = query.where(
+                FaceImage.created_at > self._watermark - self.sync_overlap
+            )
+
+        result = await db.stream(
+            query.execution_options(yield_per=self.sync_batch_size)
+        )
+        async for rows in result.partitions():
+            self.add_many(
+                [row.id for row in rows],
+                np.stack([row.feature_vector for row in rows]),
+                [FaceRecord(row.label, row.filename, row.created_at) for row in rows],
+            )
+            latest = max(row.created_at for row in rows)
+            if self._watermark is None or latest > self._watermark:
+                self._watermark = latest
+
+        self._last_sync = time.monotonic()
+
+    async def sync_if_stale(self, db: AsyncSession, max_age_s: float | None = None):
+        """Synchronize with the database if the index is older than `max_age_s`."""
+        if not self.is_stale(max_age_s):
+            return
+        async with self._sync_lock:
+            # Another request may have synced while this one was waiting
+            if self.is_stale(max_age_s):
+                await self._sync(db)
+
+    async def sync_periodically(self, session_factory: Callable[[], AsyncSession]):
+        """Synchronize with the database every sync interval, until cancelled.
+
+        Meant to run as a background task, so that requests do not wait for syncs.
+        Failed syncs are logged and retried on the next interval.
+        """
+        while True:
+            await asyncio.sleep(self.sync_interval_s)
+            try:
+                async with session_factory() as db:
+                    await self.sync(db)
+            except Exception:
+                logger.exception("In-memory vector index sync failed")
+
+
+_vector_index: InMemoryVectorIndex | None = None
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index() -> InMemoryVectorIndex:
+    """Dependency injector for FastAPI to provide InMemoryVectorIndex instance.
+
+    The index is a singleton shared by all requests of the worker process,
+    created on first use.
+    """
+    global _vector_index
+    if _vector_index is None:
+        with _vector_index_lock:
+            if _vector_index is None:
+                _vector_index = InMemoryVectorIndex(
+                    sync_interval_s=settings.vector_index_sync_interval_s,
+                    sync_overlap_s=settings.vector_index_sync_overlap_s,
+                    model_version=get_model_version(),
+                )
+    return _vector_index
@@ -0,0 +1,9 @@
+"""Performance benchmarks for the application.
+
+Benchmarks are run as modules from the backend directory, e.g.
+`uv run python -m benchmarks.embedding_batching --help`.
+
+With `--json` results are printed as JSON lines tagged with the git commit,
+and `--output results.jsonl` appends them to a file, to track regressions
+across runs.
+"""
@@ -0,0 +1,119 @@
+"""Helpers shared by the benchmarks.
+
+- Loading face images from a dataset directory.
+- Latency percentiles of a set of timed calls.
+- Reporting results as a console table or as JSON lines for regression tracking.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def load_images(images_dir: str, num_images: int) -> list[bytes]:
+    """Read image files under the directory, cycled to `num_images`."""
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(images_dir)
+        for name in names
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise ValueError(f"No images found in {images_dir}")
+
+    images = []
+    for path in itertools.islice(itertools.cycle(paths), num_images):
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def latency_stats(latencies: list[float]) -> dict[str, float]:
+    """Percentiles of latencies given in seconds, in milliseconds."""
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        f"p{q}_ms": float(np.percentile(latencies_ms, q)) if len(latencies) else 0.0
+        for q in (50, 95, 99)
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Reporter:
+    """Prints benchmark results as a table, or as JSON lines.
+
+    Every JSON line is tagged with the benchmark name, git commit, host
+    and time of the run, so lines from many runs can be collected
+    into a single file and compared to find regressions.
+    With `output_path`, JSON lines are also appended to that file.
+    """
+
+    def __init__(
+        self,
+        benchmark: str,
+        columns: list[str],
+        json_output: bool = False,
+        output_path: str | None = None,
+    ):
+        self.columns = columns
+        self.json_output = json_output
+        self.output_path = output_path
+        self.metadata = {
+            "benchmark": benchmark,
+            "git_commit": _git_commit(),
+            "host": platform.node(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        if not json_output:
+            print(" ".join(f"{column:>12}" for column in columns))
+
+    def report(self, result: Any):
+        """Report a single result dataclass."""
+        fields = asdict(result)
+        line = json.dumps(self.metadata | fields)
+        if self.output_path is not None:
+            with open(self.output_path, "a") as f:
+                f.write(line + "\n")
+
+        if self.json_output:
+            print(line, flush=True)
+        else:
+            print(
+                " ".join(
+                    f"{self._format(fields[column]):>12}" for column in self.columns
+                ),
+                flush=True,
+            )
+
+    def _format(self, value: Any) -> str:
+        if isinstance(value, float):
+            return f"{value:.3f}" if abs(value) < 10 else f"{value:.1f}"
+        return "-" if value is None else str(value)
+
+
+def add_output_arguments(parser: argparse.ArgumentParser):
+    """Add the --json and --output arguments shared by all benchmarks."""
+    parser.add_argument("--json", action="store_true", help="Output JSON lines")
+    parser.add_argument(
+        "--output", type=str, default=None, help="Append JSON lines to this file"
+    )
@@ -0,0 +1,137 @@
+"""Benchmark of embedding micro-batching under concurrent load.
+
+Compares throughput and latency percentiles of InceptionResnetV1 embedding
+with and without BatchingFaceEmbeddingService at different concurrency levels.
+Uses random 160x160 face crops, so no images or database are needed.
+
+Use --help for usage information.
+"""
+
+import argparse
+import threading
+import time
+from dataclasses import dataclass
+
+import torch
+
+from app.config import settings
+from app.services.face_embedding import (
+    BatchingFaceEmbeddingService,
+    FaceEmbeddingService,
+    TorchFaceEmbeddingService,
+    get_device,
+    load_face_detector,
+    load_feature_extractor,
+)
+from benchmarks.common import Reporter, add_output_arguments, latency_stats
+
+
+@dataclass
+class BenchmarkResult:
+    """Result of a single benchmark run."""
+
+    mode: str
+    concurrency: int
+    requests: int
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+def run_load(
+    service: FaceEmbeddingService, concurrency: int, requests_per_thread: int
+) -> tuple[float, list[float]]:
+    """Call compute_feature_vector from `concurrency` threads.
+
+    Returns total wall time and individual call latencies in seconds.
+    """
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def worker():
+        crop = torch.randn(3, 160, 160)
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            service.compute_feature_vector(crop)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def benchmark(
+    mode: str, service: FaceEmbeddingService, concurrency: int, requests: int
+) -> BenchmarkResult:
+    """Run warm-up and measured load for one configuration."""
+    run_load(service, concurrency, 1)
+    requests_per_thread = max(1, requests // concurrency)
+    wall_time, latencies = run_load(service, concurrency, requests_per_thread)
+
+    return BenchmarkResult(
+        mode=mode,
+        concurrency=concurrency,
+        requests=len(latencies),
+        throughput=len(latencies) / wall_time,
+        **latency_stats(latencies),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark embedding throughput and latency with micro-batching"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16],
+        help="Numbers of concurrent callers to test",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=64, help="Requests per configuration"
+    )
+    parser.add_argument(
+        "--max_batch_size", type=int, default=8, help="Batcher max batch size"
+    )
+    parser.add_argument(
+        "--max_wait_ms", type=float, default=5.0, help="Batcher max wait time"
+    )
+    add_output_arguments(parser)
+
+    args = parser.parse_args()
+
+    device = get_device()
+    torch_service = TorchFaceEmbeddingService(
+        load_face_detector(device),
+        load_feature_extractor(
+            settings.facenet_weights_path, settings.facenet_weights_key, device
+        ),
+    )
+    services: dict[str, FaceEmbeddingService] = {
+        "unbatched": torch_service,
+        "batched": BatchingFaceEmbeddingService(
+            torch_service, args.max_batch_size, args.max_wait_ms
+        ),
+    }
+
+    reporter = Reporter(
+        "embedding_batching",
+        ["mode", "concurrency", "throughput", "p50_ms", "p95_ms", "p99_ms"],
+        args.json,
+        args.output,
+    )
+    for concurrency in args.concurrency:
+        for mode, service in services.items():
+            reporter.report(benchmark(mode, service, concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""End-to-end HTTP load test of a running backend server.
+
+Sends recognition (or enrollment) requests with face images from a fixed
+number of concurrent clients and reports throughput, latency percentiles
+and response status counts, for each tested concurrency level.
+
+Start the server first (`just prod`), with the gallery seeded for recognition
+(`just seed`). The enrollment scenario adds faces to the database,
+run it against a test deployment. Images are cycled, so repeated uploads
+of the same file reuse its stored feature vector, use a dataset with
+at least as many images as requests to measure full enrollment.
+
+Use --help for usage information.
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import httpx
+
+from benchmarks.common import (
+    Reporter,
+    add_output_arguments,
+    latency_stats,
+    load_images,
+)
+
+
+@dataclass
+class LoadResult:
+    """Result of a load test at one concurrency level."""
+
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    status_counts: dict[str, int] = field(default_factory=dict)
+
+
+async def send_request(
+    client: httpx.AsyncClient, scenario: str, image: bytes, args: argparse.Namespace
+) -> int:
+    """Send a single request of the scenario, returns the response status code."""
+    files = {"file": ("face.jpg", image, "image/jpeg")}
+    if scenario == "recognize":
+        params: dict = {"k": args.k}
+        if args.mode is not None:
+            params["mode"] = args.mode
+        response = await client.post("/api/faces/recognize", files=files, params=params)
+    else:
+        response = await client.post(
+            "/api/faces/", files=files, data={"label": "Benchmark"}
+        )
+    return response.status_code
+
+
+def is_error(scenario: str, status: int) -> bool:
+    """Whether the response is a failure, no match found is a valid result."""
+    return status >= 400 and not (scenario == "recognize" and status == 404)
+
+
+async def run_load(
+    args: argparse.Namespace, images: list[bytes], concurrency: int, requests: int
+) -> LoadResult:
+    """Send `requests` requests from `concurrency` clients sharing a connection pool."""
+    image_stream = itertools.cycle(images)
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    remaining = requests
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                status = await send_request(
+                    client, args.scenario, next(image_stream), args
+                )
+                statuses[str(status)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.api_url, limits=limits, timeout=args.timeout
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall_time = time.perf_counter() - start
+
+    errors = sum(
+        count
+        for status, count in statuses.items()
+        if not status.isdigit() or is_error(args.scenario, int(status))
+    )
+    return LoadResult(
+        scenario=args.scenario,
+        concurrency=concurrency,
+        requests=len(latencies),
+        errors=errors,
+        throughput=len(latencies) / wall_time,
+        **latency_stats(latencies),
+        status_counts=dict(statuses),
+    )
+
+
+async def run(args: argparse.Namespace, reporter: Reporter):
+    images = load_images(args.images_dir, max(args.concurrency))
+    for concurrency in args.concurrency:
+        # Warm-up, opens connections and fills server side caches
+        await run_load(args, images, concurrency, concurrency)
+        reporter.report(await run_load(args, images, concurrency, args.requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the backend API at fixed concurrency levels"
+    )
+    parser.add_argument(
+        "--api_url",
+        type=str,
+        default="http://localhost:8000",
+        help="Base URL of the backend API",
+    )
+    parser.add_argument(
+        "--scenario",
+        choices=["recognize", "enroll"],
+        default="recognize",
+        help="Requests to send",
+    )
+    parser.add_argument(
+        "--images_dir",
+        type=str,
+        default="tests/assets",
+        help="Directory with face images, searched recursively (e.g. LFW)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16],
+        help="Numbers of concurrent clients to test",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=200, help="Requests per concurrency level"
+    )
+    parser.add_argument("--k", type=int, default=1, help="Matches per recognition")
+    parser.add_argument(
+        "--mode",
+        type=str,
+        default=None,
+        help="Search mode of recognition requests, server default if not given",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="Request timeout in seconds"
+    )
+    add_output_arguments(parser)
+
+    args = parser.parse_args()
+    reporter = Reporter(
+        "http_load",
+        ["scenario", "concurrency", "throughput", "p50_ms", "p99_ms", "errors"],
+        args.json,
+        args.output,
+    )
+    asyncio.run(run(args, reporter))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark of decoding and face detection on large photos.
+
+Compares the full resolution path (decode at native resolution, detect on it)
+with the fast path used by the application (JPEG draft decoding capped
+at IMAGE_DECODE_MAX_SIDE, detection downscaled to FACE_DETECTION_MAX_SIDE).
+Reports latency of decoding, detection and both, and peak resident memory.
+
+Every mode runs in a fresh process, so that its peak RSS is not hidden
+by the previous one. Peak RSS after loading the detector is reported
+as the baseline.
+
+Photos are made by upscaling face images from a directory to the requested
+size, like a phone camera photo. Defaults to 24 megapixel photos of the test assets.
+
+Use --help for usage information.
+"""
+
+import argparse
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from multiprocessing import get_context
+
+import torch
+from PIL import Image
+
+from app.config import settings
+from app.services.face_embedding import (
+    TorchFaceEmbeddingService,
+    decode_image,
+    load_face_detector,
+)
+from benchmarks.common import (
+    Reporter,
+    add_output_arguments,
+    latency_stats,
+    load_images,
+)
+
+
+@dataclass
+class DecodingResult:
+    """Result of benchmarking one decoding mode."""
+
+    mode: str
+    megapixels: float
+    images: int
+    faces_found: int
+    decode_p50_ms: float
+    detect_p50_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    baseline_rss_mb: float
+    peak_rss_mb: float
+
+
+def make_photos(images: list[bytes], megapixels: float) -> list[bytes]:
+    """Upscale images to `megapixels` and encode them as JPEG."""
+    photos = []
+    for image_data in images:
+        with Image.open(BytesIO(image_data)) as image:
+            scale = (megapixels * 1e6 / (image.width * image.height)) ** 0.5
+            size = (round(image.width * scale), round(image.height * scale))
+            photo = image.convert("RGB").resize(size, Image.Resampling.BICUBIC)
+        output = BytesIO()
+        photo.save(output, format="JPEG", quality=90)
+        photos.append(output.getvalue())
+    return photos
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is in KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, photos: list[bytes], megapixels: float) -> DecodingResult:
+    """Decode photos and detect faces in them, in a fresh worker process."""
+    detector = load_face_detector(torch.device("cpu"))
+    if mode == "full":
+        service = TorchFaceEmbeddingService(detector, torch.nn.Identity())
+        max_side = None
+    else:
+        service = TorchFaceEmbeddingService(
+            detector, torch.nn.Identity(), None, settings.face_detection_max_side
+        )
+        max_side = settings.image_decode_max_side
+    baseline_rss = peak_rss_mb()
+
+    decode_latencies = []
+    detect_latencies = []
+    faces_found = 0
+    for photo in photos:
+        start = time.perf_counter()
+        image, _ = decode_image(photo, max_side)
+        decoded = time.perf_counter()
+        if service.get_cropped_image(image) is not None:
+            faces_found += 1
+        decode_latencies.append(decoded - start)
+        detect_latencies.append(time.perf_counter() - decoded)
+
+    return DecodingResult(
+        mode=mode,
+        megapixels=megapixels,
+        images=len(photos),
+        faces_found=faces_found,
+        decode_p50_ms=latency_stats(decode_latencies)["p50_ms"],
+        detect_p50_ms=latency_stats(detect_latencies)["p50_ms"],
+        **latency_stats(
+            [a + b for a, b in zip(decode_latencies, detect_latencies, strict=True)]
+        ),
+        baseline_rss_mb=baseline_rss,
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark full resolution and fast decoding of large photos"
+    )
+    parser.add_argument(
+        "--images_dir",
+        type=str,
+        default="tests/assets",
+        help="Directory with face images, searched recursively (e.g. LFW)",
+    )
+    parser.add_argument(
+        "--num_images", type=int, default=8, help="Photos processed per mode"
+    )
+    parser.add_argument(
+        "--megapixels", type=float, default=24.0, help="Size of the photos"
+    )
+    add_output_arguments(parser)
+
+    args = parser.parse_args()
+    photos = make_photos(load_images(args.images_dir, args.num_images), args.megapixels)
+    reporter = Reporter(
+        "image_decoding",
+        ["mode", "decode_p50_ms", "detect_p50_ms", "p50_ms", "peak_rss_mb"],
+        args.json,
+        args.output,
+    )
+
+    for mode in ["full", "fast"]:
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            reporter.report(
+                executor.submit(run_mode, mode, photos, args.megapixels).result()
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Benchmark of the recognition pipeline stages on a single worker.
+
+Measures latency and throughput of image decoding, face detection (MTCNN)
+and embedding (InceptionResnetV1) at different batch sizes.
+Faces detected in the images are used as embedding input.
+
+Detection and embedding are measured for every backend, PyTorch
+and ONNX Runtime with models exported by `scripts.export_onnx`.
+
+Images are read recursively from a directory, e.g. the LFW dataset,
+and cycled to the requested number. Defaults to the test assets.
+No database is needed.
+
+Use --help for usage information.
+"""
+
+import argparse
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import torch
+from PIL.Image import Image
+from torch import Tensor
+
+from app.config import settings
+from app.services.face_embedding import (
+    TorchFaceEmbeddingService,
+    decode_image,
+    get_device,
+    load_face_detector,
+    load_feature_extractor,
+    load_onnx_face_embedding_service,
+)
+from benchmarks.common import (
+    Reporter,
+    add_output_arguments,
+    latency_stats,
+    load_images,
+)
+
+
+@dataclass
+class StageResult:
+    """Result of benchmarking a single pipeline stage."""
+
+    backend: str
+    stage: str
+    batch_size: int
+    images: int
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+def time_calls(
+    backend: str, stage: str, batch_size: int, batches: Iterable, call: Callable
+) -> tuple[StageResult, list]:
+    """Call `call` on every batch, returns the result and outputs of the calls."""
+    latencies = []
+    outputs = []
+    start = time.perf_counter()
+    for batch in batches:
+        call_start = time.perf_counter()
+        outputs.append(call(batch))
+        latencies.append(time.perf_counter() - call_start)
+    wall_time = time.perf_counter() - start
+
+    images = len(latencies) * batch_size
+    result = StageResult(
+        backend=backend,
+        stage=stage,
+        batch_size=batch_size,
+        images=images,
+        throughput=images / wall_time,
+        **latency_stats(latencies),
+    )
+    return result, outputs
+
+
+def decode(image_data: bytes) -> Image:
+    """Decode image file like the recognition service does."""
+    image, _ = decode_image(
+        image_data, settings.image_decode_max_side, settings.max_image_pixels
+    )
+    return image
+
+
+def load_service(backend: str) -> TorchFaceEmbeddingService:
+    """Load models of the backend like the recognition service does."""
+    if backend == "onnx":
+        return load_onnx_face_embedding_service()
+    device = get_device()
+    return TorchFaceEmbeddingService(
+        load_face_detector(device),
+        load_feature_extractor(
+            settings.facenet_weights_path, settings.facenet_weights_key, device
+        ),
+        detection_max_side=settings.face_detection_max_side,
+    )
+
+
+def benchmark_models(
+    backend: str,
+    decoded: list[Image],
+    args: argparse.Namespace,
+    reporter: Reporter,
+):
+    """Benchmark detection and embedding with models of the backend."""
+    service = load_service(backend)
+
+    # Warm-up, the first forward passes allocate buffers and pick kernels
+    service.get_cropped_image(decoded[0])
+    service.compute_feature_vectors([torch.randn(3, 160, 160)])
+
+    result, crops = time_calls(backend, "detect", 1, decoded, service.get_cropped_image)
+    reporter.report(result)
+
+    faces: list[Tensor] = [crop for crop in crops if crop is not None]
+    if not faces:
+        faces = [torch.randn(3, 160, 160)]
+    for batch_size in args.batch_sizes:
+        face_stream = itertools.cycle(faces)
+        num_batches = max(1, args.num_images // batch_size)
+        batches = (
+            list(itertools.islice(face_stream, batch_size)) for _ in range(num_batches)
+        )
+        result, _ = time_calls(
+            backend, "embed", batch_size, batches, service.compute_feature_vectors
+        )
+        reporter.report(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark decoding, detection and embedding of face images"
+    )
+    parser.add_argument(
+        "--images_dir",
+        type=str,
+        default="tests/assets",
+        help="Directory with face images, searched recursively (e.g. LFW)",
+    )
+    parser.add_argument(
+        "--num_images", type=int, default=64, help="Images processed per stage"
+    )
+    parser.add_argument(
+        "--batch_sizes",
+        type=int,
+        nargs="+",
+        default=[1, 8, 32, 64],
+        help="Embedding batch sizes to test",
+    )
+    parser.add_argument(
+        "--backends",
+        choices=["torch", "onnx"],
+        nargs="+",
+        default=["torch"],
+        help="Model backends to test, onnx needs models exported to ONNX_MODEL_PATH",
+    )
+    add_output_arguments(parser)
+
+    args = parser.parse_args()
+    images = load_images(args.images_dir, args.num_images)
+    reporter = Reporter(
+        "pipeline",
+        ["backend", "stage", "batch_size", "throughput", "p50_ms", "p95_ms", "p99_ms"],
+        args.json,
+        args.output,
+    )
+
+    # Decoding does not depend on the backend
+    decode(images[0])
+    result, decoded = time_calls("-", "decode", 1, images, decode)
+    reporter.report(result)
+
+    for backend in args.backends:
+        benchmark_models(backend, decoded, args, reporter)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Script for exporting feature vectors from the database to an on-disk snapshot.
+
+Workers with SEARCH_BACKEND=memory and VECTOR_INDEX_SNAPSHOT_PATH set open
+the snapshot memory-mapped at startup and load only newer rows from the database.
+Labels and filenames of the snapshot rows are returned with matches,
+so re-export snapshots written before filenames were included.
+Re-run periodically to keep the number of rows loaded at startup small.
+
+Run from the backend directory as a module:
+    python -m scripts.export_embeddings_snapshot --output_path ./snapshot
+
+Use --help for usage information.
+
+The snapshot directory has the following structure:
+- snapshot/
+    - embeddings.npy  (float32 matrix of L2-normalized feature vectors)
+    - rows.npy        (face image id and created_at of each row)
+    - labels.json     (label of each row)
+    - filenames.json  (filename of each row)
+    - metadata.json   (dimension, row count, created_at watermark and model version)
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.config import settings
+from app.db.session import async_session
+from app.services import get_model_version, write_snapshot
+
+
+async def export_snapshot(output_path: str, batch_size: int):
+    """Write snapshot of the database to the output directory."""
+    start = time.perf_counter()
+    async with async_session() as db:  # type: ignore
+        count = await write_snapshot(
+            db,
+            output_path,
+            batch_size=batch_size,
+            model_version=get_model_version(),
+        )
+    elapsed = time.perf_counter() - start
+    print(f"Exported {count} vectors to {output_path} in {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export feature vectors to a memory-mappable snapshot"
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        default=settings.vector_index_snapshot_path,
+        required=settings.vector_index_snapshot_path is None,
+        help="Snapshot directory, defaults to VECTOR_INDEX_SNAPSHOT_PATH",
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=5000, help="Rows fetched per round trip"
+    )
+
+    args = parser.parse_args()
+    asyncio.run(export_snapshot(args.output_path, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
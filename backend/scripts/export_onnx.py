@@ -0,0 +1,75 @@
+"""Script for exporting face detection and embedding models to ONNX.
+
+Exports MTCNN (P-Net, R-Net, O-Net) and InceptionResnetV1 with the configured
+weights, to be run by ONNX Runtime with EMBEDDING_BACKEND=onnx.
+Re-run after changing FACENET_WEIGHTS_PATH, the exported models keep
+the model version of the weights they were exported with.
+
+Requires the onnx extra (`uv sync --extra onnx`).
+
+Run from the backend directory as a module:
+    python -m scripts.export_onnx --output_path ./models/onnx
+
+Use --help for usage information.
+
+The output directory has the following structure:
+- onnx/
+    - pnet.onnx
+    - rnet.onnx
+    - onet.onnx
+    - inception_resnet_v1.onnx
+    - manifest.json  (model version of the exported weights)
+"""
+
+import argparse
+import time
+
+import torch
+
+from app.config import settings
+from app.services.face_embedding import (
+    get_weights_fingerprint,
+    load_face_detector,
+    load_feature_extractor,
+)
+from app.services.onnx_embedding import export_onnx_models
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export face detection and embedding models to ONNX"
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        default=settings.onnx_model_path,
+        help="Output directory, defaults to ONNX_MODEL_PATH",
+    )
+    parser.add_argument(
+        "--weights_path",
+        type=str,
+        default=settings.facenet_weights_path,
+        help="Feature extractor weights, defaults to FACENET_WEIGHTS_PATH",
+    )
+    parser.add_argument(
+        "--weights_key",
+        type=str,
+        default=settings.facenet_weights_key,
+        help="Key of the state dict in the weights file",
+    )
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    device = torch.device("cpu")
+    export_onnx_models(
+        load_face_detector(device),
+        load_feature_extractor(args.weights_path, args.weights_key, device),
+        args.output_path,
+        get_weights_fingerprint(args.weights_path, args.weights_key),
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Exported models to {args.output_path} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Script for calibrating and evaluating feature extractor inference modes.
+
+Modes other than fp32 (FEATURE_EXTRACTOR_MODE) trade a little accuracy
+for speed and must pass the accuracy gate before they are enabled,
+because their feature vectors are compared with the fp32 vectors in the gallery.
+
+1. `calibrate` samples stored face crops from the gallery and saves them
+   for static quantization (FEATURE_EXTRACTOR_CALIBRATION_PATH).
+2. `evaluate` embeds faces of LFW verification pairs in every mode and
+   reports cosine drift from the fp32 vectors, verification accuracy
+   (10-fold, thresholds chosen on the other folds) and throughput per core.
+   Exits with status 1 if any mode drifts or loses accuracy above the limits.
+
+Run from the backend directory as a module:
+    python -m scripts.feature_extractor_modes calibrate --output_path ./models/calibration.pt
+    python -m scripts.feature_extractor_modes evaluate --lfw_path ./lfw --pairs_path ./pairs.txt
+
+Use --help for usage information.
+
+The pairs file uses the LFW format, a header line followed by matched
+pairs `name i j` and mismatched pairs `name1 i name2 j`. Images are read
+from `<lfw_path>/<name>/<name>_<i:04d>.jpg`.
+"""
+
+import argparse
+import asyncio
+import copy
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+from sqlalchemy import func, select
+from torch import Tensor
+
+from app.config import settings
+from app.db import FaceImage
+from app.db.session import async_session
+from app.services import decode_face_crop, decode_image
+from app.services.face_embedding import (
+    TorchFaceEmbeddingService,
+    load_calibration_crops,
+    load_face_detector,
+    load_feature_extractor,
+    optimize_feature_extractor,
+)
+
+MODES = ["fp32", "channels_last", "compile", "int8_dynamic", "int8_static"]
+
+
+@dataclass
+class ModeEvaluation:
+    """Accuracy and speed of one feature extractor mode compared with fp32."""
+
+    mode: str
+    mean_drift: float
+    max_drift: float
+    accuracy: float
+    accuracy_drop: float
+    throughput: float
+    throughput_per_core: float
+    speedup: float
+    passed: bool
+
+
+async def calibrate(output_path: str, num_crops: int):
+    """Save a random sample of stored face crops."""
+    async with async_session() as db:  # type: ignore
+        result = await db.execute(
+            select(FaceImage.face_crop)
+            .where(FaceImage.face_crop.is_not(None))
+            .order_by(func.random())
+            .limit(num_crops)
+        )
+        crops = [decode_face_crop(face_crop) for face_crop in result.scalars()]
+
+    if not crops:
+        sys.exit("No stored face crops, enroll faces or run reembed_faces first")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    torch.save(torch.stack(crops), output_path)
+    print(f"Saved {len(crops)} calibration crops to {output_path}")
+
+
+def read_pairs(lfw_path: str, pairs_path: str) -> list[tuple[str, str, bool]]:
+    """Image paths of verification pairs and whether they show the same person."""
+
+    def image_path(name: str, number: str) -> str:
+        return os.path.join(lfw_path, name, f"{name}_{int(number):04d}.jpg")
+
+    pairs = []
+    with open(pairs_path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 3:
+                name, a, b = fields
+                pairs.append((image_path(name, a), image_path(name, b), True))
+            elif len(fields) == 4:
+                name_a, a, name_b, b = fields
+                pairs.append((image_path(name_a, a), image_path(name_b, b), False))
+    return pairs
+
+
+def detect_crops(paths: set[str]) -> dict[str, Tensor]:
+    """Face crops of the images, like the application computes them."""
+    service = TorchFaceEmbeddingService(
+        load_face_detector(torch.device("cpu")),
+        torch.nn.Identity(),
+        detection_max_side=settings.face_detection_max_side,
+    )
+    crops = {}
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            image, _ = decode_image(f.read(), settings.image_decode_max_side)
+        crop = service.get_cropped_image(image)
+        if crop is not None:
+            crops[path] = crop
+    return crops
+
+
+def embed(
+    model: torch.nn.Module, crops: Tensor, batch_size: int
+) -> tuple[np.ndarray, float]:
+    """Feature vectors of the crops and throughput in embeddings per second."""
+    with torch.inference_mode():
+        # Warm-up, compilation and first forward passes are not measured
+        model(crops[:batch_size])
+        start = time.perf_counter()
+        vectors = torch.cat([model(batch) for batch in crops.split(batch_size)])
+        elapsed = time.perf_counter() - start
+    return vectors.numpy(), len(crops) / elapsed
+
+
+def verification_accuracy(
+    similarities: np.ndarray, same: np.ndarray, num_folds: int = 10
+) -> float:
+    """Mean accuracy over folds, threshold of each fold chosen on the others."""
+    thresholds = np.linspace(-1.0, 1.0, 2001)
+    indices = np.arange(len(same))
+    accuracies = []
+    for fold in np.array_split(indices, num_folds):
+        train = np.setdiff1d(indices, fold)
+        predictions = similarities[train, None] >= thresholds[None, :]
+        train_accuracy = (predictions == same[train, None]).mean(axis=0)
+        threshold = thresholds[np.argmax(train_accuracy)]
+        accuracies.append(np.mean((similarities[fold] >= threshold) == same[fold]))
+    return float(np.mean(accuracies))
+
+
+def evaluate(args: argparse.Namespace) -> bool:
+    """Evaluate the modes against fp32, returns whether all passed the gate."""
+    pairs = read_pairs(args.lfw_path, args.pairs_path)
+    crops = detect_crops({path for a, b, _ in pairs for path in (a, b)})
+    pairs = [(a, b, same) for a, b, same in pairs if a in crops and b in crops]
+    print(f"Evaluating on {len(pairs)} pairs, {len(crops)} faces detected")
+
+    paths = list(crops)
+    index = {path: i for i, path in enumerate(paths)}
+    crop_batch = torch.stack([crops[path] for path in paths])
+    first = np.array([index[a] for a, _, _ in pairs])
+    second = np.array([index[b] for _, b, _ in pairs])
+    same = np.array([same for _, _, same in pairs])
+
+    calibration_crops = None
+    if "int8_static" in args.modes:
+        calibration_crops = load_calibration_crops(args.calibration_path)
+
+    model = load_feature_extractor(
+        args.weights_path, args.weights_key, torch.device("cpu")
+    )
+    baseline, baseline_throughput = embed(model, crop_batch, args.batch_size)
+    baseline_accuracy = verification_accuracy(
+        np.sum(baseline[first] * baseline[second], axis=1), same
+    )
+
+    all_passed = True
+    print(
+        f"{'mode':>14} {'mean_drift':>11} {'max_drift':>10} {'accuracy':>9} "
+        f"{'drop':>8} {'emb/s':>8} {'emb/s/core':>11} {'speedup':>8} {'gate':>5}"
+    )
+    for mode in args.modes:
+        optimized = optimize_feature_extractor(
+            copy.deepcopy(model), mode, calibration_crops
+        )
+        vectors, throughput = embed(optimized, crop_batch, args.batch_size)
+        # Vectors are L2-normalized, cosine distance is 1 - dot product
+        drift = 1.0 - np.sum(vectors * baseline, axis=1)
+        accuracy = verification_accuracy(
+            np.sum(vectors[first] * vectors[second], axis=1), same
+        )
+        result = ModeEvaluation(
+            mode=mode,
+            mean_drift=float(drift.mean()),
+            max_drift=float(drift.max()),
+            accuracy=accuracy,
+            accuracy_drop=baseline_accuracy - accuracy,
+            throughput=throughput,
+            throughput_per_core=throughput / torch.get_num_threads(),
+            speedup=throughput / baseline_throughput,
+            passed=bool(
+                drift.mean() <= args.max_mean_drift
+                and baseline_accuracy - accuracy <= args.max_accuracy_drop
+            ),
+        )
+        all_passed &= result.passed
+        print(
+            f"{result.mode:>14} {result.mean_drift:>11.5f} {result.max_drift:>10.5f} "
+            f"{result.accuracy:>9.4f} {result.accuracy_drop:>8.4f} "
+            f"{result.throughput:>8.1f} {result.throughput_per_core:>11.1f} "
+            f"{result.speedup:>8.2f} {'pass' if result.passed else 'FAIL':>5}"
+        )
+    return all_passed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calibrate and evaluate feature extractor inference modes"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = commands.add_parser(
+        "calibrate", help="Sample gallery face crops for static quantization"
+    )
+    calibrate_parser.add_argument(
+        "--output_path",
+        type=str,
+        default=settings.feature_extractor_calibration_path,
+        required=settings.feature_extractor_calibration_path is None,
+        help="Output file, defaults to FEATURE_EXTRACTOR_CALIBRATION_PATH",
+    )
+    calibrate_parser.add_argument(
+        "--num_crops", type=int, default=512, help="Face crops to sample"
+    )
+
+    evaluate_parser = commands.add_parser(
+        "evaluate", help="Accuracy gate of the modes against fp32 on LFW pairs"
+    )
+    evaluate_parser.add_argument(
+        "--lfw_path", type=str, required=True, help="LFW dataset directory"
+    )
+    evaluate_parser.add_argument(
+        "--pairs_path", type=str, required=True, help="LFW pairs file (pairs.txt)"
+    )
+    evaluate_parser.add_argument(
+        "--modes",
+        choices=MODES[1:],
+        nargs="+",
+        default=MODES[1:],
+        help="Modes to evaluate",
+    )
+    evaluate_parser.add_argument(
+        "--calibration_path",
+        type=str,
+        default=settings.feature_extractor_calibration_path,
+        help="Calibration crops for int8_static, "
+        "defaults to FEATURE_EXTRACTOR_CALIBRATION_PATH",
+    )
+    evaluate_parser.add_argument(
+        "--weights_path",
+        type=str,
+        default=settings.facenet_weights_path,
+        help="Model weights, defaults to FACENET_WEIGHTS_PATH",
+    )
+    evaluate_parser.add_argument(
+        "--weights_key",
+        type=str,
+        default=settings.facenet_weights_key,
+        help="Key of the state dict in the weights file",
+    )
+    evaluate_parser.add_argument(
+        "--batch_size", type=int, default=32, help="Faces embedded per forward pass"
+    )
+    evaluate_parser.add_argument(
+        "--max_mean_drift",
+        type=float,
+        default=0.01,
+        help="Largest accepted mean cosine distance from fp32 vectors",
+    )
+    evaluate_parser.add_argument(
+        "--max_accuracy_drop",
+        type=float,
+        default=0.005,
+        help="Largest accepted loss of verification accuracy",
+    )
+
+    args = parser.parse_args()
+    if args.command == "calibrate":
+        asyncio.run(calibrate(args.output_path, args.num_crops))
+        return
+
+    if "int8_static" in args.modes and args.calibration_path is None:
+        parser.error("--calibration_path is required to evaluate int8_static")
+    if not evaluate(args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
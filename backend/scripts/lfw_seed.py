@@ -1,7 +1,8 @@
 """Script for seeding the database with data from the LFW dataset
 (or another dataset with a similar structure).
 
-It sends REST API requests to the backend server to create person entries.
+It sends REST API requests to the backend server to create person entries,
+using the batch enrollment endpoint with several requests in flight at once.
 
 Use --help for usage information.
 
@@ -17,7 +18,10 @@ The dataset directory should have the following structure:
 """
 
 import argparse
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from dataclasses import dataclass
 
 import requests
@@ -30,31 +34,41 @@ class Configuration:
     dataset_path: str
     api_url: str
     num_entries: int
+    batch_size: int
+    concurrency: int
 
 
 class ApiClient:
     """Client for interacting with the backend API."""
 
-    upload_endpoint = "/api/faces/"
+    batch_upload_endpoint = "/api/faces/batch"
 
     def __init__(self, base_url: str):
         self.base_url = base_url
-        self.upload_url = f"{self.base_url}{self.upload_endpoint}"
-
-    def create_face_entry(self, image_path: str, label: str):
-        """Upload a face image with label to the backend API."""
-        with open(image_path, "rb") as img_file:
-            files = {"file": (image_path, img_file, "image/jpeg")}
-            data = {"label": label}
-            response = requests.post(self.upload_url, files=files, data=data)
+        self.batch_upload_url = f"{self.base_url}{self.batch_upload_endpoint}"
+
+    def create_face_entries(self, entries: list[tuple[str, str]]) -> list[dict]:
+        """Upload (image path, label) pairs in a single batch request.
+
+        Returns per-image results streamed back by the backend API.
+        """
+        with ExitStack() as stack:
+            files = [
+                ("files", (path, stack.enter_context(open(path, "rb")), "image/jpeg"))
+                for path, _ in entries
+            ]
+            data = {"labels": [label for _, label in entries]}
+            response = requests.post(
+                self.batch_upload_url, files=files, data=data, stream=True
+            )
             response.raise_for_status()
-            return response.json()
+            return [json.loads(line) for line in response.iter_lines() if line]
 
 
-def process_dataset(config: Configuration, api_client: ApiClient):
-    """Upload one image per person from the dataset to the backend API."""
+def collect_entries(config: Configuration) -> list[tuple[str, str]]:
+    """Pick one image per person from the dataset, up to the configured limit."""
 
-    num_uploaded = 0
+    entries = []
 
     for face_dir in os.listdir(config.dataset_path):
         person_dir = os.path.join(config.dataset_path, face_dir)
@@ -63,16 +77,50 @@ def process_dataset(config: Configuration, api_client: ApiClient):
 
         label = face_dir
         some_image = os.listdir(person_dir)[0]
-        image_path = os.path.join(person_dir, some_image)
-        try:
-            response = api_client.create_face_entry(image_path, label)
-            print(f"Uploaded {image_path} as {label}: {response}")
+        entries.append((os.path.join(person_dir, some_image), label))
+        if len(entries) >= config.num_entries:
+            break
+
+    return entries
+
+
+def upload_batch(api_client: ApiClient, batch: list[tuple[str, str]]) -> int:
+    """Upload a single batch and print per-image results.
+
+    Returns the number of successfully uploaded images.
+    """
+    try:
+        results = api_client.create_face_entries(batch)
+    except Exception as e:
+        print(f"Failed to upload batch starting with {batch[0][0]}: {e}")
+        return 0
+
+    num_uploaded = 0
+    for (image_path, label), result in zip(batch, results):
+        if result["error"] is None:
+            print(f"Uploaded {image_path} as {label}: {result['id']}")
             num_uploaded += 1
-            if num_uploaded >= config.num_entries:
-                break
-        except Exception as e:
-            print(f"Failed to upload {image_path}: {e}")
-            continue
+        else:
+            print(f"Failed to upload {image_path}: {result['error']}")
+
+    return num_uploaded
+
+
+def process_dataset(config: Configuration, api_client: ApiClient):
+    """Upload one image per person from the dataset to the backend API."""
+
+    entries = collect_entries(config)
+    batches = [
+        entries[i : i + config.batch_size]
+        for i in range(0, len(entries), config.batch_size)
+    ]
+
+    with ThreadPoolExecutor(max_workers=config.concurrency) as executor:
+        num_uploaded = sum(
+            executor.map(lambda batch: upload_batch(api_client, batch), batches)
+        )
+
+    print(f"Uploaded {num_uploaded} of {len(entries)} images")
 
 
 def main():
@@ -91,6 +139,12 @@ def main():
     parser.add_argument(
         "--num_entries", type=int, default=1000, help="Number of entries to create"
     )
+    parser.add_argument(
+        "--batch_size", type=int, default=32, help="Number of images per request"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Number of concurrent requests"
+    )
 
     args = parser.parse_args()
 
@@ -98,6 +152,8 @@ def main():
         dataset_path=args.dataset_path,
         api_url=args.api_url,
         num_entries=args.num_entries,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
     )
 
     api_client = ApiClient(base_url=config.api_url)
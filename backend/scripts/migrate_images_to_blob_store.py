@@ -0,0 +1,79 @@
+"""Script for moving image files from the face_images table to the blob store.
+
+Moves image data of rows created with database image storage
+(or before the blob store was introduced) to the configured blob store
+and clears the `image_data` column.
+Every batch is committed separately, so the script can be interrupted and re-run.
+
+After it finishes, run VACUUM FULL (or pg_repack) on face_images
+to give the space taken by image data back to the operating system.
+
+Run from the backend directory as a module:
+    python -m scripts.migrate_images_to_blob_store
+
+Use --help for usage information.
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import select, update
+
+from app.db import FaceImage
+from app.db.session import async_session
+from app.services import content_hash, detect_content_type, get_blob_store
+
+
+async def migrate_images(batch_size: int):
+    """Move image data to the blob store in batches until no row has it."""
+    blob_store = get_blob_store()
+    num_migrated = 0
+
+    async with async_session() as db:  # type: ignore
+        while True:
+            result = await db.execute(
+                select(FaceImage.id, FaceImage.image_data)
+                .where(FaceImage.image_data.is_not(None))
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            updates = []
+            for id, image_data in rows:
+                image_key = await asyncio.to_thread(blob_store.put, image_data)
+                updates.append(
+                    {
+                        "id": id,
+                        "image_key": image_key,
+                        "content_type": detect_content_type(image_data),
+                        "image_size": len(image_data),
+                        "content_hash": content_hash(image_data),
+                        "image_data": None,
+                    }
+                )
+
+            await db.execute(update(FaceImage), updates)
+            await db.commit()
+
+            num_migrated += len(rows)
+            print(f"Moved {num_migrated} images to the blob store")
+
+    print(f"Done, moved {num_migrated} images")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move image files from the database to the blob store"
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=100, help="Rows moved per transaction"
+    )
+
+    args = parser.parse_args()
+    asyncio.run(migrate_images(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
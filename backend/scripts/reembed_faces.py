@@ -0,0 +1,368 @@
+"""Script for migrating stored feature vectors to a new embedding model version.
+
+Every feature vector is tagged with the version (fingerprint) of the model weights
+that computed it and the application searches only vectors of its own version.
+The slow part of an upgrade runs online, the switch itself needs a short
+stop of the application:
+
+1. `backfill --weights_path <new weights>` computes vectors of the new version
+   into the face_embeddings staging table, in batches committed separately,
+   while the application keeps serving the current version.
+   Stored face crops are fed directly to the feature extractor, face detection
+   runs only for rows without a crop, and their crops are saved on the way.
+   Images where no face is detected are staged without a vector.
+   Faces that are already staged are skipped, so an interrupted run is resumed
+   by running it again and face detection is never repeated on failed images.
+   Run it again right before the next step, so that little is left for it.
+2. Stop the application (all web workers and the inference server).
+   The cutover overwrites vectors in place, workers still running the old
+   weights would find no matches and their in-memory indexes would be stale.
+3. `cutover --weights_path <new weights>` embeds faces enrolled since the backfill
+   and moves all staged vectors to face_images in a single transaction.
+   Identity templates of the new version are rebuilt in the same transaction.
+4. Start the application with the new weights (FACENET_WEIGHTS_PATH)
+   and re-export the embeddings snapshot.
+
+After applying the embedding versions migration, tag existing vectors
+with the version of the deployed weights using the `stamp` command.
+
+Run from the backend directory as a module:
+    python -m scripts.reembed_faces backfill --weights_path ./models/new.pth
+
+Use --help for usage information.
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import FaceEmbedding, FaceImage
+from app.db.session import async_session
+from app.services import (
+    BlobStore,
+    FaceEmbeddingService,
+    decode_face_crop,
+    decode_image,
+    encode_face_crop,
+    get_blob_store,
+    rebuild_identities,
+)
+from app.services.face_embedding import (
+    TorchFaceEmbeddingService,
+    get_device,
+    get_weights_fingerprint,
+    load_face_detector,
+    load_feature_extractor,
+)
+
+
+def load_face_embedding_service(
+    weights_path: str | None, weights_key: str
+) -> FaceEmbeddingService:
+    """Load models with the given weights, tagged with their model version.
+
+    Faces are detected with the same settings as in the application.
+    """
+    device = get_device()
+    return TorchFaceEmbeddingService(
+        load_face_detector(device),
+        load_feature_extractor(weights_path, weights_key, device),
+        get_weights_fingerprint(weights_path, weights_key),
+        settings.face_detection_max_side,
+    )
+
+
+def detect_face_crop(
+    face_embedding_service: FaceEmbeddingService, image_data: bytes
+) -> bytes | None:
+    """Detect face in the original image and encode its crop, None if not found."""
+    image, _ = decode_image(image_data, settings.image_decode_max_side)
+    cropped_image = face_embedding_service.get_cropped_image(image)
+    return None if cropped_image is None else encode_face_crop(cropped_image)
+
+
+def embed_face_crops(
+    face_embedding_service: FaceEmbeddingService, face_crops: list[bytes]
+) -> np.ndarray:
+    """Compute feature vectors of encoded face crops in a single forward pass."""
+    return face_embedding_service.compute_feature_vectors(
+        [decode_face_crop(face_crop) for face_crop in face_crops]
+    )
+
+
+async def load_image(
+    blob_store: BlobStore, image_key: str | None, image_data: bytes | None
+) -> bytes:
+    """Read original image from the blob store or the database row."""
+    if image_data is not None:
+        return image_data
+    return await asyncio.to_thread(blob_store.get, image_key)  # type: ignore
+
+
+async def embed_faces(
+    db: AsyncSession,
+    face_embedding_service: FaceEmbeddingService,
+    rows: list[tuple[UUID, bytes | None]],
+) -> tuple[int, list[UUID]]:
+    """Compute feature vectors of (id, face crop) rows and stage them.
+
+    Images where no face was detected are staged without a vector.
+    Returns the number of faces that needed face detection
+    and ids of images where no face was detected.
+    """
+    blob_store = get_blob_store()
+    face_crops = {id: face_crop for id, face_crop in rows if face_crop is not None}
+    detected: dict[UUID, bytes] = {}
+    failed: list[UUID] = []
+
+    missing = [id for id, face_crop in rows if face_crop is None]
+    if missing:
+        images = await db.execute(
+            select(FaceImage.id, FaceImage.image_key, FaceImage.image_data).where(
+                FaceImage.id.in_(missing)
+            )
+        )
+        for id, image_key, image_data in images.all():
+            image = await load_image(blob_store, image_key, image_data)
+            face_crop = await asyncio.to_thread(
+                detect_face_crop, face_embedding_service, image
+            )
+            if face_crop is None:
+                failed.append(id)
+            else:
+                detected[id] = face_crop
+        face_crops |= detected
+
+    model_version = face_embedding_service.model_version
+    staged = [
+        {"face_image_id": id, "model_version": model_version, "feature_vector": None}
+        for id in failed
+    ]
+    if face_crops:
+        vectors = await asyncio.to_thread(
+            embed_face_crops, face_embedding_service, list(face_crops.values())
+        )
+        staged += [
+            {
+                "face_image_id": id,
+                "model_version": model_version,
+                "feature_vector": vector,
+            }
+            for id, vector in zip(face_crops, vectors)
+        ]
+
+    if staged:
+        await db.execute(insert(FaceEmbedding), staged)
+    if detected:
+        await db.execute(
+            update(FaceImage),
+            [{"id": id, "face_crop": face_crop} for id, face_crop in detected.items()],
+        )
+    return len(detected), failed
+
+
+async def backfill(
+    db: AsyncSession,
+    face_embedding_service: FaceEmbeddingService,
+    batch_size: int,
+    commit: bool = True,
+) -> list[UUID]:
+    """Stage vectors of the new version for all faces that are not staged yet.
+
+    Returns ids of images where no face was detected in this run.
+    """
+    model_version = face_embedding_service.model_version
+    staged = (
+        select(FaceEmbedding.face_image_id)
+        .where(
+            FaceEmbedding.face_image_id == FaceImage.id,
+            FaceEmbedding.model_version == model_version,
+        )
+        .exists()
+    )
+    pending = select(FaceImage.id, FaceImage.face_crop).where(
+        FaceImage.embedding_version.is_distinct_from(model_version), ~staged
+    )
+
+    num_embedded = 0
+    num_detected = 0
+    failed: list[UUID] = []
+    after: UUID | None = None
+    start = time.perf_counter()
+
+    while True:
+        query = pending.order_by(FaceImage.id).limit(batch_size)
+        if after is not None:
+            query = query.where(FaceImage.id > after)
+        rows = [(id, face_crop) for id, face_crop in (await db.execute(query)).all()]
+        if not rows:
+            break
+        after = rows[-1][0]
+
+        batch_detected, batch_failed = await embed_faces(
+            db, face_embedding_service, rows
+        )
+        if commit:
+            await db.commit()
+
+        num_embedded += len(rows) - len(batch_failed)
+        num_detected += batch_detected
+        failed += batch_failed
+        print(f"Embedded {num_embedded} faces with model version {model_version}")
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Backfill done, embedded {num_embedded} faces in {elapsed:.1f}s "
+        f"({num_detected} needed face detection)"
+    )
+    if failed:
+        print(f"No face detected in {len(failed)} images, they will not be searched:")
+        for id in failed:
+            print(f"  {id}")
+    return failed
+
+
+async def cutover(
+    db: AsyncSession, face_embedding_service: FaceEmbeddingService, batch_size: int
+):
+    """Finish the backfill and switch all faces to the new version atomically.
+
+    Vectors of the old version are overwritten, the application must be stopped.
+    Images without a detected face keep their old version and are not searched,
+    their staged rows without a vector are kept so that later runs skip them.
+    """
+    model_version = face_embedding_service.model_version
+
+    # Blocks enrollment until commit, so that no face is left with the old version
+    await db.execute(text("LOCK TABLE face_images IN SHARE ROW EXCLUSIVE MODE"))
+    await backfill(db, face_embedding_service, batch_size, commit=False)
+
+    result = await db.execute(
+        update(FaceImage)
+        .where(
+            FaceImage.id == FaceEmbedding.face_image_id,
+            FaceEmbedding.model_version == model_version,
+            FaceEmbedding.feature_vector.is_not(None),
+        )
+        .values(
+            feature_vector=FaceEmbedding.feature_vector,
+            embedding_version=FaceEmbedding.model_version,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        delete(FaceEmbedding).where(
+            FaceEmbedding.model_version == model_version,
+            FaceEmbedding.feature_vector.is_not(None),
+        )
+    )
+    num_identities = await rebuild_identities(db, model_version)
+    await db.commit()
+    count = result.rowcount  # type: ignore
+    print(f"Switched {count} faces to model version {model_version}")
+    print(f"Rebuilt {num_identities} identity templates")
+
+
+async def stamp(db: AsyncSession, model_version: str):
+    """Tag feature vectors without a version with the given model version."""
+    result = await db.execute(
+        update(FaceImage)
+        .where(
+            FaceImage.embedding_version.is_(None),
+            FaceImage.feature_vector.is_not(None),
+        )
+        .values(embedding_version=model_version)
+    )
+    num_identities = await rebuild_identities(db, model_version)
+    await db.commit()
+    count = result.rowcount  # type: ignore
+    print(f"Tagged {count} faces with model version {model_version}")
+    print(f"Rebuilt {num_identities} identity templates")
+
+
+async def print_versions(db: AsyncSession):
+    """Print the number of faces with vectors of each model version."""
+    result = await db.execute(
+        select(FaceImage.embedding_version, func.count())
+        .group_by(FaceImage.embedding_version)
+        .order_by(FaceImage.embedding_version)
+    )
+    for model_version, count in result.all():
+        print(f"  {model_version}: {count} faces")
+
+
+async def run(args: argparse.Namespace):
+    async with async_session() as db:  # type: ignore
+        if args.command == "stamp":
+            await stamp(
+                db,
+                get_weights_fingerprint(
+                    settings.facenet_weights_path, settings.facenet_weights_key
+                ),
+            )
+        else:
+            service = load_face_embedding_service(args.weights_path, args.weights_key)
+            print(f"Target model version: {service.model_version}")
+            if args.command == "backfill":
+                await backfill(db, service, args.batch_size)
+            else:
+                await cutover(db, service, args.batch_size)
+
+        print("Embedding versions:")
+        await print_versions(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migrate stored feature vectors to a new embedding model version",
+        epilog=(
+            "Upgrade order: backfill while the application runs, stop the application, "
+            "cutover, then start the application with the new weights."
+        ),
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command, help in [
+        ("backfill", "Stage vectors of the new version, resumable, runs online"),
+        (
+            "cutover",
+            "Finish the backfill and switch to the new version atomically, "
+            "overwrites the old vectors, stop the application first",
+        ),
+    ]:
+        subparser = commands.add_parser(command, help=help, description=help)
+        subparser.add_argument(
+            "--weights_path",
+            type=str,
+            default=settings.facenet_weights_path,
+            help="New model weights, defaults to FACENET_WEIGHTS_PATH",
+        )
+        subparser.add_argument(
+            "--weights_key",
+            type=str,
+            default=settings.facenet_weights_key,
+            help="Key of the state dict in the weights file",
+        )
+        subparser.add_argument(
+            "--batch_size",
+            type=int,
+            default=256,
+            help="Faces embedded per forward pass",
+        )
+
+    commands.add_parser(
+        "stamp", help="Tag unversioned vectors with the version of deployed weights"
+    )
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
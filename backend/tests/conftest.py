@@ -3,8 +3,12 @@
 Overrides FastAPI dependencies for testing - uses separate database for tests.
 """
 
+import pytest
 import pytest_asyncio
+import torch
+from facenet_pytorch import InceptionResnetV1
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -43,6 +47,37 @@ async def clean_db():
     yield
 
 
+@pytest_asyncio.fixture
+async def db():
+    """Session connected to the test database, for calling services directly."""
+
+    async with async_session() as session:
+        yield session
+
+
+@pytest.fixture
+def weights_path(tmp_path) -> str:
+    """Randomly initialized InceptionResnetV1 weights saved like a training checkpoint."""
+    torch.manual_seed(0)
+    path = str(tmp_path / "weights.pth")
+    torch.save({"model_state_dict": InceptionResnetV1().state_dict()}, path)
+    return path
+
+
+@pytest.fixture
+def sql_statements():
+    """Fixture collecting SQL statements sent to the test database during the test."""
+
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
 async def get_test_db():
     """Dependency injector to override the get_db dependency with a test database session."""
     async with async_session() as session:
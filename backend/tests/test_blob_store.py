@@ -0,0 +1,25 @@
+"""Unit tests for the local blob store."""
+
+import hashlib
+
+import pytest
+
+from app.services import LocalBlobStore
+
+
+def test_local_blob_store_is_content_addressed(tmp_path):
+    """Blobs are keyed by SHA-256 of their data, storing the same data is a no-op."""
+    blob_store = LocalBlobStore(str(tmp_path))
+
+    key = blob_store.put(b"image")
+    assert key == hashlib.sha256(b"image").hexdigest()
+    assert blob_store.put(b"image") == key
+    assert blob_store.get(key) == b"image"
+
+    path = blob_store.local_path(key)
+    assert path is not None
+    with open(path, "rb") as f:
+        assert f.read() == b"image"
+
+    with pytest.raises(KeyError):
+        blob_store.get(hashlib.sha256(b"missing").hexdigest())
@@ -0,0 +1,113 @@
+"""Unit tests for micro-batching of embedding requests.
+
+Runs without models, batches are computed by a fake feature extractor.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+import numpy as np
+import pytest
+import torch
+from torch import Tensor
+
+from app.services.face_embedding import BatchingFaceEmbeddingService, EmbeddingBatcher
+
+
+class FakeExtractor:
+    """Returns the first value of every crop as its vector and records batch sizes.
+
+    Calls block until `release` is set, so that requests queue up meanwhile.
+    """
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batch_sizes: list[int] = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, cropped_images: Sequence[Tensor]) -> np.ndarray:
+        self.started.set()
+        self.release.wait()
+        self.batch_sizes.append(len(cropped_images))
+        if self.fail:
+            raise RuntimeError("Forward pass failed")
+        return np.stack([image.flatten()[:1].numpy() for image in cropped_images])
+
+
+def crop(value: float) -> Tensor:
+    return torch.full((3, 4, 4), value)
+
+
+def test_concurrent_requests_are_batched():
+    """Requests queued during a forward pass run together, each gets its own row."""
+    extractor = FakeExtractor()
+    extractor.release.clear()
+    batcher = EmbeddingBatcher(extractor, max_batch_size=4, max_wait_ms=50)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(batcher.submit, crop(0))
+        assert extractor.started.wait(timeout=5)
+        with ThreadPoolExecutor(max_workers=6) as waiting_pool:
+            values = [1, 2, 3, 4, 5, 6]
+            waiting = [
+                waiting_pool.submit(batcher.submit, crop(value)) for value in values
+            ]
+            while batcher._queue.qsize() < len(values):
+                time.sleep(0.001)
+            extractor.release.set()
+            results = [future.result(timeout=5) for future in waiting]
+
+    assert float(first.result(timeout=5)[0]) == 0
+    assert [float(result[0]) for result in results] == values
+    assert extractor.batch_sizes == [1, 4, 2]
+
+
+def test_single_request_is_flushed_after_max_wait():
+    extractor = FakeExtractor()
+    batcher = EmbeddingBatcher(extractor, max_batch_size=8, max_wait_ms=20)
+
+    start = time.monotonic()
+    vector = batcher.submit(crop(7))
+    elapsed = time.monotonic() - start
+
+    assert float(vector[0]) == 7
+    assert extractor.batch_sizes == [1]
+    assert 0.015 <= elapsed < 1
+
+
+def test_batch_error_is_raised_in_every_waiter():
+    extractor = FakeExtractor(fail=True)
+    batcher = EmbeddingBatcher(extractor, max_batch_size=4, max_wait_ms=50)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(batcher.submit, crop(value)) for value in range(4)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="Forward pass failed"):
+                future.result(timeout=5)
+    assert sum(extractor.batch_sizes) == 4
+
+    # The batcher keeps serving requests after a failed batch
+    extractor.fail = False
+    assert float(batcher.submit(crop(9))[0]) == 9
+
+
+def test_batching_service_batches_only_single_requests():
+    extractor = FakeExtractor()
+
+    class Service:
+        model_version = "test"
+        compute_feature_vectors = extractor
+
+    service = BatchingFaceEmbeddingService(
+        Service(), max_batch_size=4, max_wait_ms=5  # type: ignore
+    )
+
+    assert service.model_version == "test"
+    assert float(service.compute_feature_vector(crop(3))[0]) == 3
+    vectors = service.compute_feature_vectors([crop(1), crop(2), crop(3)])
+    assert vectors[:, 0].tolist() == [1, 2, 3]
+    assert extractor.batch_sizes == [1, 3]
@@ -0,0 +1,70 @@
+"""Unit tests for the embedding cache.
+
+Runs without the database, vectors are random.
+"""
+
+import numpy as np
+
+from app.services import EmbeddingCache, content_hash
+
+
+def random_vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(512).astype(np.float32)
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Entries over the memory budget are evicted, least recently used first."""
+    vector_bytes = random_vector(0).nbytes
+    cache = EmbeddingCache(max_bytes=2 * vector_bytes, fingerprint="test")
+
+    cache.put("a", random_vector(0))
+    cache.put("b", random_vector(1))
+    assert cache.get("a") is not None
+    cache.put("c", random_vector(2))
+
+    assert cache.get("b") is None
+    assert np.array_equal(cache.get("a").feature_vector, random_vector(0))  # type: ignore
+    assert np.array_equal(cache.get("c").feature_vector, random_vector(2))  # type: ignore
+    assert cache.size_bytes == 2 * vector_bytes
+
+
+def test_disk_backend_is_shared_per_fingerprint(tmp_path):
+    """Caches with the same model fingerprint share entries stored on disk."""
+    image_hash = content_hash(b"image")
+    writer = EmbeddingCache(max_bytes=0, fingerprint="model-a", disk_path=tmp_path)
+    writer.put(image_hash, random_vector(0))
+    assert len(writer) == 0
+
+    reader = EmbeddingCache(
+        max_bytes=1024 * 1024, fingerprint="model-a", disk_path=tmp_path
+    )
+    other_model = EmbeddingCache(
+        max_bytes=1024 * 1024, fingerprint="model-b", disk_path=tmp_path
+    )
+
+    assert np.array_equal(
+        reader.get(image_hash).feature_vector, random_vector(0)  # type: ignore
+    )
+    assert len(reader) == 1
+    assert other_model.get(image_hash) is None
+
+
+def test_face_crop_is_cached_with_the_vector(tmp_path):
+    """Face crop is stored next to the vector and kept when the vector is put again."""
+    image_hash = content_hash(b"image")
+    cache = EmbeddingCache(
+        max_bytes=1024 * 1024, fingerprint="model-a", disk_path=tmp_path
+    )
+    cache.put(image_hash, random_vector(0), b"png")
+    cache.put(image_hash, random_vector(0))
+
+    entry = cache.get(image_hash)
+    assert entry is not None and entry.face_crop == b"png"
+    assert cache.size_bytes == random_vector(0).nbytes + len(b"png")
+
+    reader = EmbeddingCache(
+        max_bytes=1024 * 1024, fingerprint="model-a", disk_path=tmp_path
+    )
+    entry = reader.get(image_hash)
+    assert entry is not None and entry.face_crop == b"png"
+    assert np.array_equal(entry.feature_vector, random_vector(0))
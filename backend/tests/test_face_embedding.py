@@ -0,0 +1,215 @@
+"""Unit tests for image decoding, face detection, face crop encoding
+and loading of the feature extractor.
+
+Runs without the database and without downloading pretrained weights.
+"""
+
+import os
+import subprocess
+import sys
+from io import BytesIO
+
+import numpy as np
+import pytest
+import torch
+from facenet_pytorch.models.mtcnn import fixed_image_standardization
+from PIL import Image
+
+from app.services import (
+    ImageTransform,
+    decode_face_crop,
+    decode_image,
+    encode_face_crop,
+    face_embedding,
+)
+from app.services.face_embedding import (
+    TorchFaceEmbeddingService,
+    get_weights_fingerprint,
+    load_face_detector,
+    load_feature_extractor,
+    load_scripted_feature_extractor,
+    optimize_feature_extractor,
+)
+
+
+def test_face_crop_encoding_is_lossless():
+    """Standardized crop of uint8 pixels survives the PNG round trip unchanged."""
+    generator = torch.Generator().manual_seed(0)
+    pixels = torch.randint(0, 256, (3, 160, 160), generator=generator).float()
+    cropped_image = fixed_image_standardization(pixels)
+
+    decoded = decode_face_crop(encode_face_crop(cropped_image))
+
+    assert decoded.shape == cropped_image.shape
+    assert torch.equal(decoded, cropped_image)
+
+
+def test_scripted_feature_extractor_matches_eager_model(
+    weights_path, tmp_path, monkeypatch
+):
+    """TorchScript feature extractor computes the same vectors and is loaded from cache.
+
+    - Compile the feature extractor and compare it with the eager model
+      on a batch of a different size than the one it was traced with.
+    - Load it again, the cached file is used without building the eager model.
+    """
+    device = torch.device("cpu")
+    cache_path = str(tmp_path / "cache")
+    batch = torch.randn(3, 3, 160, 160)
+
+    model = load_feature_extractor(weights_path, "model_state_dict", device)
+    scripted = load_scripted_feature_extractor(
+        weights_path, "model_state_dict", device, cache_path
+    )
+    with torch.inference_mode():
+        expected = model(batch)
+        assert torch.allclose(scripted(batch), expected, atol=1e-5)
+
+    assert len(os.listdir(cache_path)) == 1
+
+    def build_eager_model(*args):
+        raise AssertionError("Feature extractor should be loaded from the cache")
+
+    monkeypatch.setattr(face_embedding, "load_feature_extractor", build_eager_model)
+    cached = load_scripted_feature_extractor(
+        weights_path, "model_state_dict", device, cache_path
+    )
+    with torch.inference_mode():
+        assert torch.allclose(cached(batch), expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("mode", ["channels_last", "int8_dynamic", "int8_static"])
+def test_optimized_feature_extractor_stays_close_to_fp32(weights_path, mode):
+    """Feature vectors of faster inference modes point in the same direction as fp32."""
+    device = torch.device("cpu")
+    generator = torch.Generator().manual_seed(0)
+    calibration_crops = torch.randn(16, 3, 160, 160, generator=generator)
+    batch = torch.randn(3, 3, 160, 160, generator=generator)
+
+    model = load_feature_extractor(weights_path, "model_state_dict", device)
+    with torch.inference_mode():
+        expected = model(batch)
+    optimized = optimize_feature_extractor(model, mode, calibration_crops)
+    with torch.inference_mode():
+        vectors = optimized(batch)
+
+    assert vectors.shape == expected.shape
+    assert torch.all(torch.sum(vectors * expected, dim=1) > 0.99)
+
+
+def test_decode_image_applies_orientation_and_max_side():
+    """Large JPEG is decoded rotated upright and downscaled to the maximum size."""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to display
+    output = BytesIO()
+    Image.new("RGB", (4000, 3000)).save(output, format="JPEG", exif=exif)
+
+    image, transform = decode_image(output.getvalue(), max_side=1000)
+
+    assert image.mode == "RGB"
+    assert image.size == (750, 1000)
+    assert transform == ImageTransform((4000, 3000), (750, 1000), orientation=6)
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_image_transform_maps_box_to_uploaded_image(orientation):
+    """Box found in the decoded image is mapped back through scale and rotation."""
+    image = Image.new("RGB", (4000, 3000))
+    image.paste((255, 255, 255), (400, 600, 1200, 1000))
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    output = BytesIO()
+    image.save(output, format="JPEG", exif=exif)
+
+    decoded, transform = decode_image(output.getvalue(), max_side=1000)
+    box = decoded.convert("L").point(lambda value: 255 * (value > 128)).getbbox()
+
+    assert box is not None
+    assert np.allclose(transform.to_original(box), (400, 600, 1200, 1000), atol=8)
+
+
+def test_decode_image_rejects_too_many_pixels():
+    output = BytesIO()
+    Image.new("RGB", (1000, 1000)).save(output, format="PNG")
+
+    with pytest.raises(ValueError):
+        decode_image(output.getvalue(), max_pixels=999_999)
+
+
+def test_downscaled_detection_maps_boxes_to_input_image():
+    """Faces detected in a downscaled image are boxed and cropped in input pixels."""
+    with Image.open("tests/assets/person_1_face_1.jpg") as image:
+        image = image.convert("RGB")
+    large_image = image.resize((image.width * 8, image.height * 8))
+    detector = load_face_detector(torch.device("cpu"))
+
+    [face] = TorchFaceEmbeddingService(detector, torch.nn.Identity()).detect_faces(
+        image
+    )
+    [large_face] = TorchFaceEmbeddingService(
+        detector, torch.nn.Identity(), detection_max_side=512
+    ).detect_faces(large_image)
+
+    assert np.allclose(np.array(large_face.box) / 8, face.box, atol=4)
+    assert large_face.cropped_image.shape == (3, 160, 160)
+
+
+def test_face_box_in_decoded_image_maps_to_uploaded_image():
+    """Face detected in a rotated image over the decode limit is boxed in its pixels."""
+    with Image.open("tests/assets/person_1_face_1.jpg") as image:
+        image = image.convert("RGB")
+    detector = load_face_detector(torch.device("cpu"))
+    service = TorchFaceEmbeddingService(detector, torch.nn.Identity())
+    [face] = service.detect_faces(image)
+    # Stored rotated, upright when displayed according to EXIF orientation 6
+    stored = image.resize((image.width * 8, image.height * 8)).transpose(
+        Image.Transpose.ROTATE_90
+    )
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    output = BytesIO()
+    stored.save(output, format="JPEG", exif=exif)
+
+    decoded, transform = decode_image(output.getvalue(), max_side=image.width * 2)
+    [decoded_face] = service.detect_faces(decoded)
+
+    x1, y1, x2, y2 = np.array(face.box) * 8
+    width = image.width * 8
+    expected = (y1, width - x2, y2, width - x1)
+    assert max(decoded.size) < max(stored.size)
+    assert np.allclose(transform.to_original(decoded_face.box), expected, atol=32)
+
+
+def test_weights_fingerprint_is_cached_by_file_metadata(weights_path, tmp_path):
+    """Fingerprint is read from the cache until the weights file changes."""
+    cache_path = str(tmp_path / "cache")
+    fingerprint = get_weights_fingerprint(weights_path, "model_state_dict")
+    assert (
+        get_weights_fingerprint(weights_path, "model_state_dict", cache_path)
+        == fingerprint
+    )
+
+    [cached_file] = os.listdir(cache_path)
+    with open(os.path.join(cache_path, cached_file), "w") as f:
+        f.write("from-cache")
+    assert (
+        get_weights_fingerprint(weights_path, "model_state_dict", cache_path)
+        == "from-cache"
+    )
+
+    stat = os.stat(weights_path)
+    os.utime(weights_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert (
+        get_weights_fingerprint(weights_path, "model_state_dict", cache_path)
+        == fingerprint
+    )
+
+
+def test_application_import_does_not_compute_model_version():
+    """Singletons depending on the model version are created on first use."""
+    code = (
+        "import app.main\n"
+        "from app.services import get_model_version\n"
+        "assert get_model_version.cache_info().currsize == 0\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
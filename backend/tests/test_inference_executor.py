@@ -0,0 +1,106 @@
+"""Unit tests for the bounded inference executor and the 503 response."""
+
+import asyncio
+import threading
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.services import (
+    InferenceExecutor,
+    InferenceQueueFullError,
+    get_face_recognition_service,
+)
+
+
+async def wait_for(condition, timeout_s: float = 5.0):
+    """Poll the condition until it holds."""
+    for _ in range(int(timeout_s / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not met in time")
+
+
+@pytest.mark.asyncio
+async def test_jobs_over_queue_size_are_rejected():
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    running = asyncio.create_task(executor.run(release.wait))
+    await wait_for(lambda: executor._running == 1)
+    waiting = asyncio.create_task(executor.run(lambda: 42))
+    await wait_for(lambda: executor.queue_depth == 1)
+
+    with pytest.raises(InferenceQueueFullError):
+        await executor.run(lambda: 0)
+
+    release.set()
+    assert await running is True
+    assert await waiting == 42
+    assert executor.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_running_job_counted():
+    """Running job of a disconnected client still occupies its worker."""
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    running = asyncio.create_task(executor.run(release.wait))
+    await wait_for(lambda: executor._running == 1)
+    running.cancel()
+    await asyncio.sleep(0.05)
+    assert executor._in_flight == 1
+
+    # The worker is still busy, so one job can wait and the next is rejected
+    waiting = asyncio.create_task(executor.run(lambda: 42))
+    await wait_for(lambda: executor.queue_depth == 1)
+    with pytest.raises(InferenceQueueFullError):
+        await executor.run(lambda: 0)
+
+    release.set()
+    assert await waiting == 42
+    await wait_for(lambda: executor._in_flight == 0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_drops_waiting_job():
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    running = asyncio.create_task(executor.run(release.wait))
+    await wait_for(lambda: executor._running == 1)
+    waiting = asyncio.create_task(executor.run(lambda: 42))
+    await wait_for(lambda: executor.queue_depth == 1)
+    waiting.cancel()
+    await wait_for(lambda: executor.queue_depth == 0)
+
+    release.set()
+    await running
+
+
+class QueueFullService:
+    """Face recognition service whose inference queue is always full."""
+
+    async def find_closest_faces(self, *args, **kwargs):
+        raise InferenceQueueFullError("Inference queue is full (16 jobs waiting)")
+
+
+@pytest.mark.asyncio
+async def test_rejected_inference_returns_503_with_retry_after():
+    app.dependency_overrides[get_face_recognition_service] = QueueFullService
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            response = await client.post(
+                "/api/faces/recognize", files={"file": ("a.jpg", b"x", "image/jpeg")}
+            )
+    finally:
+        del app.dependency_overrides[get_face_recognition_service]
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert "queue is full" in response.json()["detail"]
@@ -5,11 +5,36 @@ Tests are using a separate database for testing that is recreated for each test
 Runs the entire FastAPI application and connects to PostgreSQL database.
 """
 
+import json
+import tarfile
+from io import BytesIO
 from typing import Any
 from uuid import UUID
 
+import numpy as np
 import pytest
 from httpx import AsyncClient
+from PIL import Image
+from sqlalchemy import event, func, select, text, update
+
+from app.config import settings
+from app.db import FaceEmbedding, FaceImage, Identity
+from app.main import app
+from app.services import (
+    EmbeddingCache,
+    FaceRecognitionService,
+    InMemoryVectorIndex,
+    LocalBlobStore,
+    content_hash,
+    decode_face_crop,
+    get_face_embedding_service,
+    get_vector_index,
+    open_snapshot,
+    warm_up_face_embedding_service,
+    write_snapshot,
+)
+from scripts.reembed_faces import backfill, cutover
+from tests.conftest import engine
 
 
 async def upload_face(client: AsyncClient, filename: str, label: str) -> UUID:
@@ -103,3 +128,954 @@ async def test_recognition_pipeline(client, clean_db):
     assert result["matched_record"]["filename"] == person_1_file_1
     assert "created_at" in result["matched_record"]
     assert len(result["matched_record"]["feature_vector"]) == 512
+
+
+@pytest.mark.asyncio
+async def test_batch_enrollment(client, clean_db):
+    """Test enrolling multiple faces in a single request.
+
+    - Upload two face images and one invalid file in one batch.
+    - Verify per-image results are streamed back in upload order.
+    - Verify the invalid file is reported without failing the batch.
+    - Verify enrolled faces are in the list.
+    """
+    filenames = ["person_1_face_1.jpg", "person_2_face_1.jpg"]
+    labels = ["Person 1", "Person 2", "Not a face"]
+
+    files = [
+        ("files", (name, open(f"tests/assets/{name}", "rb").read(), "image/jpeg"))
+        for name in filenames
+    ]
+    files.append(("files", ("invalid.jpg", b"not an image", "image/jpeg")))
+
+    response = await client.post(
+        "/api/faces/batch", files=files, data={"labels": labels}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["label"] for result in results] == labels
+    assert results[2]["id"] is None
+    assert results[2]["error"]
+
+    for result, filename in zip(results[:2], filenames):
+        assert result["error"] is None
+        await check_face_in_list(client, UUID(result["id"]), result["label"], filename)
+
+
+@pytest.mark.asyncio
+async def test_archive_enrollment_reports_storage_errors(client, clean_db, monkeypatch):
+    """Test enrolling a tar archive when storing one of the images fails.
+
+    - Upload an archive with one directory per person.
+    - Make the blob store fail for the second image.
+    - Verify the failure is reported for that image only and the stream completes.
+    """
+    images = {}
+    archive = BytesIO()
+    with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+        for label, name in [
+            ("Person 1", "person_1_face_1.jpg"),
+            ("Person 2", "person_2_face_1.jpg"),
+        ]:
+            with open(f"tests/assets/{name}", "rb") as f:
+                images[label] = f.read()
+            info = tarfile.TarInfo(f"faces/{label}/{name}")
+            info.size = len(images[label])
+            tar.addfile(info, BytesIO(images[label]))
+
+    put = LocalBlobStore.put
+
+    def failing_put(self, data: bytes) -> str:
+        if data == images["Person 2"]:
+            raise OSError("No space left on device")
+        return put(self, data)
+
+    monkeypatch.setattr(settings, "image_storage", "blob_store")
+    monkeypatch.setattr(LocalBlobStore, "put", failing_put)
+
+    response = await client.post(
+        "/api/faces/batch",
+        files={"archive": ("faces.tar.gz", archive.getvalue(), "application/gzip")},
+    )
+    assert response.status_code == 200
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["label"] for result in results] == ["Person 1", "Person 2"]
+    assert results[0]["error"] is None
+    assert results[1]["id"] is None
+    assert "No space left on device" in results[1]["error"]
+    await check_face_in_list(
+        client, UUID(results[0]["id"]), "Person 1", "person_1_face_1.jpg"
+    )
+
+
+def selects_column(statements: list[str], column: str) -> bool:
+    """Check if any of the captured SELECT statements loads the given column."""
+    return any(
+        column in statement.split("FROM")[0]
+        for statement in statements
+        if statement.lstrip().upper().startswith("SELECT")
+    )
+
+
+@pytest.mark.asyncio
+async def test_queries_load_only_used_columns(client, clean_db, sql_statements):
+    """Test that large columns are fetched only by the endpoints that use them.
+
+    - Listing faces loads neither image data nor feature vectors.
+    - Downloading an image loads only image data.
+    - A thumbnail cache hit loads neither image data nor feature vectors.
+    - Recognition loads feature vectors but not image data.
+    """
+    person_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+
+    sql_statements.clear()
+    await check_face_in_list(client, person_id, "Person 1", "person_1_face_1.jpg")
+    assert not selects_column(sql_statements, "image_data")
+    assert not selects_column(sql_statements, "feature_vector")
+
+    sql_statements.clear()
+    await check_download_image(client, person_id)
+    assert selects_column(sql_statements, "image_data")
+    assert not selects_column(sql_statements, "feature_vector")
+
+    thumbnail_url = f"/api/faces/{person_id}/image"
+    response = await client.get(thumbnail_url, params={"size": 64})
+    assert response.status_code == 200
+    sql_statements.clear()
+    cached = await client.get(thumbnail_url, params={"size": 64})
+    assert cached.content == response.content
+    assert not selects_column(sql_statements, "image_data")
+    assert not selects_column(sql_statements, "feature_vector")
+
+    sql_statements.clear()
+    await recognize_face(client, "person_1_face_2.jpg")
+    assert selects_column(sql_statements, "feature_vector")
+    assert not selects_column(sql_statements, "image_data")
+
+
+@pytest.mark.asyncio
+async def test_cursor_pagination(client, clean_db):
+    """Test keyset pagination of the face list.
+
+    - Add three faces.
+    - Follow `next_cursor` with page size 2.
+    - Verify every face is returned exactly once and pagination ends.
+    """
+    uploaded_ids = {
+        await upload_face(client, "person_1_face_1.jpg", "Person 1"),
+        await upload_face(client, "person_1_face_2.jpg", "Person 1"),
+        await upload_face(client, "person_2_face_1.jpg", "Person 2"),
+    }
+
+    response = await client.get("/api/faces/", params={"page_size": 2})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert first_page["count"] == 3
+    assert len(first_page["faces"]) == 2
+    assert first_page["next_cursor"] is not None
+
+    response = await client.get(
+        "/api/faces/",
+        params={
+            "page_size": 2,
+            "cursor": first_page["next_cursor"],
+            "count": "none",
+        },
+    )
+    assert response.status_code == 200
+    second_page = response.json()
+    assert second_page["count"] is None
+    assert len(second_page["faces"]) == 1
+    assert second_page["next_cursor"] is None
+
+    listed_ids = [
+        UUID(face["id"]) for face in first_page["faces"] + second_page["faces"]
+    ]
+    assert set(listed_ids) == uploaded_ids
+    assert len(listed_ids) == len(uploaded_ids)
+
+    response = await client.get("/api/faces/", params={"cursor": "invalid"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["exact", "hnsw", "hnsw_tuned"])
+async def test_top_k_recognition(client, clean_db, mode):
+    """Test recognition returning multiple matches in every search mode.
+
+    - Add two different persons.
+    - Verify both are returned, closest first, with k=2.
+    - Verify a zero distance threshold filters out all matches.
+    """
+    person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    person_2_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    with open("tests/assets/person_1_face_2.jpg", "rb") as f:
+        image = f.read()
+
+    response = await client.post(
+        "/api/faces/recognize",
+        params={"k": 2, "mode": mode},
+        files={"file": ("person_1_face_2.jpg", image, "image/jpeg")},
+    )
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["search_mode"] == mode
+    assert data["search_latency_ms"] > 0
+    assert [UUID(match["record"]["id"]) for match in data["matches"]] == [
+        person_1_id,
+        person_2_id,
+    ]
+    distances = [match["cosine_distance"] for match in data["matches"]]
+    assert distances == sorted(distances)
+    assert data["matched_record"]["id"] == str(person_1_id)
+
+    response = await client.post(
+        "/api/faces/recognize",
+        params={"k": 2, "mode": mode, "threshold": 0},
+        files={"file": ("person_1_face_2.jpg", image, "image/jpeg")},
+    )
+    assert response.status_code == 404
+
+
+async def add_random_faces(db, count: int) -> list[UUID]:
+    """Insert faces with random feature vectors of the current model version."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((count, 512)).astype(np.float32)
+    faces = [
+        FaceImage(
+            feature_vector=vector / np.linalg.norm(vector),
+            embedding_version=get_face_embedding_service().model_version,
+            label=f"Random {i}",
+            filename=f"random_{i}.jpg",
+        )
+        for i, vector in enumerate(vectors)
+    ]
+    db.add_all(faces)
+    await db.commit()
+    return [face.id for face in faces]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["hnsw", "hnsw_tuned"])
+async def test_top_k_above_default_ef_search(client, clean_db, db, mode):
+    """Test that HNSW search returns k matches for k above pgvector's default ef_search.
+
+    - Add one person and 59 faces with random feature vectors.
+    - Verify all 60 faces are returned with k=60.
+    """
+    await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    await add_random_faces(db, 59)
+
+    with open("tests/assets/person_1_face_2.jpg", "rb") as f:
+        response = await client.post(
+            "/api/faces/recognize",
+            params={"k": 60, "mode": mode, "ef_search": 10},
+            files={"file": ("person_1_face_2.jpg", f, "image/jpeg")},
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["matches"]) == 60
+    assert data["matches"][0]["record"]["label"] == "Person 1"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("precision", ["half", "binary"])
+async def test_reduced_precision_search(client, clean_db, monkeypatch, precision):
+    """Test recognition with candidates from reduced precision index re-ranked.
+
+    - Add two different persons.
+    - Verify single and batch recognition return both, closest first,
+      with exact float distances.
+    """
+    monkeypatch.setattr(settings, "vector_search_precision", precision)
+    person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    person_2_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    with open("tests/assets/person_1_face_2.jpg", "rb") as f:
+        image = f.read()
+
+    response = await client.post(
+        "/api/faces/recognize",
+        params={"k": 2, "mode": "hnsw_tuned"},
+        files={"file": ("person_1_face_2.jpg", image, "image/jpeg")},
+    )
+    assert response.status_code == 200
+    matches = response.json()["matches"]
+    assert [UUID(match["record"]["id"]) for match in matches] == [
+        person_1_id,
+        person_2_id,
+    ]
+
+    response = await client.post(
+        "/api/faces/recognize/batch",
+        params={"k": 2, "mode": "hnsw"},
+        files=[("files", ("person_1_face_2.jpg", image, "image/jpeg"))],
+    )
+    assert response.status_code == 200
+    [result] = response.json()["results"]
+    assert [match["cosine_distance"] for match in result["matches"]] == pytest.approx(
+        [match["cosine_distance"] for match in matches]
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "endpoint", ["/api/faces/recognize", "/api/faces/recognize/batch"]
+)
+async def test_reduced_precision_search_skips_float_index(
+    client, clean_db, monkeypatch, endpoint
+):
+    """Test that candidates are re-ranked without the float32 vector index.
+
+    - Create the float32 and halfvec HNSW indexes, add a person.
+    - Capture the search query of half precision recognition.
+    - Verify its plan uses the halfvec index and never the float32 one,
+      even with sequential scans disabled.
+    """
+    monkeypatch.setattr(settings, "vector_search_precision", "half")
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE INDEX face_images_feature_vector_idx "
+                "ON face_images USING hnsw (feature_vector vector_cosine_ops)"
+            )
+        )
+        await conn.execute(
+            text(
+                "CREATE INDEX idx_face_images_feature_vector_halfvec ON face_images "
+                "USING hnsw ((feature_vector::halfvec(512)) halfvec_cosine_ops)"
+            )
+        )
+    await upload_face(client, "person_1_face_1.jpg", "Person 1")
+
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if "halfvec" in statement.lower():
+            queries.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        field = "files" if endpoint.endswith("batch") else "file"
+        with open("tests/assets/person_1_face_2.jpg", "rb") as f:
+            response = await client.post(
+                endpoint,
+                params={"k": 1, "mode": "hnsw"},
+                files=[(field, ("person_1_face_2.jpg", f.read(), "image/jpeg"))],
+            )
+        assert response.status_code == 200
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    [(statement, parameters)] = queries
+    async with engine.connect() as conn:
+        await conn.execute(text("SET enable_seqscan = off"))
+        result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        plan = "\n".join(result.scalars().all())
+    assert "idx_face_images_feature_vector_halfvec" in plan
+    assert "face_images_feature_vector_idx" not in plan
+
+
+@pytest.mark.asyncio
+async def test_embeddings_snapshot(client, clean_db, db, tmp_path):
+    """Test in-memory index started from an on-disk snapshot.
+
+    - Export snapshot with one person.
+    - Add another person after the snapshot.
+    - Verify index loaded from the snapshot and synced finds both of them,
+      with labels of snapshot rows read from the snapshot.
+    """
+    person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+
+    snapshot_path = str(tmp_path / "snapshot")
+    assert await write_snapshot(db, snapshot_path) == 1
+    await db.rollback()
+
+    person_2_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    snapshot = open_snapshot(snapshot_path)
+    assert len(snapshot) == 1
+
+    vector_index = InMemoryVectorIndex()
+    vector_index.load_snapshot(snapshot)
+    await vector_index.sync(db)
+    assert len(vector_index) == 2
+
+    assert snapshot.labels == ["Person 1"]
+    assert snapshot.filenames == ["person_1_face_1.jpg"]
+
+    for person_id, label, filename in [
+        (person_1_id, "Person 1", "person_1_face_2.jpg"),
+        (person_2_id, "Person 2", "person_2_face_1.jpg"),
+    ]:
+        data = await recognize_face(client, filename)
+        [[hit]] = vector_index.search_faces(np.array([data["search_vector"]]), k=1)
+        assert hit.id == person_id
+        assert hit.record is not None and hit.record.label == label
+
+
+@pytest.mark.asyncio
+async def test_memory_search_without_database(
+    client, clean_db, db, monkeypatch, sql_statements
+):
+    """Test that in-memory recognition returns matches without querying the database.
+
+    - Enable the in-memory index and add two persons, one in a batch.
+    - Verify recognition in memory mode returns the person without any SQL statement.
+    """
+    vector_index = InMemoryVectorIndex()
+    await vector_index.sync(db)
+    monkeypatch.setattr(settings, "search_backend", "memory")
+    app.dependency_overrides[get_vector_index] = lambda: vector_index
+    try:
+        person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+        with open("tests/assets/person_2_face_1.jpg", "rb") as f:
+            response = await client.post(
+                "/api/faces/batch",
+                files=[("files", ("person_2_face_1.jpg", f.read(), "image/jpeg"))],
+                data={"labels": ["Person 2"]},
+            )
+        assert response.status_code == 200
+        assert len(vector_index) == 2
+
+        sql_statements.clear()
+        with open("tests/assets/person_1_face_2.jpg", "rb") as f:
+            response = await client.post(
+                "/api/faces/recognize",
+                params={"k": 2, "mode": "memory"},
+                files={"file": ("person_1_face_2.jpg", f, "image/jpeg")},
+            )
+    finally:
+        del app.dependency_overrides[get_vector_index]
+
+    assert response.status_code == 200
+    data = response.json()
+    assert sql_statements == []
+    assert data["matched_record"]["id"] == str(person_1_id)
+    assert data["matched_record"]["filename"] == "person_1_face_1.jpg"
+    assert [match["record"]["label"] for match in data["matches"]] == [
+        "Person 1",
+        "Person 2",
+    ]
+    assert all(match["record"]["created_at"] for match in data["matches"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["exact", "hnsw"])
+async def test_batch_recognition(client, clean_db, mode):
+    """Test recognition of many probe images in one request.
+
+    - Add two different persons.
+    - Recognize a batch with probes of both persons and an invalid image.
+    - Verify results are in input order and only the invalid probe has an error.
+    """
+    person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    person_2_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    filenames = ["person_2_face_1.jpg", "person_1_face_2.jpg"]
+    files = []
+    for filename in filenames:
+        with open(f"tests/assets/{filename}", "rb") as f:
+            files.append(("files", (filename, f.read(), "image/jpeg")))
+    files.append(("files", ("invalid.jpg", b"not an image", "image/jpeg")))
+
+    response = await client.post(
+        "/api/faces/recognize/batch",
+        params={"k": 2, "mode": mode},
+        files=files,
+    )
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["search_mode"] == mode
+    results = data["results"]
+    assert [result["filename"] for result in results] == filenames + ["invalid.jpg"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+
+    assert results[0]["error"] is None
+    assert [UUID(match["record"]["id"]) for match in results[0]["matches"]] == [
+        person_2_id,
+        person_1_id,
+    ]
+    assert results[1]["error"] is None
+    assert [UUID(match["record"]["id"]) for match in results[1]["matches"]] == [
+        person_1_id,
+        person_2_id,
+    ]
+    assert results[2]["error"] is not None
+    assert results[2]["matches"] == []
+
+
+@pytest.mark.asyncio
+async def test_identity_search(client, clean_db, db):
+    """Test searching identity templates instead of individual images.
+
+    - Add two images of one person and one image of another.
+    - Verify the template of the first person aggregates both images.
+    - Verify identity search returns one match per person, closest first,
+      in single and batch recognition.
+    """
+    person_1_ids = {
+        await upload_face(client, "person_1_face_1.jpg", "Person 1"),
+        await upload_face(client, "person_1_face_2.jpg", "Person 1"),
+    }
+    person_2_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    result = await db.execute(select(Identity.label, Identity.image_count))
+    assert dict(result.all()) == {"Person 1": 2, "Person 2": 1}
+
+    with open("tests/assets/person_1_face_2.jpg", "rb") as f:
+        image = f.read()
+
+    response = await client.post(
+        "/api/faces/recognize",
+        params={"k": 2, "mode": "identity"},
+        files={"file": ("person_1_face_2.jpg", image, "image/jpeg")},
+    )
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["search_mode"] == "identity"
+    matches = data["matches"]
+    assert [match["record"]["label"] for match in matches] == ["Person 1", "Person 2"]
+    assert UUID(matches[0]["record"]["id"]) in person_1_ids
+    assert UUID(matches[1]["record"]["id"]) == person_2_id
+
+    response = await client.post(
+        "/api/faces/recognize/batch",
+        params={"k": 2, "mode": "identity"},
+        files=[("files", ("person_1_face_2.jpg", image, "image/jpeg"))],
+    )
+    assert response.status_code == 200
+    [result] = response.json()["results"]
+    assert [match["record"]["label"] for match in result["matches"]] == [
+        "Person 1",
+        "Person 2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_multi_face_recognition(client, clean_db):
+    """Test recognition of every face in a group photo.
+
+    - Add two different persons.
+    - Recognize an image with both persons side by side.
+    - Verify both persons are matched to faces detected in the image.
+    """
+    person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    person_2_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    person_1 = Image.open("tests/assets/person_1_face_2.jpg").convert("RGB")
+    person_2 = Image.open("tests/assets/person_2_face_1.jpg").convert("RGB")
+    person_2 = person_2.resize(person_1.size)
+    group = Image.new("RGB", (person_1.width * 2, person_1.height))
+    group.paste(person_1, (0, 0))
+    group.paste(person_2, (person_1.width, 0))
+    image = BytesIO()
+    group.save(image, format="JPEG")
+
+    response = await client.post(
+        "/api/faces/recognize",
+        params={"multi_face": True},
+        files={"file": ("group.jpg", image.getvalue(), "image/jpeg")},
+    )
+    assert response.status_code == 200
+    faces = response.json()["faces"]
+
+    assert len(faces) >= 2
+    for face in faces:
+        x1, y1, x2, y2 = face["box"]
+        assert x1 < x2 and y1 < y2
+        assert len(face["matches"]) == 1
+
+    matched_ids = {UUID(face["matches"][0]["record"]["id"]) for face in faces}
+    assert matched_ids == {person_1_id, person_2_id}
+
+
+@pytest.mark.asyncio
+async def test_duplicate_enrollment(client, clean_db, db):
+    """Test enrolling byte-identical images.
+
+    - Upload the same image twice, then once more in a batch.
+    - Verify all records store the content hash, the same feature vector
+      and the face crop.
+    """
+    first_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    second_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+
+    with open("tests/assets/person_1_face_1.jpg", "rb") as f:
+        image = f.read()
+    expected_hash = content_hash(image)
+    response = await client.post(
+        "/api/faces/batch",
+        files=[("files", ("person_1_face_1.jpg", image, "image/jpeg"))],
+        data={"labels": ["Person 1"]},
+    )
+    third_id = UUID(json.loads(response.text)["id"])
+
+    result = await db.execute(
+        select(
+            FaceImage.id,
+            FaceImage.content_hash,
+            FaceImage.feature_vector,
+            FaceImage.face_crop,
+        )
+    )
+    rows = {id: row for id, *row in result.all()}
+
+    for id in [first_id, second_id, third_id]:
+        image_hash, vector, face_crop = rows[id]
+        assert image_hash == expected_hash
+        assert np.array_equal(vector, rows[first_id][1])
+        assert face_crop is not None and face_crop == rows[first_id][2]
+
+
+@pytest.mark.asyncio
+async def test_face_crop_reembedding(client, clean_db, db):
+    """Test re-embedding a stored face crop without face detection.
+
+    - Upload an image and load its stored face crop.
+    - Verify embedding the crop reproduces the stored feature vector.
+    """
+    face_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    result = await db.execute(
+        select(FaceImage.face_crop, FaceImage.feature_vector).where(
+            FaceImage.id == face_id
+        )
+    )
+    face_crop, feature_vector = result.one()
+    assert face_crop is not None
+
+    [reembedded] = get_face_embedding_service().compute_feature_vectors(
+        [decode_face_crop(face_crop)]
+    )
+    assert np.allclose(reembedded, feature_vector, atol=1e-5)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["exact", "hnsw"])
+async def test_embedding_version_isolation(client, clean_db, db, mode):
+    """Test that only feature vectors of the current model version are searched.
+
+    - Upload two persons, verify they are tagged with the current model version.
+    - Tag one of them with another version.
+    - Verify recognition finds only the other person.
+    """
+    person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    person_2_id = await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    model_version = get_face_embedding_service().model_version
+    result = await db.execute(select(FaceImage.embedding_version))
+    assert set(result.scalars().all()) == {model_version}
+
+    await db.execute(
+        update(FaceImage)
+        .where(FaceImage.id == person_1_id)
+        .values(embedding_version="previous-model")
+    )
+    await db.commit()
+
+    with open("tests/assets/person_1_face_2.jpg", "rb") as f:
+        response = await client.post(
+            "/api/faces/recognize",
+            params={"k": 2, "mode": mode},
+            files={"file": ("person_1_face_2.jpg", f, "image/jpeg")},
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert [UUID(match["record"]["id"]) for match in data["matches"]] == [person_2_id]
+
+
+class NewVersionService:
+    """Embedding service of the current weights, tagged with another model version.
+
+    Counts face detections and forward passes, the forward pass fails
+    after `fail_after` calls to simulate an interrupted migration.
+    """
+
+    model_version = "next-model"
+
+    def __init__(self, fail_after: int | None = None):
+        self.service = get_face_embedding_service()
+        self.fail_after = fail_after
+        self.num_detections = 0
+        self.num_forward_passes = 0
+
+    def get_cropped_image(self, image):
+        self.num_detections += 1
+        return self.service.get_cropped_image(image)
+
+    def compute_feature_vectors(self, cropped_images):
+        if self.num_forward_passes == self.fail_after:
+            raise RuntimeError("Migration interrupted")
+        self.num_forward_passes += 1
+        return self.service.compute_feature_vectors(cropped_images)
+
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+
+async def recognized_ids(client: AsyncClient, filename: str) -> list[UUID]:
+    """Ids of the faces matched with the image, empty if none matched."""
+    with open(f"tests/assets/{filename}", "rb") as f:
+        response = await client.post(
+            "/api/faces/recognize",
+            params={"k": 3},
+            files={"file": (filename, f, "image/jpeg")},
+        )
+    if response.status_code == 404:
+        return []
+    assert response.status_code == 200
+    return [UUID(match["record"]["id"]) for match in response.json()["matches"]]
+
+
+@pytest.mark.asyncio
+async def test_resumed_reembedding_and_cutover(client, clean_db, db):
+    """Test migrating feature vectors to a new model version.
+
+    - Upload three faces and an image without a face.
+    - Interrupt the backfill after the first batch, resume it and verify that
+      only the remaining faces are embedded.
+    - Verify that the image without a face is detected only once, by all runs.
+    - Verify searches use the old version until the cutover and the new one after.
+    """
+    person_1_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    await upload_face(client, "person_1_face_2.jpg", "Person 1")
+    await upload_face(client, "person_2_face_1.jpg", "Person 2")
+
+    blank = BytesIO()
+    Image.new("RGB", (160, 160), "gray").save(blank, format="JPEG")
+    db.add(
+        FaceImage(label="No face", filename="blank.jpg", image_data=blank.getvalue())
+    )
+    await db.commit()
+
+    interrupted = NewVersionService(fail_after=1)
+    with pytest.raises(RuntimeError, match="Migration interrupted"):
+        await backfill(db, interrupted, batch_size=1)
+    await db.rollback()
+    result = await db.execute(
+        select(func.count()).where(FaceEmbedding.feature_vector.is_not(None))
+    )
+    assert result.scalar_one() == 1
+
+    resumed = NewVersionService()
+    await backfill(db, resumed, batch_size=1)
+    assert resumed.num_forward_passes == 2
+    assert interrupted.num_detections + resumed.num_detections == 1
+
+    rerun = NewVersionService()
+    assert await backfill(db, rerun, batch_size=1) == []
+    assert rerun.num_detections == rerun.num_forward_passes == 0
+
+    # Searches keep using the old version until the cutover
+    assert person_1_id in await recognized_ids(client, "person_1_face_2.jpg")
+    app.dependency_overrides[get_face_embedding_service] = lambda: NewVersionService()
+    try:
+        assert await recognized_ids(client, "person_1_face_2.jpg") == []
+    finally:
+        del app.dependency_overrides[get_face_embedding_service]
+
+    new_service = NewVersionService()
+    await cutover(db, new_service, batch_size=1)
+    assert new_service.num_detections == new_service.num_forward_passes == 0
+
+    result = await db.execute(
+        select(FaceImage.embedding_version, func.count())
+        .where(FaceImage.feature_vector.is_not(None))
+        .group_by(FaceImage.embedding_version)
+    )
+    assert result.tuples().all() == [(NewVersionService.model_version, 3)]
+    result = await db.execute(select(FaceEmbedding.feature_vector))
+    assert result.scalars().all() == [None]
+
+    # Searches switch to the new version at once
+    assert await recognized_ids(client, "person_1_face_2.jpg") == []
+    app.dependency_overrides[get_face_embedding_service] = lambda: NewVersionService()
+    try:
+        assert person_1_id in await recognized_ids(client, "person_1_face_2.jpg")
+    finally:
+        del app.dependency_overrides[get_face_embedding_service]
+
+
+@pytest.mark.asyncio
+async def test_connection_released_during_inference(client, clean_db, monkeypatch):
+    """Test that enrollment does not hold a database connection during inference.
+
+    - Enroll a face with the embedding cache bypassed.
+    - Verify no pooled connection was checked out while computing its feature vector.
+    """
+    checked_out: list[int] = []
+    compute_feature_vector = FaceRecognitionService._compute_feature_vector
+
+    def compute_and_record(self, *args):
+        checked_out.append(engine.pool.checkedout())  # type: ignore
+        return compute_feature_vector(self, *args)
+
+    monkeypatch.setattr(
+        FaceRecognitionService, "_compute_feature_vector", compute_and_record
+    )
+    monkeypatch.setattr(EmbeddingCache, "get", lambda self, image_hash: None)
+
+    await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    assert checked_out == [0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["blob_store", "database"])
+async def test_image_http_caching(client, clean_db, monkeypatch, storage):
+    """Test HTTP caching headers of the image endpoint.
+
+    - Download an uploaded image with its content type and validators.
+    - Verify conditional requests with ETag or Last-Modified get 304.
+    - Verify byte ranges of the image can be requested, in both image storages.
+    """
+    monkeypatch.setattr(settings, "image_storage", storage)
+    person_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    with open("tests/assets/person_1_face_1.jpg", "rb") as f:
+        image = f.read()
+
+    response = await client.get(f"/api/faces/{person_id}/image")
+    assert response.status_code == 200
+    assert response.content == image
+    assert response.headers["content-type"] == "image/jpeg"
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+
+    response = await client.get(
+        f"/api/faces/{person_id}/image", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await client.get(
+        f"/api/faces/{person_id}/image", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    response = await client.get(
+        f"/api/faces/{person_id}/image", headers={"Range": "bytes=0-99"}
+    )
+    assert response.status_code == 206
+    assert response.content == image[:100]
+    assert response.headers["content-range"] == f"bytes 0-99/{len(image)}"
+
+    response = await client.get(
+        f"/api/faces/{person_id}/image", headers={"Range": "bytes=-10"}
+    )
+    assert response.status_code == 206
+    assert response.content == image[-10:]
+
+    response = await client.get(
+        f"/api/faces/{person_id}/image",
+        headers={"Range": f"bytes={len(image)}-"},
+    )
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(image)}"
+
+    response = await client.get(
+        f"/api/faces/{person_id}/image",
+        headers={"Range": "bytes=0-99", "If-Range": '"outdated"'},
+    )
+    assert response.status_code == 200
+    assert response.content == image
+
+
+@pytest.mark.asyncio
+async def test_image_thumbnail(client, clean_db):
+    """Test downloading thumbnails of a face image.
+
+    - Download WebP and JPEG thumbnails of an uploaded image.
+    - Verify their format, size and that they are smaller than the original.
+    - Verify unsupported sizes are rejected.
+    """
+    person_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    original = await client.get(f"/api/faces/{person_id}/image")
+
+    for format, content_type in [("webp", "image/webp"), ("jpeg", "image/jpeg")]:
+        response = await client.get(
+            f"/api/faces/{person_id}/image", params={"size": 64, "format": format}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == content_type
+        assert response.headers["etag"] != original.headers["etag"]
+        assert len(response.content) < len(original.content)
+        assert max(Image.open(BytesIO(response.content)).size) == 64
+
+    response = await client.get(f"/api/faces/{person_id}/image", params={"size": 100})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_browsing_does_not_need_models(client, clean_db):
+    """Test that read-only endpoints do not wait for the embedding models.
+
+    - Upload a face, then make the embedding service unavailable.
+    - Verify listing, image and thumbnail download and metrics still work.
+    """
+    person_id = await upload_face(client, "person_1_face_1.jpg", "Person 1")
+
+    def models_not_loaded():
+        raise AssertionError("Embedding models should not be needed")
+
+    app.dependency_overrides[get_face_embedding_service] = models_not_loaded
+    try:
+        await check_face_in_list(client, person_id, "Person 1", "person_1_face_1.jpg")
+        await check_download_image(client, person_id)
+        response = await client.get(
+            f"/api/faces/{person_id}/image", params={"size": 64}
+        )
+        assert response.status_code == 200
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+    finally:
+        del app.dependency_overrides[get_face_embedding_service]
+
+
+@pytest.mark.asyncio
+async def test_metrics(client, clean_db):
+    """Test the Prometheus metrics endpoint.
+
+    - Upload a face and search for it.
+    - Verify request counts, pipeline stage latencies and gallery size are exported.
+    """
+    await upload_face(client, "person_1_face_1.jpg", "Person 1")
+    await recognize_face(client, "person_1_face_2.jpg")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    metrics = response.text
+    assert (
+        'http_requests_total{handler="upload_face",method="POST",status="200"}'
+        in metrics
+    )
+    for stage in ["decode", "detect", "embed", "search", "db_insert"]:
+        assert f'pipeline_stage_seconds_count{{stage="{stage}"}}' in metrics
+    assert "gallery_size" in metrics
+    assert "inference_queue_depth" in metrics
+
+
+@pytest.mark.asyncio
+async def test_health_probes(client):
+    """Test liveness and readiness probes.
+
+    - Verify the liveness probe responds.
+    - Warm up the models and verify the readiness probe reports ready.
+    """
+    response = await client.get("/health")
+    assert response.status_code == 200
+
+    warm_up_face_embedding_service()
+
+    response = await client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
@@ -0,0 +1,45 @@
+"""Unit tests for metrics of multiple worker processes."""
+
+import os
+import subprocess
+import sys
+
+
+def run_worker(code: str, multiproc_dir: str) -> str:
+    """Run code in a new process with app.metrics in multiprocess mode."""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": multiproc_dir}
+    result = subprocess.run(
+        [sys.executable, "-c", "from app import metrics\n" + code],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout
+
+
+def test_metrics_are_aggregated_over_worker_processes(tmp_path):
+    """Any worker serving the scrape reports requests counted by all of them."""
+    for _ in range(2):
+        run_worker(
+            "metrics.http_requests_total.labels('GET', 'get_faces', 200).inc()",
+            str(tmp_path),
+        )
+
+    output = run_worker("print(metrics.generate_metrics().decode())", str(tmp_path))
+
+    assert (
+        'http_requests_total{handler="get_faces",method="GET",status="200"} 2.0'
+        in output
+    )
+
+
+def test_dead_worker_gauges_are_dropped(tmp_path):
+    run_worker(
+        "metrics.inference_queue_depth.set(3)\nmetrics.mark_process_dead()\n",
+        str(tmp_path),
+    )
+
+    output = run_worker("print(metrics.generate_metrics().decode())", str(tmp_path))
+
+    assert "inference_queue_depth 3.0" not in output
@@ -0,0 +1,115 @@
+"""Unit tests for the upload size limit middleware."""
+
+import io
+import tarfile
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from httpx import ASGITransport, AsyncClient
+
+from app.config import settings
+from app.main import app as main_app
+from app.middleware import UploadSizeLimitMiddleware
+from app.services import EnrollmentResult, get_face_recognition_service
+
+
+@pytest.fixture
+def client() -> AsyncClient:
+    """Client of an application accepting uploads of at most 1000 bytes."""
+    app = FastAPI()
+    app.add_middleware(
+        UploadSizeLimitMiddleware, max_bytes=1000, path_max_bytes={"/archive": 5000}
+    )
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    @app.post("/archive")
+    async def upload_archive(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_upload_within_limit_is_accepted(client):
+    response = await client.post("/upload", files={"file": ("a.jpg", b"x" * 500)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 500}
+
+
+@pytest.mark.asyncio
+async def test_upload_over_declared_length_is_rejected(client):
+    response = await client.post("/upload", files={"file": ("a.jpg", b"x" * 2000)})
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_streamed_upload_is_rejected_once_over_limit(client):
+    """Chunked body without Content-Length is cut off while it is received."""
+
+    async def chunks():
+        yield b"--boundary\r\n"
+        yield b'Content-Disposition: form-data; name="file"; filename="a.jpg"\r\n\r\n'
+        for _ in range(100):
+            yield b"x" * 100
+
+    response = await client.post(
+        "/upload",
+        content=chunks(),
+        headers={"Content-Type": "multipart/form-data; boundary=boundary"},
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_path_limit_overrides_default_limit(client):
+    response = await client.post("/archive", files={"file": ("a.tar", b"x" * 2000)})
+    assert response.status_code == 200
+
+    response = await client.post("/archive", files={"file": ("a.tar", b"x" * 6000)})
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_batch_route_accepts_archive_over_upload_limit():
+    """Dataset archives are limited by the archive limit, not the upload limit."""
+
+    class FakeFaceRecognitionService:
+        async def add_face_images(self, items):
+            index = 0
+            async for item in items:
+                yield EnrollmentResult(
+                    index=index,
+                    filename=item.filename,
+                    label=item.label,
+                    face_image_id=uuid4(),
+                )
+                index += 1
+
+    image_size = settings.max_upload_bytes + 1024 * 1024
+    assert image_size < settings.max_archive_upload_bytes
+    output = io.BytesIO()
+    with tarfile.open(fileobj=output, mode="w") as archive:
+        member = tarfile.TarInfo("person/image.jpg")
+        member.size = image_size
+        archive.addfile(member, io.BytesIO(bytes(image_size)))
+
+    main_app.dependency_overrides[get_face_recognition_service] = (
+        FakeFaceRecognitionService
+    )
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=main_app), base_url="http://test"
+        ) as client:
+            response = await client.post(
+                "/api/faces/batch",
+                files={"archive": ("dataset.tar", output.getvalue())},
+            )
+    finally:
+        del main_app.dependency_overrides[get_face_recognition_service]
+
+    assert response.status_code == 200
+    assert response.json()["label"] == "person"
@@ -0,0 +1,55 @@
+"""Unit tests for the ONNX Runtime face embedding backend.
+
+Skipped when ONNX Runtime (the onnx extra) is not installed.
+Runs without the database and without downloading pretrained weights.
+"""
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+pytest.importorskip("onnxruntime")
+
+from app.services.face_embedding import (  # noqa: E402
+    TorchFaceEmbeddingService,
+    load_face_detector,
+    load_feature_extractor,
+)
+from app.services.onnx_embedding import (  # noqa: E402
+    OnnxFaceEmbeddingService,
+    export_onnx_models,
+)
+
+
+def test_onnx_service_matches_torch_service(weights_path, tmp_path):
+    """Exported models find the same faces and compute the same feature vectors.
+
+    - Export the detector and randomly initialized feature extractor.
+    - Detect faces in images of different sizes, P-Net input size is dynamic.
+    - Embed a batch of a different size than the one used for export.
+    """
+    device = torch.device("cpu")
+    detector = load_face_detector(device)
+    feature_extractor = load_feature_extractor(weights_path, "model_state_dict", device)
+    model_path = str(tmp_path / "onnx")
+    export_onnx_models(detector, feature_extractor, model_path, "test-version")
+
+    torch_service = TorchFaceEmbeddingService(detector, feature_extractor)
+    onnx_service = OnnxFaceEmbeddingService(model_path, intra_op_threads=1)
+    assert onnx_service.model_version == "test-version"
+
+    for name in ["person_1_face_1", "person_2_face_1"]:
+        with Image.open(f"tests/assets/{name}.jpg") as image:
+            image = image.convert("RGB")
+        [expected] = torch_service.detect_faces(image)
+        [face] = onnx_service.detect_faces(image)
+        assert np.allclose(face.box, expected.box, atol=1.0)
+        assert face.probability == pytest.approx(expected.probability, abs=1e-4)
+
+    crops = [torch.randn(3, 160, 160) for _ in range(3)]
+    assert np.allclose(
+        onnx_service.compute_feature_vectors(crops),
+        torch_service.compute_feature_vectors(crops),
+        atol=1e-4,
+    )
@@ -0,0 +1,131 @@
+"""Unit tests for the inference server and its client.
+
+Runs without the database and without downloading pretrained weights.
+"""
+
+import socket
+import threading
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from app.services.face_embedding import (
+    TorchFaceEmbeddingService,
+    load_face_detector,
+    load_feature_extractor,
+)
+from app.services.remote_embedding import (
+    InferenceServer,
+    InferenceServerError,
+    RemoteFaceEmbeddingService,
+    receive_message,
+    send_message,
+)
+
+
+@pytest.fixture
+def local_service(weights_path) -> TorchFaceEmbeddingService:
+    device = torch.device("cpu")
+    return TorchFaceEmbeddingService(
+        load_face_detector(device),
+        load_feature_extractor(weights_path, "model_state_dict", device),
+        "test-version",
+    )
+
+
+@pytest.fixture
+def socket_path(local_service, tmp_path):
+    """Inference server serving the local service in a background thread."""
+    path = str(tmp_path / "inference.sock")
+    with InferenceServer(path, local_service) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield path
+        server.shutdown()
+        thread.join()
+
+
+def test_remote_service_matches_local_service(local_service, socket_path):
+    """Client returns the same faces and vectors as the served service.
+
+    Calls come from several threads, each over its own connection.
+    """
+    remote_service = RemoteFaceEmbeddingService(socket_path, "test-version")
+    with Image.open("tests/assets/person_1_face_1.jpg") as image:
+        image = image.convert("RGB")
+
+    [expected] = local_service.detect_faces(image)
+    [face] = remote_service.detect_faces(image)
+    assert face.box == expected.box
+    assert face.probability == expected.probability
+    assert torch.equal(face.cropped_image, expected.cropped_image)
+
+    crop = remote_service.get_cropped_image(image)
+    assert torch.equal(crop, local_service.get_cropped_image(image))
+    assert remote_service.get_cropped_image(Image.new("RGB", (160, 160))) is None
+
+    crops = [torch.randn(3, 160, 160) for _ in range(4)]
+    expected_vectors = local_service.compute_feature_vectors(crops)
+    results: dict[int, np.ndarray] = {}
+
+    def embed(i: int):
+        results[i] = remote_service.compute_feature_vector(crops[i])
+
+    threads = [threading.Thread(target=embed, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert np.allclose(remote_service.compute_feature_vectors(crops), expected_vectors)
+    for i in range(4):
+        assert np.allclose(results[i], expected_vectors[i], atol=1e-5)
+
+
+def test_remote_service_rejects_other_model_version_and_reports_errors(socket_path):
+    """Server with different models is refused, failed requests raise on the client."""
+    with pytest.raises(InferenceServerError, match="model version"):
+        RemoteFaceEmbeddingService(
+            socket_path, "other-version"
+        ).compute_feature_vectors([torch.zeros(3, 160, 160)])
+
+    remote_service = RemoteFaceEmbeddingService(socket_path, "test-version")
+    with pytest.raises(InferenceServerError):
+        remote_service.compute_feature_vectors([torch.zeros(3, 32, 32)])
+    # Connection stays usable after a failed request
+    assert remote_service.compute_feature_vectors([torch.zeros(3, 160, 160)]).shape == (
+        1,
+        512,
+    )
+
+
+def test_request_to_unresponsive_server_times_out(tmp_path):
+    """Server that accepts the request but never replies fails the call."""
+    path = str(tmp_path / "inference.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    stop = threading.Event()
+
+    def serve():
+        connection, _ = listener.accept()
+        with connection:
+            receive_message(connection)
+            send_message(connection, {"model_version": "test-version"})
+            receive_message(connection)
+            stop.wait()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    try:
+        remote_service = RemoteFaceEmbeddingService(
+            path, "test-version", request_timeout_s=0.2
+        )
+        with pytest.raises(InferenceServerError, match="did not respond"):
+            remote_service.compute_feature_vectors([torch.zeros(3, 160, 160)])
+    finally:
+        stop.set()
+        thread.join()
+        listener.close()
@@ -0,0 +1,93 @@
+"""Unit tests for thumbnail rendering and the thumbnail cache."""
+
+import os
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from app.services import ThumbnailCache, render_thumbnail, thumbnails
+
+
+def test_render_thumbnail_keeps_aspect_ratio():
+    with open("tests/assets/person_1_face_1.jpg", "rb") as f:
+        image_data = f.read()
+
+    thumbnail = Image.open(BytesIO(render_thumbnail(image_data, 128, "webp")))
+
+    original = Image.open(BytesIO(image_data))
+    aspect_ratio = original.width / original.height
+    assert thumbnail.format == "WEBP"
+    assert max(thumbnail.size) == 128
+    assert abs(thumbnail.width / thumbnail.height - aspect_ratio) < 0.05
+
+
+def test_least_recently_used_thumbnail_is_evicted(tmp_path):
+    """Files over the size budget are deleted, least recently used first."""
+    cache = ThumbnailCache(str(tmp_path), max_bytes=2000)
+
+    cache.put("a", 64, "webp", b"a" * 1000)
+    cache.put("b", 64, "webp", b"b" * 1000)
+    assert cache.get("a", 64, "webp") == b"a" * 1000
+    cache.put("c", 64, "webp", b"x" * 1000)
+
+    assert cache.get("b", 64, "webp") is None
+    assert cache.get("a", 64, "webp") is not None
+    assert cache.get("c", 64, "webp") is not None
+    assert sorted(os.listdir(tmp_path)) == ["a-64.webp", "c-64.webp"]
+
+    reloaded = ThumbnailCache(str(tmp_path), max_bytes=2000)
+    assert reloaded.size_bytes == 2000
+    assert reloaded.get("a", 64, "webp") is not None
+
+
+def test_thumbnail_evicted_after_hit_is_still_returned(tmp_path):
+    """Content of a hit stays readable even if the file is evicted right away."""
+    cache = ThumbnailCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", 64, "webp", b"a" * 1000)
+
+    thumbnail = cache.get("a", 64, "webp")
+    cache.put("b", 64, "webp", b"b" * 1000)
+
+    assert thumbnail == b"a" * 1000
+    assert cache.get("a", 64, "webp") is None
+
+
+def test_thumbnail_deleted_by_another_worker_is_a_miss(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=2000)
+    cache.put("a", 64, "webp", b"a" * 1000)
+
+    os.remove(tmp_path / "a-64.webp")
+
+    assert cache.get("a", 64, "webp") is None
+    assert cache.size_bytes == 0
+
+
+def test_directory_shared_by_workers_stays_within_budget(tmp_path, monkeypatch):
+    """Each worker evicts according to all files in the directory."""
+    monkeypatch.setattr(thumbnails, "RESCAN_INTERVAL_S", 0)
+    worker_1 = ThumbnailCache(str(tmp_path), max_bytes=2000)
+    worker_2 = ThumbnailCache(str(tmp_path), max_bytes=2000)
+
+    for key in "abcdef":
+        worker = worker_1 if key in "ace" else worker_2
+        worker.put(key, 64, "webp", key.encode() * 1000)
+        assert sum(file.stat().st_size for file in tmp_path.iterdir()) <= 2000
+
+    assert sorted(os.listdir(tmp_path)) == ["e-64.webp", "f-64.webp"]
+    assert worker_1.get("f", 64, "webp") == b"f" * 1000
+
+
+def test_leftover_temporary_files_are_not_cached(tmp_path):
+    """Stale temporary files are deleted at startup, recent ones are kept."""
+    (tmp_path / "a-64.webp").write_bytes(b"a" * 1000)
+    stale = tmp_path / "b-64.webp.1.2.tmp"
+    stale.write_bytes(b"b" * 1000)
+    old = time.time() - 3600
+    os.utime(stale, (old, old))
+    (tmp_path / "c-64.webp.1.2.tmp").write_bytes(b"c" * 1000)
+
+    cache = ThumbnailCache(str(tmp_path), max_bytes=2000)
+
+    assert cache.size_bytes == 1000
+    assert sorted(os.listdir(tmp_path)) == ["a-64.webp", "c-64.webp.1.2.tmp"]
@@ -0,0 +1,149 @@
+"""Unit tests for the in-memory vector index.
+
+Runs without the database, vectors are random.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services import EmbeddingSnapshot, FaceRecord, InMemoryVectorIndex
+from app.services.embedding_snapshot import ROW_DTYPE
+
+
+def random_vectors(count: int, dim: int = 512) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    return rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def test_search_matches_brute_force():
+    """Top-k results are the same as exact cosine distance computed directly."""
+    vectors = random_vectors(3000)
+    ids = [uuid.uuid4() for _ in range(len(vectors))]
+
+    index = InMemoryVectorIndex()
+    index.add_many(ids[:1000], vectors[:1000])
+    for id, vector in zip(ids[1000:], vectors[1000:]):
+        index.add(id, vector)
+    assert len(index) == len(vectors)
+
+    query = vectors[123] + 0.1 * random_vectors(1)[0]
+    hits = index.search(query, k=5)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    distances = 1 - normalized @ (query / np.linalg.norm(query))
+    expected = np.argsort(distances)[:5]
+
+    assert [id for id, _ in hits] == [ids[i] for i in expected]
+    assert np.allclose(
+        [distance for _, distance in hits], distances[expected], atol=1e-5
+    )
+    assert hits[0][0] == ids[123]
+
+
+def test_search_many_matches_single_searches():
+    """Searching many vectors at once gives the same results as one by one."""
+    vectors = random_vectors(500)
+    ids = [uuid.uuid4() for _ in range(len(vectors))]
+
+    index = InMemoryVectorIndex()
+    index.add_many(ids, vectors)
+
+    queries = vectors[:20] + 0.1 * random_vectors(20)
+    results = index.search_many(queries, k=4)
+
+    assert len(results) == len(queries)
+    for query, hits in zip(queries, results):
+        expected = index.search(query, k=4)
+        assert [id for id, _ in hits] == [id for id, _ in expected]
+        assert np.allclose([d for _, d in hits], [d for _, d in expected], atol=1e-5)
+
+
+def test_search_faces_returns_indexed_metadata():
+    """Matches carry the metadata and normalized vector added with them."""
+    vectors = random_vectors(20)
+    ids = [uuid.uuid4() for _ in range(len(vectors))]
+    records = [
+        FaceRecord(f"Person {i}", f"{i}.jpg", datetime(2025, 1, 1) + timedelta(i))
+        for i in range(10)
+    ]
+
+    index = InMemoryVectorIndex()
+    index.add_many(ids[:10], vectors[:10], records)
+    index.add_many(ids[10:], vectors[10:])
+
+    [[hit]] = index.search_faces(vectors[3:4], k=1)
+    assert hit.id == ids[3]
+    assert hit.record == records[3]
+    assert np.allclose(hit.vector, vectors[3] / np.linalg.norm(vectors[3]))
+
+    [[hit]] = index.search_faces(vectors[15:16], k=1)
+    assert hit.id == ids[15]
+    assert hit.record is None
+
+
+def test_adding_indexed_id_is_ignored():
+    """Re-adding vectors already in the index (e.g. during sync overlap) is a no-op."""
+    vectors = random_vectors(10)
+    ids = [uuid.uuid4() for _ in range(len(vectors))]
+
+    index = InMemoryVectorIndex()
+    index.add_many(ids, vectors)
+    index.add_many(ids[5:], vectors[5:])
+
+    assert len(index) == len(vectors)
+
+
+def test_search_empty_index():
+    index = InMemoryVectorIndex()
+    assert index.search(random_vectors(1)[0], k=3) == []
+
+
+def make_snapshot(
+    ids: list[uuid.UUID], vectors: np.ndarray, created_at: list[datetime]
+) -> EmbeddingSnapshot:
+    rows = np.empty(len(ids), dtype=ROW_DTYPE)
+    rows["id"] = [id.bytes for id in ids]
+    rows["created_at"] = created_at
+    return EmbeddingSnapshot(
+        vectors=vectors / np.linalg.norm(vectors, axis=1, keepdims=True),
+        rows=rows,
+        labels=[f"Person {i}" for i in range(len(ids))],
+        filenames=[f"{i}.jpg" for i in range(len(ids))],
+        watermark=max(created_at),
+    )
+
+
+def test_search_snapshot_and_added_vectors():
+    """Search covers both the snapshot base and vectors added after loading it."""
+    vectors = random_vectors(200)
+    ids = [uuid.uuid4() for _ in range(len(vectors))]
+    created_at = [datetime(2025, 1, 1) + timedelta(minutes=i) for i in range(150)]
+
+    index = InMemoryVectorIndex()
+    index.load_snapshot(make_snapshot(ids[:150], vectors[:150], created_at))
+    index.add_many(ids[150:], vectors[150:])
+    assert len(index) == len(vectors)
+
+    for i in [10, 170]:
+        hits = index.search(vectors[i], k=3)
+        assert hits[0][0] == ids[i]
+        assert hits[0][1] == pytest.approx(0, abs=1e-5)
+
+    [[hit]] = index.search_faces(vectors[10:11], k=1)
+    assert hit.record == FaceRecord("Person 10", "10.jpg", created_at[10])
+
+
+def test_snapshot_rows_in_sync_overlap_are_not_added_again():
+    """Snapshot rows read again by the overlapping sync query are skipped."""
+    vectors = random_vectors(100)
+    ids = [uuid.uuid4() for _ in range(len(vectors))]
+    created_at = [datetime(2025, 1, 1) + timedelta(seconds=i) for i in range(100)]
+
+    index = InMemoryVectorIndex(sync_overlap_s=30)
+    index.load_snapshot(make_snapshot(ids, vectors, created_at))
+    index.add_many(ids[70:], vectors[70:])
+
+    assert len(index) == len(vectors)
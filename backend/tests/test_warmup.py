@@ -0,0 +1,48 @@
+"""Unit tests for the model warm-up and the readiness probe."""
+
+import threading
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app import main
+from app.services import face_embedding
+
+
+class FakeFaceEmbeddingService:
+    def get_cropped_image(self, image):
+        return None
+
+    def compute_feature_vectors(self, cropped_images):
+        return [[0.0] * 512 for _ in cropped_images]
+
+
+@pytest.mark.asyncio
+async def test_failed_warm_up_is_retried_until_ready(monkeypatch):
+    """Worker becomes ready once loading the models succeeds on a retry."""
+    attempts = []
+
+    def load_face_embedding_service():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("Weights not available yet")
+        return FakeFaceEmbeddingService()
+
+    monkeypatch.setattr(
+        face_embedding, "load_face_embedding_service", load_face_embedding_service
+    )
+    monkeypatch.setattr(face_embedding, "_face_embedding_service", None)
+    monkeypatch.setattr(
+        face_embedding, "_face_embedding_service_ready", threading.Event()
+    )
+    monkeypatch.setattr(main, "WARMUP_RETRY_MIN_DELAY_S", 0.01)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=main.app), base_url="http://test"
+    ) as client:
+        assert (await client.get("/ready")).status_code == 503
+
+        await main.warm_up_models()
+
+        assert len(attempts) == 3
+        assert (await client.get("/ready")).status_code == 200
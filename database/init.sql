@@ -5,10 +5,16 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 -- Create tables
 CREATE TABLE face_images (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    image_data BYTEA NOT NULL,
+    image_data BYTEA,
+    image_key VARCHAR(255),
+    content_type VARCHAR(100),
+    image_size INTEGER,
     feature_vector vector(512),
+    embedding_version VARCHAR(64),
+    face_crop BYTEA,
     filename VARCHAR(255),
     label VARCHAR(255),
+    content_hash VARCHAR(64),
     created_at TIMESTAMP DEFAULT NOW()
 );
 
@@ -20,7 +26,36 @@ CREATE TABLE face_images (
 -- I am leaving this index for now as it proivides a 10x speedup
 -- It may need removing and falling back to full table scan if it causes issues
 CREATE INDEX ON face_images USING hnsw (feature_vector vector_cosine_ops);
+-- Smaller halfvec and binary quantized indexes for reduced precision search
+-- are created by migrations/006_reduced_precision_indexes.sql
 
 -- Regular indexes
-CREATE INDEX idx_face_images_created_at ON face_images(created_at);
-CREATE INDEX idx_face_images_label ON face_images(label);
\ No newline at end of file
+-- Composite index serves keyset pagination in (created_at, id) order
+CREATE INDEX idx_face_images_created_at ON face_images(created_at DESC, id DESC);
+CREATE INDEX idx_face_images_label ON face_images(label);
+-- Lookup of byte-identical images during enrollment, to reuse their feature vectors
+CREATE INDEX idx_face_images_content_hash ON face_images(content_hash);
+
+-- Feature vectors of a new embedding model version, staged during migration
+-- Filled by `python -m scripts.reembed_faces backfill`, moved to face_images on cutover
+-- Rows without a vector record images where no face was detected
+CREATE TABLE face_embeddings (
+    face_image_id UUID REFERENCES face_images(id) ON DELETE CASCADE,
+    model_version VARCHAR(64),
+    feature_vector vector(512),
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (face_image_id, model_version)
+);
+
+-- Identity templates, normalized mean feature vector of every label per model version
+-- Updated on enrollment from the running sum, rebuilt by `python -m scripts.reembed_faces`
+CREATE TABLE identities (
+    label VARCHAR(255),
+    model_version VARCHAR(64),
+    embedding_sum vector(512) NOT NULL,
+    template vector(512) NOT NULL,
+    image_count INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (label, model_version)
+);
+CREATE INDEX ON identities USING hnsw (template vector_cosine_ops);
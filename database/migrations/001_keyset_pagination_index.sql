@@ -0,0 +1,10 @@
+-- Keyset pagination of the face listing orders by (created_at, id)
+-- Replace the single-column created_at index with a composite one, keeping its name
+-- Run outside of a transaction block (CONCURRENTLY does not block writes)
+
+CREATE INDEX CONCURRENTLY idx_face_images_created_at_id
+    ON face_images(created_at DESC, id DESC);
+
+DROP INDEX CONCURRENTLY idx_face_images_created_at;
+
+ALTER INDEX idx_face_images_created_at_id RENAME TO idx_face_images_created_at;
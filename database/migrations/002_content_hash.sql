@@ -0,0 +1,10 @@
+-- SHA-256 of image data, enrollment reuses feature vectors of byte-identical images
+-- Backfill rewrites every row, run when the load is low
+-- Run outside of a transaction block (CONCURRENTLY does not block writes)
+
+ALTER TABLE face_images ADD COLUMN content_hash VARCHAR(64);
+
+UPDATE face_images SET content_hash = encode(sha256(image_data), 'hex');
+
+CREATE INDEX CONCURRENTLY idx_face_images_content_hash
+    ON face_images(content_hash);
@@ -0,0 +1,10 @@
+-- Image files move out of the face_images table into the blob store
+-- New rows keep image_data NULL and reference the file by image_key
+-- Existing rows are moved with `python -m scripts.migrate_images_to_blob_store`,
+-- after that run VACUUM FULL (or pg_repack) on face_images to reclaim the space
+
+ALTER TABLE face_images ALTER COLUMN image_data DROP NOT NULL;
+
+ALTER TABLE face_images ADD COLUMN image_key VARCHAR(255);
+ALTER TABLE face_images ADD COLUMN content_type VARCHAR(100);
+ALTER TABLE face_images ADD COLUMN image_size INTEGER;
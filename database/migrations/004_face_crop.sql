@@ -0,0 +1,6 @@
+-- Aligned face crop (160x160 PNG) of every enrolled face
+-- Lets `python -m scripts.reembed_faces` recompute feature vectors with new model
+-- weights without running face detection on the original images again
+-- Existing rows keep NULL until the re-embedding script backfills them
+
+ALTER TABLE face_images ADD COLUMN face_crop BYTEA;
@@ -0,0 +1,16 @@
+-- Embedding model version of every stored feature vector
+-- The application searches only vectors of the version of its model weights,
+-- stamp existing rows with the version of the deployed weights after migrating:
+--     python -m scripts.reembed_faces stamp
+
+ALTER TABLE face_images ADD COLUMN embedding_version VARCHAR(64);
+
+-- Feature vectors of a new embedding model version, staged during migration
+-- Filled by `python -m scripts.reembed_faces backfill`, moved to face_images on cutover
+CREATE TABLE face_embeddings (
+    face_image_id UUID REFERENCES face_images(id) ON DELETE CASCADE,
+    model_version VARCHAR(64),
+    feature_vector vector(512) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (face_image_id, model_version)
+);
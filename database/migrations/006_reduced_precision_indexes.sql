@@ -0,0 +1,18 @@
+-- Reduced precision vector indexes for VECTOR_SEARCH_PRECISION=half or binary
+-- Stored vectors stay float32, HNSW indexes are built over a cast expression
+-- Candidates found with the index are re-ranked by exact float32 distance,
+-- VECTOR_SEARCH_RERANK_FACTOR candidates are fetched per requested match
+-- Compare recall and latency with database/search_index_test.sql before switching
+-- Run outside of a transaction block (CONCURRENTLY does not block writes)
+
+-- half: float16 index, half the size of the float32 one
+CREATE INDEX CONCURRENTLY idx_face_images_feature_vector_halfvec
+    ON face_images USING hnsw ((feature_vector::halfvec(512)) halfvec_cosine_ops);
+
+-- binary: 1 bit per dimension, 32x smaller, needs a larger re-rank factor for good recall
+-- CREATE INDEX CONCURRENTLY idx_face_images_feature_vector_binary
+--     ON face_images USING hnsw ((binary_quantize(feature_vector)::bit(512)) bit_hamming_ops);
+
+-- Once the application runs with reduced precision, hnsw search modes no longer use
+-- the float32 index, drop it to free its memory (exact mode does not need it):
+-- DROP INDEX CONCURRENTLY face_images_feature_vector_idx;
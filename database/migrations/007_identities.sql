@@ -0,0 +1,22 @@
+-- Identity templates, normalized mean feature vector of every label per model version
+-- Searched by the `identity` recognition mode, one index entry per person
+-- instead of one per image. Updated on enrollment from the running sum,
+-- rebuilt for the new version by `python -m scripts.reembed_faces cutover`
+CREATE TABLE identities (
+    label VARCHAR(255),
+    model_version VARCHAR(64),
+    embedding_sum vector(512) NOT NULL,
+    template vector(512) NOT NULL,
+    image_count INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (label, model_version)
+);
+
+-- Templates of the faces enrolled so far
+INSERT INTO identities (label, model_version, embedding_sum, template, image_count)
+SELECT label, embedding_version, sum(feature_vector), l2_normalize(sum(feature_vector)), count(*)
+FROM face_images
+WHERE feature_vector IS NOT NULL AND embedding_version IS NOT NULL AND label IS NOT NULL
+GROUP BY label, embedding_version;
+
+CREATE INDEX ON identities USING hnsw (template vector_cosine_ops);
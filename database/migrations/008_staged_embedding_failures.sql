@@ -0,0 +1,4 @@
+-- Record images where no face was detected during an embedding migration
+-- `python -m scripts.reembed_faces backfill` stages them without a vector,
+-- so that reruns and the cutover do not run face detection on them again
+ALTER TABLE face_embeddings ALTER COLUMN feature_vector DROP NOT NULL;
@@ -27,3 +27,94 @@ RESET enable_bitmapscan;
 
 -- Planning Time: 0.061 ms
 -- Execution Time: 27.570 ms
+
+
+-- Reduced precision search (migrations/006_reduced_precision_indexes.sql)
+-- Queries below are meant for psql, the probe is a random vector from the gallery
+SELECT feature_vector AS probe FROM face_images ORDER BY random() LIMIT 1 \gset
+
+-- Index sizes, the gallery stays in memory if they fit in shared_buffers
+SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass)) AS size
+FROM pg_indexes
+WHERE tablename = 'face_images';
+
+-- Search with halfvec index, candidates re-ranked by float32 distance
+-- Re-ranking sorts the candidates subquery, the float32 index cannot serve it
+EXPLAIN ANALYZE
+SELECT id, feature_vector <=> :'probe'::vector AS cosine_distance
+FROM (
+    SELECT id, feature_vector FROM face_images
+    ORDER BY feature_vector::halfvec(512) <=> :'probe'::vector::halfvec(512)
+    LIMIT 40
+) candidates
+ORDER BY cosine_distance
+LIMIT 10;
+
+-- Search with binary quantized index, candidates re-ranked by float32 distance
+EXPLAIN ANALYZE
+SELECT id, feature_vector <=> :'probe'::vector AS cosine_distance
+FROM (
+    SELECT id, feature_vector FROM face_images
+    ORDER BY binary_quantize(feature_vector)::bit(512) <~> binary_quantize(:'probe'::vector)
+    LIMIT 40
+) candidates
+ORDER BY cosine_distance
+LIMIT 10;
+
+-- Recall@10 against exact search over 100 random probes
+-- Exact neighbours are ordered by an expression that no index can serve
+-- hnsw.ef_search must be at least the number of candidates (40)
+SET hnsw.ef_search = 100;
+
+WITH probes AS (
+    SELECT id AS probe_id, feature_vector AS probe
+    FROM face_images
+    ORDER BY random()
+    LIMIT 100
+),
+exact AS (
+    SELECT probe_id, n.id FROM probes CROSS JOIN LATERAL (
+        SELECT id FROM face_images
+        ORDER BY (feature_vector <=> probe) + 0
+        LIMIT 10
+    ) n
+),
+full_precision AS (
+    SELECT probe_id, n.id FROM probes CROSS JOIN LATERAL (
+        SELECT id FROM face_images
+        ORDER BY feature_vector <=> probe
+        LIMIT 10
+    ) n
+),
+half_precision AS (
+    SELECT probe_id, n.id FROM probes CROSS JOIN LATERAL (
+        SELECT id FROM (
+            SELECT id, feature_vector FROM face_images
+            ORDER BY feature_vector::halfvec(512) <=> probe::halfvec(512)
+            LIMIT 40
+        ) candidates
+        ORDER BY feature_vector <=> probe
+        LIMIT 10
+    ) n
+),
+binary_precision AS (
+    SELECT probe_id, n.id FROM probes CROSS JOIN LATERAL (
+        SELECT id FROM (
+            SELECT id, feature_vector FROM face_images
+            ORDER BY binary_quantize(feature_vector)::bit(512) <~> binary_quantize(probe)
+            LIMIT 40
+        ) candidates
+        ORDER BY feature_vector <=> probe
+        LIMIT 10
+    ) n
+)
+SELECT 'full' AS precision, count(*)::float / (SELECT count(*) FROM exact) AS recall
+FROM full_precision JOIN exact USING (probe_id, id)
+UNION ALL
+SELECT 'half', count(*)::float / (SELECT count(*) FROM exact)
+FROM half_precision JOIN exact USING (probe_id, id)
+UNION ALL
+SELECT 'binary', count(*)::float / (SELECT count(*) FROM exact)
+FROM binary_precision JOIN exact USING (probe_id, id);
+
+RESET hnsw.ef_search;
@@ -4,7 +4,10 @@ export const apiUrls = {
 	recognize: `${API_BASE_URL}/faces/recognize`,
 	getFaces: (page: number, page_size: number) =>
 		`${API_BASE_URL}/faces/?page=${page}&page_size=${page_size}`,
-	getImage: (id: string) => `${API_BASE_URL}/faces/${id}/image`,
+	getImage: (id: string, size?: number) =>
+		size === undefined
+			? `${API_BASE_URL}/faces/${id}/image`
+			: `${API_BASE_URL}/faces/${id}/image?size=${size}`,
 	uploadFace: `${API_BASE_URL}/faces`,
 };
 
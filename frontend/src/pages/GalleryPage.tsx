@@ -95,7 +95,8 @@ interface ImageCardProps {
 
 const ImageCard = (props: ImageCardProps) => {
 	const { face } = props;
-	const src = apiUrls.getImage(face.id);
+	const src = apiUrls.getImage(face.id, 256);
+	const srcSet = `${src} 1x, ${apiUrls.getImage(face.id, 512)} 2x`;
 
 	return (
 		<Box
@@ -110,7 +111,9 @@ const ImageCard = (props: ImageCardProps) => {
 			<Box flex="1 1 auto" position="relative" minHeight={0}>
 				<img
 					src={src}
+					srcSet={srcSet}
 					alt={face.label}
+					loading="lazy"
 					style={{
 						width: "100%",
 						height: "100%",